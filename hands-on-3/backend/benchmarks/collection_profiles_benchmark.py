@@ -0,0 +1,119 @@
+# benchmarks/collection_profiles_benchmark.py
+"""
+วัด memory และ search latency ของแต่ละ collection profile บน Qdrant server จริง
+
+    python -m benchmarks.collection_profiles_benchmark --points 50000 --profiles memory scalar binary disk
+
+ใช้ vector สุ่ม (ไม่ต้องโหลด embedding model) สร้าง collection ชั่วคราวต่อ profile
+memory รายงานทั้งค่าประมาณ (estimate_memory) และ RSS ของ Qdrant จาก /metrics (ถ้ามี)
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import requests
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct, QuantizationSearchParams, SearchParams
+
+from services.collection_profiles import COLLECTION_PROFILES, build_vectors_config, estimate_memory
+from utils.data_loader import MARKET_FEATURE_NAMES
+
+
+def _qdrant_rss_mb(host: str, port: int):
+    """RSS ของ Qdrant process จาก Prometheus metrics"""
+    try:
+        text = requests.get(f"http://{host}:{port}/metrics", timeout=5).text
+    except requests.RequestException:
+        return None
+    for line in text.splitlines():
+        if line.startswith("memory_resident_bytes"):
+            return round(float(line.split()[-1]) / 1024 / 1024, 1)
+    return None
+
+
+def _latency_ms(client, collection, vectors, using, params=None):
+    timings = []
+    for vector in vectors:
+        start = time.perf_counter()
+        client.query_points(collection_name=collection, query=vector.tolist(), using=using,
+                            limit=10, search_params=params)
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(float(np.percentile(timings, 50)), 2), round(float(np.percentile(timings, 95)), 2)
+
+
+def run_profile(client, host, port, name, points, text_size, queries, batch_size):
+    profile = COLLECTION_PROFILES[name]
+    feature_size = len(MARKET_FEATURE_NAMES)
+    collection = f"bench_profile_{name}"
+    rng = np.random.default_rng(0)
+
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+
+    rss_before = _qdrant_rss_mb(host, port)
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=build_vectors_config(profile, text_size, feature_size),
+        on_disk_payload=profile["on_disk_payload"]
+    )
+
+    start = time.perf_counter()
+    for i in range(0, points, batch_size):
+        n = min(batch_size, points - i)
+        text = rng.normal(size=(n, text_size)).astype(np.float32)
+        features = rng.normal(size=(n, feature_size)).astype(np.float32)
+        client.upsert(collection_name=collection, wait=True, points=[
+            PointStruct(id=i + j, vector={"text": text[j].tolist(), "features": features[j].tolist()},
+                        payload={"year": 2012 + (i + j) % 14})
+            for j in range(n)
+        ])
+    ingest_seconds = time.perf_counter() - start
+
+    # รอให้ index (HNSW + quantization) สร้างเสร็จ
+    while client.get_collection(collection).status.value != "green":
+        time.sleep(0.5)
+    rss_after = _qdrant_rss_mb(host, port)
+
+    text_queries = rng.normal(size=(queries, text_size)).astype(np.float32)
+    feature_queries = rng.normal(size=(queries, feature_size)).astype(np.float32)
+    rescore = None
+    if profile["quantization"]:
+        rescore = SearchParams(quantization=QuantizationSearchParams(rescore=True, oversampling=2.0))
+
+    text_p50, text_p95 = _latency_ms(client, collection, text_queries, "text", rescore)
+    feat_p50, feat_p95 = _latency_ms(client, collection, feature_queries, "features")
+
+    client.delete_collection(collection)
+
+    return {
+        "profile": name,
+        "points": points,
+        "ingest_seconds": round(ingest_seconds, 1),
+        "estimated_memory": estimate_memory(profile, points, text_size, feature_size),
+        "qdrant_rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+        "text_search_ms_p50_p95": [text_p50, text_p95],
+        "features_search_ms_p50_p95": [feat_p50, feat_p95],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--text-size", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--profiles", nargs="+", default=list(COLLECTION_PROFILES))
+    args = parser.parse_args()
+
+    client = QdrantClient(host=args.host, port=args.port)
+    for name in args.profiles:
+        result = run_profile(client, args.host, args.port, name, args.points,
+                             args.text_size, args.queries, args.batch_size)
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
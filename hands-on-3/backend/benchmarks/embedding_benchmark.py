@@ -0,0 +1,112 @@
+# benchmarks/embedding_benchmark.py
+"""
+เปรียบเทียบ embedding backend: throughput, memory และคุณภาพการค้นหา
+
+    python -m benchmarks.embedding_benchmark --backends hashing onnx sentence-transformers
+
+แต่ละ backend รันใน subprocess แยก เพื่อให้ค่า RSS ไม่ปนกัน
+คุณภาพวัดจาก recall@k: เพื่อนบ้านตาม cosine ของ embedding เทียบกับ
+วันที่มีราคาดีเซลใกล้เคียงที่สุดจริง (ความหมายเดียวกับ /search)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def _rss_mb() -> float:
+    """RSS ปัจจุบันของ process (MB)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_single(backend: str, onnx_model_path: str, n_queries: int, k: int) -> dict:
+    from services.embeddings import create_encoder
+    from services.qdrant_service import price_to_text
+    from utils.data_loader import prepare_sample_data
+
+    df = prepare_sample_data()
+    texts = [price_to_text(row) for _, row in df.iterrows()]
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    encoder = create_encoder(backend=backend, onnx_model_path=onnx_model_path)
+    load_seconds = time.perf_counter() - start
+
+    encoder.encode(texts[:8])  # warm-up
+
+    start = time.perf_counter()
+    vectors = encoder.encode(texts)
+    encode_seconds = time.perf_counter() - start
+    rss_after = _rss_mb()
+
+    # recall@k เทียบกับ nearest neighbours ตามราคาดีเซล
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.clip(norms, 1e-12, None)
+    prices = df["diesel"].to_numpy()
+
+    rng = np.random.default_rng(0)
+    queries = rng.choice(len(df), size=min(n_queries, len(df)), replace=False)
+    recalls = []
+    for q in queries:
+        query_text = f"ดีเซล {prices[q]:.2f} บาท"
+        query = encoder.encode([query_text])[0]
+        query = query / max(np.linalg.norm(query), 1e-12)
+
+        predicted = np.argsort(-(unit @ query))[:k]
+        truth = np.argsort(np.abs(prices - prices[q]))[:k]
+        recalls.append(len(set(predicted) & set(truth)) / k)
+
+    return {
+        "backend": backend,
+        "dimension": encoder.dimension,
+        "load_seconds": round(load_seconds, 3),
+        "texts_per_second": round(len(texts) / encode_seconds, 1),
+        "rss_mb": round(rss_after, 1),
+        "rss_delta_mb": round(rss_after - rss_before, 1),
+        f"recall_at_{k}": round(float(np.mean(recalls)), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["hashing", "onnx", "sentence-transformers"])
+    parser.add_argument("--onnx-model-path", default="./models/onnx/model_quantized.onnx")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args.onnx_model_path, args.queries, args.k)))
+        return
+
+    results = []
+    for backend in args.backends:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.embedding_benchmark", "--single", backend,
+             "--onnx-model-path", args.onnx_model_path,
+             "--queries", str(args.queries), "-k", str(args.k)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+            results.append({"backend": backend, "error": last_line})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
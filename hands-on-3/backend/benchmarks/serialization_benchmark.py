@@ -0,0 +1,160 @@
+# benchmarks/serialization_benchmark.py
+"""
+วัดเวลา serialize response ขนาดต่างๆ: path เดิม (Pydantic / jsonable_encoder + json) เทียบกับ orjson
+แบบ records และแบบ columnar
+
+    python -m benchmarks.serialization_benchmark --repeat 200
+
+ใช้ข้อมูลสุ่ม ไม่ต้องมี Qdrant หรือ model; วัดเฉพาะ CPU ตั้งแต่ผลลัพธ์ (NumPy) ถึง bytes ของ response
+- pydantic: สร้าง model ต่อ item แล้ว validate + dump แบบที่ response_model ทำ แล้วใช้ JSONResponse
+- jsonable_encoder: dict/list ล้วนผ่าน jsonable_encoder + JSONResponse (endpoint ที่ไม่มี response_model)
+- orjson_records: list ของ dict แบบเดิม serialize ด้วย FastJSONResponse
+- orjson_columnar: array ขนานกันจาก NumPy serialize ด้วย FastJSONResponse
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from schemas.price_schemas import PredictionResponse, PanelPredictionResponse
+from utils.responses import FastJSONResponse, orjson
+
+FIELDS = ("day", "date", "predicted_price", "lower_bound", "upper_bound")
+
+
+def _forecast_arrays(rng, series: int, horizon: int):
+    mean = rng.normal(30, 5, size=(series, horizon)).round(2)
+    spread = np.abs(rng.normal(1, 0.2, size=(series, horizon)))
+    dates = pd.date_range("2026-01-01", periods=horizon, freq="D").strftime("%Y-%m-%d").to_numpy()
+    return {
+        "day": np.arange(1, horizon + 1),
+        "date": dates,
+        "predicted_price": mean,
+        "lower_bound": (mean - spread).round(2),
+        "upper_bound": (mean + spread).round(2),
+    }
+
+
+def _records(arrays, s: int):
+    return [
+        {
+            "day": int(arrays["day"][i]),
+            "date": arrays["date"][i],
+            "predicted_price": float(arrays["predicted_price"][s, i]),
+            "lower_bound": float(arrays["lower_bound"][s, i]),
+            "upper_bound": float(arrays["upper_bound"][s, i]),
+        }
+        for i in range(len(arrays["day"]))
+    ]
+
+
+def build_cases(rng):
+    """คืน dict ชื่อ case -> dict ของ path -> ฟังก์ชันที่คืน bytes"""
+    cases = {}
+
+    # /predict: 1 series x 30 วัน
+    arrays = _forecast_arrays(rng, 1, 30)
+    info = {"version": 1, "last_train_date": "2025-12-31", "source": "materialized"}
+    predict_records = {"fuel_type": "diesel", "current_price": 30.0, "predictions": _records(arrays, 0),
+                       "model_info": info}
+    predict_columns = {**predict_records, "predictions": {
+        k: (arrays[k][0] if arrays[k].ndim == 2 else arrays[k]) for k in FIELDS
+    }}
+    cases["predict (30 points)"] = {
+        "pydantic": lambda: JSONResponse(
+            PredictionResponse.model_validate(predict_records).model_dump(mode="json")
+        ).body,
+        "orjson_records": lambda: FastJSONResponse(predict_records).body,
+        "orjson_columnar": lambda: FastJSONResponse(predict_columns).body,
+    }
+
+    # /predict/panel: 500 series x 52 ช่วง
+    series, horizon = 500, 52
+    arrays = _forecast_arrays(rng, series, horizon)
+    params = {k: rng.uniform(size=series).round(4) for k in ("alpha", "beta", "phi", "gamma")}
+    panel_records = {
+        "frequency": "W", "last_date": "2025-12-29", "series_count": series,
+        "forecasts": [
+            {"series": f"item {s}", "last_observed": "2025-12-29", "observations": 500,
+             "params": {k: float(v[s]) for k, v in params.items()}, "predictions": _records(arrays, s)}
+            for s in range(series)
+        ],
+    }
+    panel_columns = {
+        "frequency": "W", "last_date": "2025-12-29", "series_count": series,
+        "forecasts": {"series": [f"item {s}" for s in range(series)], "params": params, **arrays},
+    }
+    cases[f"panel ({series} x {horizon})"] = {
+        "pydantic": lambda: JSONResponse(
+            PanelPredictionResponse.model_validate(panel_records).model_dump(mode="json")
+        ).body,
+        "jsonable_encoder": lambda: JSONResponse(jsonable_encoder(panel_records)).body,
+        "orjson_records": lambda: FastJSONResponse(panel_records).body,
+        "orjson_columnar": lambda: FastJSONResponse(panel_columns).body,
+    }
+
+    # /prices/history: 6 fuel x 300 OHLC
+    dates = pd.date_range("2020-01-01", periods=300, freq="W-MON").strftime("%Y-%m-%d").tolist()
+    ohlc = {k: rng.normal(30, 5, size=(6, 300)).round(2) for k in ("open", "high", "low", "close")}
+    history_records = {"series": {
+        f"fuel_{f}": {"data": [
+            {"date": dates[i], **{k: float(v[f, i]) for k, v in ohlc.items()}} for i in range(300)
+        ]}
+        for f in range(6)
+    }}
+    history_columns = {"series": {
+        f"fuel_{f}": {"data": {"date": dates, **{k: v[f] for k, v in ohlc.items()}}} for f in range(6)
+    }}
+    cases["history (6 x 300 OHLC)"] = {
+        "jsonable_encoder": lambda: JSONResponse(jsonable_encoder(history_records)).body,
+        "orjson_records": lambda: FastJSONResponse(history_records).body,
+        "orjson_columnar": lambda: FastJSONResponse(history_columns).body,
+    }
+    return cases
+
+
+def _time(fn, repeat: int):
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return float(np.median(timings)), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization paths")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="พิมพ์ผลเป็น JSON")
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson not installed: FastJSONResponse falls back to the stdlib json module")
+
+    results = []
+    for case, paths in build_cases(np.random.default_rng(0)).items():
+        baseline = None
+        for path, fn in paths.items():
+            median_us, size = _time(fn, args.repeat)
+            baseline = baseline or median_us
+            results.append({
+                "case": case, "path": path, "median_us": round(median_us, 1),
+                "bytes": size, "speedup": round(baseline / median_us, 1)
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'case':<24} {'path':<18} {'median µs':>10} {'bytes':>10} {'speedup':>8}")
+    for r in results:
+        print(f"{r['case']:<24} {r['path']:<18} {r['median_us']:>10} {r['bytes']:>10} {r['speedup']:>7}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# config.py
+from pydantic_settings import BaseSettings
+
+from services.embeddings import DEFAULT_MODEL_NAME
+
+# Configuration
+class Settings(BaseSettings):
+    qdrant_host: str = "localhost"
+    qdrant_port: int = 6333
+    collection_name: str = "oil_prices_eppo"
+    model_dir: str = "./models"
+    data_dir: str = "./data"
+
+    # Embedding backend: "sentence-transformers" | "onnx" | "hashing"
+    embedding_backend: str = "sentence-transformers"
+    embedding_model: str = DEFAULT_MODEL_NAME
+    onnx_model_path: str = "./models/onnx/model_quantized.onnx"
+    embedding_dim: int = 384  # ใช้กับ hashing backend
+
+    # Collection profile: "memory" | "scalar" | "binary" | "disk" (ดู services/collection_profiles.py)
+    collection_profile: str = "memory"
+
+    # Panel forecasting (EPPO long-format dataset ใน data_dir)
+    panel_data_file: str = "dataset_11_86.csv"
+    panel_frequency: str = "W"
+
+    # Forecast ที่ precompute ไว้ (materialized table)
+    forecast_precompute_enabled: bool = True
+    forecast_db_path: str = "./data/forecasts.sqlite"
+    forecast_refresh_interval: float = 3600  # วินาที
+    forecast_max_age: float = 86400  # เก่ากว่านี้ /predict จะคำนวณใหม่
+
+    # cache ของ /prices/history (ล้างเมื่อ ingest, ttl สำหรับ ingest จาก worker อื่น)
+    history_cache_ttl: float = 300
+
+    # ตรวจราคาผิดปกติ / change point ระหว่าง ingest (ดู services/anomaly.py)
+    anomaly_detection_enabled: bool = True
+    anomaly_alpha: float = 0.05  # น้ำหนักของ EWMA
+    anomaly_z_threshold: float = 8.0  # spike: |log return| / std
+    anomaly_cusum_drift: float = 1.0
+    anomaly_cusum_threshold: float = 6.0
+    anomaly_warmup: int = 30  # จำนวนวันก่อนเริ่ม flag
+    anomaly_retrain_on_change: bool = True  # retrain model ของ fuel ที่เกิด change point
+    anomaly_retrain_cooldown: float = 3600  # วินาที ต่อ fuel
+
+    # วัดหน่วยความจำ (tracemalloc + RSS) ตาม stage ของ ingest / train / load model ดูที่ /debug/memory
+    memory_profiling_enabled: bool = False
+    memory_trace_frames: int = 1  # stack frame ต่อ allocation (มากขึ้น = เห็น call path แต่ช้าลง)
+
+    # Write-behind buffer ของ /prices
+    price_buffer_enabled: bool = False
+    price_buffer_max_batch: int = 500
+    price_buffer_max_delay: float = 1.0  # วินาที
+    price_buffer_max_pending: int = 10000
+    price_buffer_wal_path: str = "./data/prices.wal"  # "" = ไม่ใช้ WAL; หลาย worker จอง prices.N.wal คนละไฟล์เอง
+    price_buffer_fsync: bool = False
+
+    class Config:
+        env_file = ".env"
+
+settings = Settings()
@@ -1,34 +1,37 @@
 # main.py
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic_settings import BaseSettings
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import pandas as pd
 import logging
 import os
+import threading
+import time
 from datetime import datetime
 from typing import Optional
 
 from schemas.price_schemas import (
     PriceData, PredictionRequest, PredictionResponse,
-    TrainingRequest, UploadResponse, PredictionResult
+    TrainingRequest, UploadResponse, DistributionRequest,
+    PanelPredictionRequest, PanelPredictionResponse, MAX_HORIZON
 )
 from services.qdrant_service import QdrantService
+from services.embeddings import create_encoder
+from services.write_buffer import PriceWriteBuffer, BufferFullError
+from services.forecast_store import ForecastTable, ForecastScheduler
+from services.singleflight import SingleFlight
+from services.price_history import PriceHistoryCache
+from services.analytics import PriceAnalytics
+from services.progress import ProgressBus
+from services.anomaly import AnomalyDetector, CHANGE_POINT
 from models.predictor import OilPricePredictor
-from utils.data_loader import load_eppo_csv, prepare_sample_data
-
-# Configuration
-class Settings(BaseSettings):
-    qdrant_host: str = "localhost"
-    qdrant_port: int = 6333
-    collection_name: str = "oil_prices_eppo"
-    model_dir: str = "./models"
-    data_dir: str = "./data"
-
-    class Config:
-        env_file = ".env"
-
-settings = Settings()
+from models.panel_forecaster import forecast_panel, forecast_panel_columns
+from utils.data_loader import load_eppo_csv, load_eppo_long_csv, prepare_sample_data
+from utils.responses import FastJSONResponse, to_columns, check_format, dumps
+from utils.memory import memory_profiler, GROUP_BY
+from config import settings
 
 # Logging
 logging.basicConfig(
@@ -37,8 +40,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.memory_profiling_enabled:
+        memory_profiler.start(settings.memory_trace_frames)
+    if anomaly_detector:
+        # โหลดประวัติจาก Qdrant ก่อนรับ request: ingest แรกไม่ต้องรอ และไม่ block event loop
+        await run_in_threadpool(anomaly_detector.seed)
+    if price_buffer:
+        price_buffer.start()
+    if forecast_scheduler:
+        forecast_scheduler.start()
+    yield
+    if price_buffer:
+        price_buffer.stop()
+    if forecast_scheduler:
+        forecast_scheduler.stop()
+
 # FastAPI App
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     title="Oil Price Prediction API",
     description="API สำหรับทำนายราคาน้ำมันด้วย Machine Learning + Qdrant Vector DB",
     version="1.0.0",
@@ -62,11 +84,115 @@ app.add_middleware(
 qdrant_service = QdrantService(
     host=settings.qdrant_host,
     port=settings.qdrant_port,
-    collection_name=settings.collection_name
+    collection_name=settings.collection_name,
+    encoder=create_encoder(
+        backend=settings.embedding_backend,
+        model_name=settings.embedding_model,
+        onnx_model_path=settings.onnx_model_path,
+        dimension=settings.embedding_dim
+    ),
+    profile=settings.collection_profile
 )
 
 predictor = OilPricePredictor(model_dir=settings.model_dir, qdrant_service=qdrant_service)
 
+def latest_price(fuel_type: str) -> tuple:
+    """(วันที่, ราคา) ของแถวราคาล่าสุดของ fuel_type"""
+    df = qdrant_service.get_all_prices(fuel_type=fuel_type, limit=1)
+    if len(df) == 0:
+        raise LookupError("No price data found")
+    return df['date'].iloc[-1].strftime("%Y-%m-%d"), float(df[fuel_type].iloc[-1])
+
+def compute_forecast(
+    fuel_type: str, horizon: int = MAX_HORIZON, confidence: float = 0.95, columnar: bool = False,
+    latest: Optional[tuple] = None
+) -> dict:
+    """คำนวณ forecast สด (ใช้ทั้งใน /predict และ scheduler) columnar = predictions เป็น array ต่อ field"""
+    # Load model if not loaded (หรือ worker อื่น train version ใหม่แล้ว)
+    predictor.ensure_current(fuel_type)
+    
+    # Get current price
+    data_date, current_price = latest or latest_price(fuel_type)
+    
+    info = predictor.model_info(fuel_type)
+    forecast = predictor.predict_arrays if columnar else predictor.predict
+    return {
+        "model_version": info["version"],
+        "last_train_date": info["last_train_date"],
+        "current_price": current_price,
+        "data_date": data_date,
+        "confidence": confidence,
+        "predictions": forecast(periods=horizon, confidence=confidence, fuel_type=fuel_type),
+        "computed_at": time.time()
+    }
+
+forecast_table = ForecastTable(settings.forecast_db_path) if settings.forecast_precompute_enabled else None
+
+forecast_scheduler = ForecastScheduler(
+    table=forecast_table,
+    compute_fn=compute_forecast,
+    list_fuel_types=lambda: [m["fuel_type"] for m in predictor.store.list_models()],
+    interval=settings.forecast_refresh_interval
+) if forecast_table else None
+
+# รวม /predict และ /train ที่เหมือนกันและเข้ามาพร้อมกันให้คำนวณครั้งเดียว
+predict_flight = SingleFlight("predict")
+train_flight = SingleFlight("train")
+
+def resolve_forecast(fuel_type: str) -> tuple:
+    """forecast เต็ม horizon ของ fuel_type คืน (entry, source)"""
+    # ใช้ forecast ที่ precompute ไว้ถ้ามาจาก model version ล่าสุด, ข้อมูลราคาล่าสุดชุดเดียวกัน และยังไม่เก่าเกินไป
+    entry = forecast_table.get(fuel_type) if forecast_table else None
+    model_version = predictor.store.manifest(fuel_type).get("version")
+    latest = latest_price(fuel_type)
+    if ForecastTable.is_fresh(entry, model_version, MAX_HORIZON, 0.95, settings.forecast_max_age, latest):
+        return entry, "materialized"
+    
+    entry = compute_forecast(fuel_type, latest=latest)
+    if forecast_table:
+        forecast_table.put(fuel_type, entry)
+    return entry, "live"
+
+price_history = PriceHistoryCache(loader=qdrant_service.get_price_frame, ttl=settings.history_cache_ttl)
+price_analytics = PriceAnalytics(price_history)
+
+# ความคืบหน้าของ ingest / train สำหรับ /jobs/{job_id}/events
+progress_bus = ProgressBus()
+
+anomaly_detector = AnomalyDetector(
+    alpha=settings.anomaly_alpha,
+    z_threshold=settings.anomaly_z_threshold,
+    cusum_drift=settings.anomaly_cusum_drift,
+    cusum_threshold=settings.anomaly_cusum_threshold,
+    warmup=settings.anomaly_warmup,
+    history_loader=price_history.frame
+) if settings.anomaly_detection_enabled else None
+
+def ingest_prices(df: pd.DataFrame, progress=None) -> int:
+    """ตรวจความผิดปกติ เพิ่มข้อมูลเข้า Qdrant แล้วสั่ง precompute forecast ใหม่"""
+    annotations, events = anomaly_detector.process(df) if anomaly_detector else (None, [])
+    if events and progress:
+        progress("anomalies", count=len(events))
+    
+    records_added = qdrant_service.add_price_data(df, progress=progress, annotations=annotations)
+    price_history.invalidate()
+    if forecast_scheduler:
+        forecast_scheduler.trigger(reason="ingest")
+    
+    change_points = [e for e in events if e["kind"] == CHANGE_POINT]
+    if change_points and settings.anomaly_retrain_on_change:
+        retrain_on_change(change_points)
+    return records_added
+
+price_buffer = PriceWriteBuffer(
+    flush_fn=ingest_prices,
+    max_batch=settings.price_buffer_max_batch,
+    max_delay=settings.price_buffer_max_delay,
+    max_pending=settings.price_buffer_max_pending,
+    wal_path=settings.price_buffer_wal_path or None,
+    fsync=settings.price_buffer_fsync
+) if settings.price_buffer_enabled else None
+
 # Endpoints
 @app.get("/")
 async def root():
@@ -81,7 +207,9 @@ async def root():
             "add_price": "/prices",
             "train": "/train",
             "predict": "/predict",
-            "search": "/search"
+            "predict_panel": "/predict/panel",
+            "search": "/search",
+            "search_conditions": "/search/conditions"
         }
     }
 
@@ -101,10 +229,54 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+def run_job(kind: str, job_id: Optional[str], fn, *args, raise_errors: bool = True, **kwargs):
+    """
+    รัน fn(*args, progress=reporter, **kwargs) เป็น job ที่ติดตามได้ที่ /jobs/{job_id}/events
+    คืน (result, job_id); ส่ง event done / error ให้ subscriber เมื่อจบ
+    """
+    reporter = progress_bus.start_job(kind, job_id)
+    try:
+        result = fn(*args, progress=reporter, **kwargs)
+    except Exception as e:
+        progress_bus.finish(reporter, error=str(e.detail) if isinstance(e, HTTPException) else str(e))
+        if raise_errors:
+            raise
+        logger.error(f"{kind} job {reporter.job_id} failed: {e}")
+        return None, reporter.job_id
+    progress_bus.finish(reporter, result=result)
+    return result, reporter.job_id
+
+def accepted(job_id: str) -> JSONResponse:
+    """response 202 ของ job ที่รันเบื้องหลัง"""
+    return FastJSONResponse(
+        status_code=202,
+        content={"status": "accepted", "job_id": job_id, "events": f"/jobs/{job_id}/events"}
+    )
+
+def ingest_csv(file_path: str, progress=None) -> dict:
+    """โหลด EPPO CSV แล้วเพิ่มเข้า Qdrant คืน response ของ /upload-csv"""
+    # Load and process
+    df = load_eppo_csv(file_path)
+    if progress:
+        progress("parsed", rows=len(df))
+    
+    # Add to Qdrant
+    records_added = ingest_prices(df, progress=progress)
+    
+    return {
+        "status": "success",
+        "records_added": records_added,
+        "date_range": {
+            "start": df['date'].min().strftime("%Y-%m-%d"),
+            "end": df['date'].max().strftime("%Y-%m-%d")
+        }
+    }
+
 @app.post("/upload-csv", response_model=UploadResponse)
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(file: UploadFile = File(...), job_id: Optional[str] = None):
     """
     อัพโหลด CSV จาก EPPO
+    ติดตามความคืบหน้าได้ที่ /jobs/{job_id}/events (job_id จาก client หรือดูใน response)
     """
     try:
         # Save uploaded file
@@ -113,56 +285,49 @@ async def upload_csv(file: UploadFile = File(...)):
             content = await file.read()
             f.write(content)
         
-        # Load and process
-        df = load_eppo_csv(file_path)
-        
-        # Add to Qdrant
-        records_added = qdrant_service.add_price_data(df)
-        
-        return UploadResponse(
-            status="success",
-            records_added=records_added,
-            date_range={
-                "start": df['date'].min().strftime("%Y-%m-%d"),
-                "end": df['date'].max().strftime("%Y-%m-%d")
-            }
-        )
+        # ingest ใน threadpool เพื่อไม่ block event loop (SSE ส่ง event ได้ระหว่างทำงาน)
+        result, job_id = await run_in_threadpool(run_job, "upload-csv", job_id, ingest_csv, file_path)
+        return UploadResponse(**result, job_id=job_id)
     
     except Exception as e:
         logger.error(f"Upload failed: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+def ingest_url(url: str, progress=None) -> dict:
+    """ดาวน์โหลด CSV จาก URL แล้ว ingest"""
+    import requests
+    
+    response = requests.get(url)
+    response.raise_for_status()
+    if progress:
+        progress("downloaded", bytes=len(response.content))
+    
+    # Save to temp file
+    file_path = os.path.join(settings.data_dir, "temp_eppo.csv")
+    with open(file_path, 'wb') as f:
+        f.write(response.content)
+    
+    return ingest_csv(file_path, progress=progress)
+
 @app.post("/upload-csv-url")
-async def upload_csv_from_url(url: str):
+def upload_csv_from_url(
+    url: str,
+    background_tasks: BackgroundTasks,
+    job_id: Optional[str] = None,
+    background: bool = False
+):
     """
     โหลด CSV จาก URL (เช่น EPPO catalog)
+    background=true ตอบ 202 ทันที แล้วติดตามผลที่ /jobs/{job_id}/events
     """
+    if background:
+        job_id = progress_bus.start_job("upload-csv-url", job_id).job_id
+        background_tasks.add_task(run_job, "upload-csv-url", job_id, ingest_url, url, raise_errors=False)
+        return accepted(job_id)
+    
     try:
-        import requests
-        from io import StringIO
-        
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        # Save to temp file
-        file_path = os.path.join(settings.data_dir, "temp_eppo.csv")
-        with open(file_path, 'wb') as f:
-            f.write(response.content)
-        
-        # Load and process
-        df = load_eppo_csv(file_path)
-        
-        # Add to Qdrant
-        records_added = qdrant_service.add_price_data(df)
-        
-        return {
-            "status": "success",
-            "records_added": records_added,
-            "date_range": {
-                "start": df['date'].min().strftime("%Y-%m-%d"),
-                "end": df['date'].max().strftime("%Y-%m-%d")
-            }
-        }
+        result, job_id = run_job("upload-csv-url", job_id, ingest_url, url)
+        return {**result, "job_id": job_id}
     
     except Exception as e:
         logger.error(f"URL upload failed: {e}")
@@ -175,7 +340,7 @@ async def generate_sample_data():
     """
     try:
         df = prepare_sample_data()
-        records_added = qdrant_service.add_price_data(df)
+        records_added = await run_in_threadpool(ingest_prices, df)
         
         return {
             "status": "success",
@@ -193,8 +358,17 @@ async def generate_sample_data():
 async def add_price(data: PriceData):
     """
     เพิ่มราคาใหม่ทีละรายการ
+    ถ้าเปิด write-behind buffer จะตอบ 202 ทันทีแล้วเขียนลง Qdrant เป็น batch
     """
     try:
+        if price_buffer:
+            pd.to_datetime(data.date)  # validate ก่อนเข้า buffer
+            pending = price_buffer.add(data.model_dump())
+            return JSONResponse(
+                status_code=202,
+                content={"status": "queued", "date": data.date, "pending": pending}
+            )
+        
         df = pd.DataFrame([{
             'date': pd.to_datetime(data.date),
             'diesel': data.diesel,
@@ -205,87 +379,325 @@ async def add_price(data: PriceData):
             'lpg': data.lpg
         }])
         
-        qdrant_service.add_price_data(df)
+        await run_in_threadpool(ingest_prices, df)
         
         return {"status": "success", "date": data.date}
     
+    except BufferFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, int(settings.price_buffer_max_delay)))}
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/prices/buffer")
+async def get_price_buffer_stats():
+    """
+    สถานะของ write-behind buffer (pending, backpressure, flush latency)
+    """
+    if not price_buffer:
+        return {"enabled": False}
+    return {"enabled": True, **price_buffer.stats()}
+
+@app.post("/prices/flush")
+def flush_price_buffer():
+    """
+    flush record ที่ค้างใน buffer ทันที (sync handler: upsert ลง Qdrant รันใน threadpool ไม่ block event loop)
+    """
+    if not price_buffer:
+        return {"enabled": False, "flushed": 0}
+    
+    flushed = 0
+    while price_buffer.pending:
+        written = price_buffer.flush()
+        if not written:
+            raise HTTPException(status_code=503, detail=price_buffer.stats()["last_error"])
+        flushed += written
+    return {"enabled": True, "flushed": flushed}
+
+def train_fuel(fuel_type: str, retrain: bool, start_date: Optional[str], end_date: Optional[str],
+               force: bool = False, progress=None) -> dict:
+    """train model ของ fuel_type แล้วคืน response ของ /train"""
+    # Check if model exists
+    if predictor.model_exists(fuel_type) and not retrain:
+        return {
+            "status": "model_exists",
+            "message": f"Model for {fuel_type} already exists. Use retrain=true to force retrain.",
+            "fuel_type": fuel_type
+        }
+    
+    # Get data from Qdrant
+    df = qdrant_service.get_all_prices(
+        fuel_type=fuel_type,
+        start_date=start_date,
+        end_date=end_date
+    )
+    
+    if len(df) < 30:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Not enough data: {len(df)} records. Need at least 30."
+        )
+    if progress:
+        progress("loaded", rows=len(df))
+    
+    # Train model (ผลทั้งหมดมาจากค่าที่ train คืน ไม่ได้อ่านจาก state ของ predictor)
+    training = predictor.train(df, fuel_type=fuel_type, force=force, progress=progress)
+    if forecast_scheduler and training["retrained"]:
+        forecast_scheduler.trigger([fuel_type], reason="train")
+    
+    return {
+        "status": "trained",
+        "fuel_type": fuel_type,
+        "samples": len(df),
+        "metrics": training["metrics"],
+        "last_train_date": training["last_train_date"].strftime("%Y-%m-%d"),
+        "version": training["version"],
+        # retrained=false: ข้อมูลและ hyperparameters เหมือน model ล่าสุด ใช้ model เดิม
+        "retrained": training["retrained"],
+        "why_retrained": training["why"]
+    }
+
+# เวลาที่สั่ง retrain จาก change point ล่าสุดต่อ fuel_type
+last_change_retrain: dict = {}
+
+def retrain_on_change(change_points: list):
+    """retrain model ของ fuel ที่ยืนยัน change point แล้ว (เฉพาะที่มี model อยู่) ใน thread แยก"""
+    for fuel_type in sorted({e["fuel_type"] for e in change_points}):
+        if not predictor.model_exists(fuel_type):
+            continue
+        now = time.time()
+        if now - last_change_retrain.get(fuel_type, 0) < settings.anomaly_retrain_cooldown:
+            continue
+        last_change_retrain[fuel_type] = now
+        
+        # key เดียวกับ /train ที่ retrain ทั้งช่วง: รวมกับ request ที่เข้ามาพร้อมกันได้
+        key = (fuel_type, True, None, None, False)
+        def retrain(progress=None, fuel_type=fuel_type, key=key) -> dict:
+            result, _ = train_flight.do(key, train_fuel, fuel_type, True, None, None, False, progress=progress)
+            return result
+        
+        job_id = progress_bus.start_job("change-point-retrain").job_id
+        for event in change_points:
+            if event["fuel_type"] == fuel_type:
+                event["retrain_job_id"] = job_id
+        logger.info(f"Change point in {fuel_type}: retraining (job {job_id})")
+        threading.Thread(
+            target=run_job,
+            args=("change-point-retrain", job_id, retrain),
+            kwargs={"raise_errors": False},
+            name=f"retrain-{fuel_type}",
+            daemon=True
+        ).start()
+
 @app.post("/train")
-async def train_model(request: TrainingRequest, background_tasks: BackgroundTasks):
+def train_model(request: TrainingRequest, background_tasks: BackgroundTasks):
     """
     Train model สำหรับ fuel_type ที่ระบุ
+    ติดตามความคืบหน้า (optimizer iteration, ETA) ได้ที่ /jobs/{job_id}/events
     """
+    key = (request.fuel_type, request.retrain, request.start_date, request.end_date, request.force)
+    
+    def coalesced_train(progress=None) -> dict:
+        # call ที่ใช้ผลร่วมกับ call อื่นจะได้แค่ event done ตอนจบ
+        result, shared = train_flight.do(
+            key, train_fuel, request.fuel_type, request.retrain, request.start_date, request.end_date,
+            request.force, progress=progress
+        )
+        return {**result, "coalesced": shared}
+    
+    if request.background:
+        job_id = progress_bus.start_job("train", request.job_id).job_id
+        background_tasks.add_task(run_job, "train", job_id, coalesced_train, raise_errors=False)
+        return accepted(job_id)
+    
     try:
-        fuel_type = request.fuel_type
-        
-        # Check if model exists
-        if predictor.model_exists(fuel_type) and not request.retrain:
-            return {
-                "status": "model_exists",
-                "message": f"Model for {fuel_type} already exists. Use retrain=true to force retrain.",
-                "fuel_type": fuel_type
-            }
-        
-        # Get data from Qdrant
-        df = qdrant_service.get_all_prices(fuel_type=fuel_type)
-        
-        if len(df) < 30:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Not enough data: {len(df)} records. Need at least 30."
-            )
-        
-        # Train model
-        metrics = predictor.train(df, fuel_type=fuel_type)
-        
-        return {
-            "status": "trained",
-            "fuel_type": fuel_type,
-            "samples": len(df),
-            "metrics": metrics,
-            "last_train_date": predictor.last_train_date.strftime("%Y-%m-%d")
-        }
+        result, job_id = run_job("train", request.job_id, coalesced_train)
+        return {**result, "job_id": job_id}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Training failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/jobs")
+async def list_jobs():
+    """
+    job ingest / train ล่าสุดของ worker นี้ พร้อม event ล่าสุด
+    """
+    return {"pid": os.getpid(), "jobs": progress_bus.jobs()}
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events ของ job: ส่ง event ตั้งแต่เริ่ม job จนถึง done / error
+    (เปิด stream ก่อนส่ง request ที่มี job_id เดียวกันได้ ถ้า job เริ่มภายในไม่กี่วินาที ไม่อย่างนั้นตอบ 404)
+    """
+    if not await progress_bus.wait_for_job(job_id):
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+    async def event_stream():
+        try:
+            async for event in progress_bus.subscribe(job_id):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['stage']}\ndata: {dumps(event).decode('utf-8')}\n\n"
+        except LookupError:
+            # job ถูกดันออกจาก ProgressBus ระหว่างตรวจกับ subscribe
+            return
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/anomalies")
+def get_anomalies(
+    fuel_type: Optional[str] = None,
+    kind: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=10000)
+):
+    """
+    วันที่ถูก flag ว่าผิดปกติ (invalid / spike / change_point) จาก payload ใน Qdrant
+    พร้อม event ล่าสุดและ state ของ detector ใน worker นี้
+    """
+    try:
+        flagged = qdrant_service.get_anomalies(
+            fuel_type=fuel_type,
+            kind=kind,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit
+        )
+        return {
+            "enabled": anomaly_detector is not None,
+            "anomalies": flagged,
+            "recent_events": anomaly_detector.events(fuel_type, kind, limit) if anomaly_detector else [],
+            "detector": anomaly_detector.stats() if anomaly_detector else None
+        }
+    except Exception as e:
+        logger.error(f"Anomaly query failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/models")
+async def list_models():
+    """
+    model ที่มีบน disk และ version ที่ worker นี้โหลดไว้
+    """
+    models = predictor.store.list_models()
+    for manifest in models:
+        manifest["resident"] = predictor.model_info(manifest["fuel_type"]) or None
+    return {"pid": os.getpid(), "models": models}
+
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_price(request: PredictionRequest):
+def predict_price(request: PredictionRequest):
     """
     ทำนายราคาน้ำมัน
     """
     try:
         fuel_type = request.fuel_type
         
-        # Load model if not loaded
-        if predictor.fuel_type != fuel_type:
-            predictor.load_model(fuel_type)
-        
-        # Get current price
-        df = qdrant_service.get_all_prices(fuel_type=fuel_type, limit=1)
-        if len(df) == 0:
-            raise HTTPException(status_code=404, detail="No price data found")
+        if request.format == "columnar":
+            # array ตรงจาก predictor.predict_arrays (ไม่ผ่าน record ทีละวัน) จึงคำนวณสดจาก model ที่ resident
+            entry, shared = predict_flight.do(
+                (fuel_type, "columnar"), compute_forecast, fuel_type, MAX_HORIZON, columnar=True
+            )
+            source = "live"
+            predictions = {key: values[:request.horizon] for key, values in entry["predictions"].items()}
+        else:
+            # forecast คำนวณเต็ม horizon เสมอ key จึงเป็นแค่ fuel_type (horizon แค่ตัดผล)
+            (entry, source), shared = predict_flight.do(fuel_type, resolve_forecast, fuel_type)
+            predictions = entry["predictions"][:request.horizon]
         
-        current_price = float(df[fuel_type].iloc[-1])
+        response = {
+            "fuel_type": fuel_type,
+            "current_price": entry["current_price"],
+            "predictions": predictions,
+            "model_info": {
+                "version": entry["model_version"],
+                "last_train_date": entry["last_train_date"],
+                "source": source,
+                "computed_at": datetime.fromtimestamp(entry["computed_at"]).isoformat(),
+                "coalesced": shared
+            }
+        }
         
-        # Predict
-        predictions = predictor.predict(periods=request.horizon)
+        if request.format == "columnar":
+            # ข้าม response_model: serialize ตรงด้วย orjson
+            return FastJSONResponse(response)
+        return response
+    
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model for {request.fuel_type} not found. Please train first."
+        )
+    except Exception as e:
+        logger.error(f"Prediction failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def compute_distribution(request: DistributionRequest) -> dict:
+    """forecast แบบ probabilistic (Monte-Carlo ที่ cache ต่อ model version)"""
+    predictor.ensure_current(request.fuel_type)
+    columns = predictor.forecast_distribution(
+        periods=request.horizon,
+        quantiles=tuple(request.quantiles),
+        paths=request.paths,
+        seed=request.seed,
+        sample_paths=request.sample_paths,
+        fuel_type=request.fuel_type
+    )
+    info = predictor.model_info(request.fuel_type)
+    return {"columns": columns, "model_info": {"version": info["version"], "last_train_date": info["last_train_date"]}}
+
+@app.post("/predict/distribution")
+def predict_distribution(request: DistributionRequest):
+    """
+    ทำนายราคาแบบ probabilistic: simulate path ของ model ที่ fit แล้ว (ครั้งเดียวทุก path)
+    แล้วคืน mean / std / quantile ที่ขอต่อวัน และสรุปของ path (ราคาวันสุดท้าย, สูงสุด / ต่ำสุด, prob_above_last)
+
+    path matrix ถูก cache ต่อ model version ตาม (paths, seed): ขอ quantile / horizon อื่นซ้ำไม่ต้อง simulate ใหม่
+    """
+    try:
+        key = ("distribution", request.fuel_type, request.horizon, tuple(request.quantiles),
+               request.paths, request.seed, request.sample_paths)
+        result, shared = predict_flight.do(key, compute_distribution, request)
+        columns = result["columns"]
         
-        prediction_results = [
-            PredictionResult(**pred) for pred in predictions
-        ]
+        if request.format == "columnar":
+            predictions = {k: columns[k] for k in ("day", "date", "mean", "std", "quantiles")}
+        else:
+            quantiles = {label: values.tolist() for label, values in columns["quantiles"].items()}
+            predictions = [
+                {
+                    "day": day,
+                    "date": date,
+                    "mean": mean,
+                    "std": std,
+                    "quantiles": {label: values[i] for label, values in quantiles.items()}
+                }
+                for i, (day, date, mean, std) in enumerate(zip(
+                    columns["day"].tolist(), columns["date"].tolist(),
+                    columns["mean"].tolist(), columns["std"].tolist()
+                ))
+            ]
         
-        return PredictionResponse(
-            fuel_type=fuel_type,
-            current_price=current_price,
-            predictions=prediction_results,
-            model_info={
-                "last_train_date": predictor.last_train_date.strftime("%Y-%m-%d")
-            }
-        )
+        return FastJSONResponse({
+            "fuel_type": request.fuel_type,
+            "predictions": predictions,
+            "summary": columns["summary"],
+            "sample_paths": columns["sample_paths"],
+            "model_info": {**result["model_info"], "coalesced": shared}
+        })
     
     except FileNotFoundError:
         raise HTTPException(
@@ -293,35 +705,294 @@ async def predict_price(request: PredictionRequest):
             detail=f"Model for {request.fuel_type} not found. Please train first."
         )
     except Exception as e:
-        logger.error(f"Prediction failed: {e}")
+        logger.error(f"Distribution forecast failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    สถิติ singleflight ของ /predict และ /train (coalescing_ratio = สัดส่วน call ที่ใช้ผลร่วมกัน)
+    """
+    return {
+        "pid": os.getpid(),
+        "singleflight": {
+            flight.name: flight.stats() for flight in (predict_flight, train_flight)
+        }
+    }
+
+@app.get("/debug/memory")
+def get_memory_profile(
+    limit: int = Query(default=20, ge=1, le=500),
+    group_by: str = "lineno",
+    since_start: bool = False,
+    scope: Optional[str] = None
+):
+    """
+    หน่วยความจำของ worker นี้: RSS, ขนาด model ที่ resident, span ล่าสุดของ
+    add_price_data / get_all_prices / train / load_model และ allocation site ที่ใหญ่สุด
+
+    - ต้องเปิด profiling ก่อน (MEMORY_PROFILING_ENABLED=true หรือ POST /debug/memory/start)
+      ไม่งั้นมีแค่ RSS และขนาด model
+    - group_by: lineno | filename | traceback
+    - since_start=true แสดงเฉพาะ allocation ที่โตขึ้นตั้งแต่เปิด profiling
+    """
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by '{group_by}'. Choose one of {', '.join(GROUP_BY)}")
+    return {
+        "pid": os.getpid(),
+        **memory_profiler.stats(),
+        "models": predictor.resident_memory(),
+        "spans": memory_profiler.spans(scope=scope, limit=limit),
+        "top_allocations": memory_profiler.top(limit=limit, group_by=group_by, since_start=since_start)
+    }
+
+@app.post("/debug/memory/start")
+def start_memory_profiling(frames: int = Query(default=1, ge=1, le=50)):
+    """
+    เปิด tracemalloc + sample ตาม stage (ช้าลงระหว่างเปิด ใช้ตอน debug)
+    """
+    memory_profiler.start(frames)
+    return {"pid": os.getpid(), "enabled": True, "frames": memory_profiler.frames}
+
+@app.post("/debug/memory/stop")
+def stop_memory_profiling():
+    """
+    ปิด profiling (span ที่เก็บไว้ยังดูได้)
+    """
+    memory_profiler.stop()
+    return {"pid": os.getpid(), "enabled": False}
+
+@app.get("/forecasts")
+async def list_forecasts():
+    """
+    forecast ที่ precompute ไว้ในตาราง และสถานะของ scheduler
+    """
+    if not forecast_table:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "forecasts": forecast_table.list(),
+        "scheduler": forecast_scheduler.stats
+    }
+
+@app.post("/forecasts/refresh")
+async def refresh_forecasts(fuel_type: Optional[str] = None):
+    """
+    สั่ง precompute forecast ใหม่ (ไม่ระบุ fuel_type = ทุก model)
+    """
+    if not forecast_scheduler:
+        raise HTTPException(status_code=400, detail="Forecast precompute is disabled")
+    forecast_scheduler.trigger([fuel_type] if fuel_type else None, reason="api")
+    return {"status": "scheduled", "fuel_type": fuel_type or "all"}
+
+@app.post("/predict/panel", response_model=PanelPredictionResponse)
+def predict_panel(request: PanelPredictionRequest):
+    """
+    ทำนายราคาทุก (Item, Country) ใน EPPO long-format dataset พร้อมกันใน call เดียว
+    (sync handler: อ่าน CSV และ fit ทั้ง panel ใน threadpool ไม่ block event loop)
+    """
+    file_name = os.path.basename(request.data_file or settings.panel_data_file)
+    file_path = os.path.join(settings.data_dir, file_name)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail=f"Data file {file_name} not found")
+    
+    try:
+        panel = load_eppo_long_csv(
+            file_path,
+            freq=settings.panel_frequency,
+            items=request.items,
+            countries=request.countries
+        )
+        options = dict(
+            horizon=request.horizon,
+            confidence=request.confidence,
+            seasonal_periods=request.seasonal_periods,
+            damped=request.damped
+        )
+        
+        if request.format == "columnar":
+            columns = forecast_panel_columns(panel, **options)
+            return FastJSONResponse({
+                "frequency": settings.panel_frequency,
+                "last_date": panel.index[-1].strftime("%Y-%m-%d"),
+                "series_count": len(columns["series"]),
+                "forecasts": columns
+            })
+        
+        forecasts = forecast_panel(panel, **options)
+        return PanelPredictionResponse(
+            frequency=settings.panel_frequency,
+            last_date=panel.index[-1].strftime("%Y-%m-%d"),
+            series_count=len(forecasts),
+            forecasts=forecasts
+        )
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Panel prediction failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/search")
 async def search_similar_prices(
     price: float,
     fuel_type: str = "diesel",
-    limit: int = 5
+    limit: int = 5,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    format: str = "records"
 ):
     """
-    ค้นหาวันที่มีราคาใกล้เคียง
+    ค้นหาวันที่มีราคาใกล้เคียง (filter ช่วงวันที่ / ปี / เดือนได้)
+    format=columnar คืน similar_dates เป็น array ขนานกันต่อ field
     """
     try:
+        check_format(format)
         results = qdrant_service.search_similar_prices(
             price=price,
             fuel_type=fuel_type,
-            limit=limit
+            limit=limit,
+            start_date=start_date,
+            end_date=end_date,
+            year=year,
+            month=month
+        )
+        if format == "columnar":
+            return FastJSONResponse({"similar_dates": to_columns(results)})
+        return FastJSONResponse({"similar_dates": results})
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/search/conditions")
+async def search_market_conditions(
+    date: str,
+    limit: int = 5,
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    """
+    ค้นหาวันในอดีตที่สภาวะตลาด (ราคาทุกประเภท + แนวโน้ม + ความผันผวน) คล้ายกับวันที่ระบุ
+    """
+    try:
+        results = qdrant_service.search_market_conditions(
+            date=date,
+            limit=limit,
+            year=year,
+            month=month,
+            start_date=start_date,
+            end_date=end_date
         )
-        return {"similar_dates": results}
+        return {"date": date, "similar_conditions": results}
     
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Condition search failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/prices/history")
+def get_price_history(
+    fuel_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    interval: str = "auto",
+    points: int = Query(default=300, ge=3, le=5000),
+    format: str = "records"
+):
+    """
+    ประวัติราคาสำหรับกราฟ: OHLC ราย day / week / month ไม่เกิน points จุดต่อ fuel_type
+
+    - fuel_type: คั่นด้วย comma ได้ (ไม่ระบุ = ทุกประเภท)
+    - interval: auto | day | week | month (auto = ละเอียดที่สุดที่ไม่เกิน points)
+    - ถ้ายังเกิน points จะลดจุดด้วย LTTB
+    - format=columnar คืน data เป็น array ขนานกัน (date / open / high / low / close)
+    """
+    try:
+        check_format(format)
+        fuel_types = [f.strip() for f in fuel_type.split(",") if f.strip()] if fuel_type else None
+        return FastJSONResponse(price_history.history(
+            fuel_types=fuel_types,
+            start_date=start_date,
+            end_date=end_date,
+            interval=interval,
+            points=points,
+            columnar=format == "columnar"
+        ))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Price history failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/prices/history/cache")
+async def get_price_history_cache():
+    """
+    สถานะ cache ของ /prices/history
+    """
+    return price_history.stats()
+
+@app.get("/analytics")
+def get_analytics(
+    fuel_type: Optional[str] = None,
+    base: str = "diesel",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    window: int = Query(default=30, ge=2, le=365),
+    max_lag: int = Query(default=30, ge=0, le=365),
+    points: int = Query(default=300, ge=3, le=5000)
+):
+    """
+    analytics ข้ามเชื้อเพลิง: spread (fuel - base), rolling correlation matrix ของ log return
+    และ lead / lag จาก cross-correlation (best_lag บวก = fuel แรกของคู่นำ)
+
+    - fuel_type: คั่นด้วย comma ได้ (ไม่ระบุ = ทุกประเภท)
+    - ผลถูก cache จนกว่าจะมี ingest ใหม่
+    """
+    try:
+        fuel_types = [f.strip() for f in fuel_type.split(",") if f.strip()] if fuel_type else None
+        return FastJSONResponse(price_analytics.compute(
+            fuel_types=fuel_types,
+            base=base,
+            start_date=start_date,
+            end_date=end_date,
+            window=window,
+            max_lag=max_lag,
+            points=points
+        ))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        logger.error(f"Analytics failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/analytics/cache")
+async def get_analytics_cache():
+    """
+    สถานะ cache ของ /analytics
+    """
+    return price_analytics.stats()
+
 @app.get("/prices/latest")
-async def get_latest_prices():
+async def get_latest_prices(format: str = "records"):
     """
     ดึงราคาล่าสุดของทุกประเภท
+    format=columnar คืน fuel_type / price / date เป็น array ขนานกัน
     """
     try:
+        check_format(format)
         fuel_types = ['diesel', 'gasohol_95', 'gasohol_91', 'lpg']
         latest_prices = {}
         
@@ -336,8 +1007,15 @@ async def get_latest_prices():
             except:
                 continue
         
-        return {"latest_prices": latest_prices}
+        if format == "columnar":
+            return FastJSONResponse({"latest_prices": {
+                "fuel_type": list(latest_prices),
+                **to_columns(list(latest_prices.values()), ["price", "date"])
+            }})
+        return FastJSONResponse({"latest_prices": latest_prices})
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,116 @@
+# manage.py
+"""
+คำสั่งดูแลระบบ (รันจาก backend/)
+
+    python manage.py profiles
+    python manage.py migrate --profile scalar
+    python manage.py snapshot --output snapshots/oil_prices.tar.gz
+    python manage.py restore --input snapshots/oil_prices.tar.gz [--replace]
+"""
+import argparse
+import json
+import logging
+
+from qdrant_client import QdrantClient
+
+from config import settings
+from services.collection_profiles import COLLECTION_PROFILES
+from services.embeddings import create_encoder
+from services.qdrant_service import QdrantService
+from services.snapshot import export_snapshot, import_snapshot
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+def _qdrant_service() -> QdrantService:
+    return QdrantService(
+        host=settings.qdrant_host,
+        port=settings.qdrant_port,
+        collection_name=settings.collection_name,
+        encoder=create_encoder(
+            backend=settings.embedding_backend,
+            model_name=settings.embedding_model,
+            onnx_model_path=settings.onnx_model_path,
+            dimension=settings.embedding_dim
+        ),
+        profile=settings.collection_profile
+    )
+
+
+def _embedding_info() -> dict:
+    """embedding ที่ใช้สร้าง vector (เก็บใน snapshot เพื่อเตือนเมื่อ restore ข้าม backend)"""
+    return {
+        "backend": settings.embedding_backend,
+        "model": settings.embedding_model if settings.embedding_backend != "hashing" else None,
+        "dimension": settings.embedding_dim if settings.embedding_backend == "hashing" else None,
+    }
+
+
+def cmd_profiles(args):
+    for name, profile in COLLECTION_PROFILES.items():
+        print(f"{name:8s} {profile['description']}")
+
+
+def cmd_migrate(args):
+    result = _qdrant_service().migrate_collection(args.profile, batch_size=args.batch_size)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"Set COLLECTION_PROFILE={args.profile} so new collections use the same profile.")
+
+
+def cmd_snapshot(args):
+    # ไม่สร้าง QdrantService: export / restore ไม่ต้องโหลด embedding model
+    client = QdrantClient(host=settings.qdrant_host, port=settings.qdrant_port)
+    result = export_snapshot(
+        client, settings.collection_name, settings.model_dir, args.output,
+        batch_size=args.batch_size, embedding=_embedding_info()
+    )
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+def cmd_restore(args):
+    client = QdrantClient(host=settings.qdrant_host, port=settings.qdrant_port)
+    result = import_snapshot(
+        client, settings.collection_name, settings.model_dir, args.input,
+        profile_name=args.profile or settings.collection_profile,
+        batch_size=args.batch_size,
+        parallel=args.parallel,
+        replace=args.replace,
+        embedding=_embedding_info(),
+        forecast_db_path=settings.forecast_db_path
+    )
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("profiles", help="แสดง collection profiles").set_defaults(func=cmd_profiles)
+
+    migrate = subparsers.add_parser("migrate", help="rebuild collection ด้วย profile ใหม่")
+    migrate.add_argument("--profile", required=True, choices=list(COLLECTION_PROFILES))
+    migrate.add_argument("--batch-size", type=int, default=512)
+    migrate.set_defaults(func=cmd_migrate)
+
+    snapshot = subparsers.add_parser("snapshot", help="export collection + model metadata + model files เป็น .tar.gz")
+    snapshot.add_argument("--output", required=True)
+    snapshot.add_argument("--batch-size", type=int, default=1024)
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    restore = subparsers.add_parser("restore", help="restore snapshot เข้า Qdrant (ไม่ encode ใหม่)")
+    restore.add_argument("--input", required=True)
+    restore.add_argument("--profile", choices=list(COLLECTION_PROFILES), help="ค่าเริ่มต้น: COLLECTION_PROFILE")
+    restore.add_argument("--batch-size", type=int, default=1024)
+    restore.add_argument("--parallel", type=int, default=4, help="จำนวน process ที่ upload พร้อมกัน")
+    restore.add_argument("--replace", action="store_true", help="แทนที่ collection และ model files ที่มีอยู่")
+    restore.set_defaults(func=cmd_restore)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# models/model_store.py
+import json
+import logging
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class ModelStore:
+    """
+    เก็บ model file แบบ versioned ที่ปลอดภัยเมื่อรันหลาย worker
+
+    - เขียนลงไฟล์ชั่วคราวใน directory เดียวกันแล้ว os.replace (atomic) จึงไม่มีใครอ่านไฟล์ครึ่งๆ
+    - manifest ({fuel_type}_model.json) เก็บเลข version และเวลาที่ save
+    - token() ใช้แค่ os.stat (inode + mtime) ให้ทุก worker เช็คได้ทุก request ว่า model เปลี่ยนหรือยัง
+    """
+
+    def __init__(self, model_dir: str = "./models"):
+        self.model_dir = model_dir
+        os.makedirs(model_dir, exist_ok=True)
+
+    def model_path(self, fuel_type: str) -> str:
+        return os.path.join(self.model_dir, f"{fuel_type}_model.pkl")
+
+    def manifest_path(self, fuel_type: str) -> str:
+        return os.path.join(self.model_dir, f"{fuel_type}_model.json")
+
+    def exists(self, fuel_type: str) -> bool:
+        return os.path.exists(self.model_path(fuel_type))
+
+    def token(self, fuel_type: str) -> Optional[Tuple[int, int, int]]:
+        """ตัวระบุ version ของไฟล์แบบถูกๆ (None ถ้ายังไม่มี model)"""
+        try:
+            st = os.stat(self.model_path(fuel_type))
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def manifest(self, fuel_type: str) -> Dict:
+        try:
+            with open(self.manifest_path(fuel_type), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # model ที่ save ก่อนมี manifest
+            return {"fuel_type": fuel_type, "version": 0} if self.exists(fuel_type) else {}
+
+    def list_models(self) -> List[Dict]:
+        suffix = "_model.pkl"
+        fuel_types = sorted(
+            name[:-len(suffix)] for name in os.listdir(self.model_dir) if name.endswith(suffix)
+        )
+        return [self.manifest(fuel_type) for fuel_type in fuel_types]
+
+    @contextmanager
+    def _lock(self, fuel_type: str):
+        """file lock ข้าม process สำหรับคนเขียน model เดียวกัน"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.model_dir, f"{fuel_type}_model.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _atomic_write(self, path: str, write) -> Tuple[int, int, int]:
+        """เขียนไฟล์ชั่วคราวแล้ว rename ทับ คืน token ของไฟล์ที่เขียน"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.model_dir, prefix=".tmp-", suffix=os.path.basename(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+                st = os.fstat(f.fileno())
+            os.replace(tmp_path, path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save(self, fuel_type: str, data: Dict) -> Tuple[Dict, Tuple[int, int, int]]:
+        """save model แบบ atomic แล้วคืน (manifest, token) ของ version ใหม่"""
+        with self._lock(fuel_type):
+            version = int(self.manifest(fuel_type).get("version", 0)) + 1
+            manifest = {
+                "fuel_type": fuel_type,
+                "version": version,
+                "saved_at": data.get("metadata", {}).get("created_at"),
+                "pid": os.getpid(),
+            }
+            # fingerprint / hyperparameters / metrics ของการ train ให้เช็คได้โดยไม่ต้อง unpickle model
+            for key in ("fingerprint", "hyperparameters", "metrics"):
+                if data.get("metadata", {}).get(key) is not None:
+                    manifest[key] = data["metadata"][key]
+            data = {**data, "version": version}
+
+            token = self._atomic_write(self.model_path(fuel_type), lambda f: pickle.dump(data, f))
+            self._atomic_write(
+                self.manifest_path(fuel_type),
+                lambda f: f.write(json.dumps(manifest, ensure_ascii=False, default=str).encode("utf-8"))
+            )
+
+            if hasattr(os, "O_DIRECTORY"):
+                dir_fd = os.open(self.model_dir, os.O_DIRECTORY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+
+        logger.info(f"Saved {fuel_type} model version {version}")
+        return manifest, token
+
+    def load(self, fuel_type: str) -> Tuple[Dict, Tuple[int, int, int]]:
+        """โหลด model คืน (data, token) โดย token ตรงกับไฟล์ที่อ่านจริง"""
+        path = self.model_path(fuel_type)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model for {fuel_type} not found at {path}")
+
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = pickle.load(f)
+
+        data.setdefault("version", 0)
+        return data, (st.st_ino, st.st_mtime_ns, st.st_size)
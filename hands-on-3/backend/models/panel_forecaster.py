@@ -0,0 +1,233 @@
+# models/panel_forecaster.py
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class PanelForecaster:
+    """
+    Holt-Winters / ETS(A,Ad,A) แบบ vectorized สำหรับหลาย series พร้อมกัน
+
+    รับ matrix ขนาด (series x time) แล้ว fit ทุก series ใน loop เวลาเดียว
+    state ทุกตัวเป็น array (series x parameter candidates) จึงหา parameter
+    ของทุก series ด้วย grid search ที่ broadcast ใน NumPy แทนการเรียก statsmodels ทีละ series
+
+    ค่าที่หายไป (NaN) ไม่นับใน SSE และ state เดินต่อโดยไม่ update (error = 0)
+    """
+
+    def __init__(
+        self,
+        seasonal_periods: Optional[int] = None,
+        damped: bool = True,
+        grid_size: int = 8,
+        refine_steps: int = 2
+    ):
+        self.seasonal_periods = seasonal_periods
+        self.damped = damped
+        self.grid_size = grid_size
+        self.refine_steps = refine_steps
+
+        self.params_: Dict[str, np.ndarray] = {}
+        self.state_: Dict[str, np.ndarray] = {}
+        self.sigma_: Optional[np.ndarray] = None
+        self.n_obs_: Optional[np.ndarray] = None
+
+    # ---------- core recursion ----------
+
+    def _run(self, Y: np.ndarray, alpha, beta, gamma, phi, keep_state: bool = False):
+        """
+        รัน recursion กับทุก series x ทุก candidate พร้อมกัน
+        Y: (S, T), parameter: (S, P) คืน SSE (S, P) (และ state สุดท้ายถ้า keep_state)
+        """
+        S, T = Y.shape
+        P = alpha.shape[1]
+        m = self.seasonal_periods or 0
+
+        observed = ~np.isnan(Y)
+        first_idx = np.argmax(observed, axis=1)
+        first_val = Y[np.arange(S), first_idx]
+
+        level = np.repeat(first_val[:, None], P, axis=1)
+        trend = np.zeros((S, P))
+        season = np.zeros((m, S, P)) if m else None
+        sse = np.zeros((S, P))
+
+        for t in range(T):
+            y = Y[:, t][:, None]
+            s_prev = season[t % m] if m else 0.0
+            damped_trend = phi * trend
+            yhat = level + damped_trend + s_prev
+
+            error = np.where(observed[:, t][:, None], y - yhat, 0.0)
+            sse += error ** 2
+
+            level = level + damped_trend + alpha * error
+            trend = damped_trend + beta * error
+            if m:
+                season[t % m] = s_prev + gamma * error
+
+        if keep_state:
+            return sse, level, trend, season
+        return sse
+
+    def _candidates(self, S: int, centers: Optional[Dict[str, np.ndarray]], width: float):
+        """สร้าง grid ของ parameter (S, P) รอบ centers (None = grid เต็มช่วง)"""
+        def axis(name, low, high, n=self.grid_size):
+            if centers is None:
+                return np.broadcast_to(np.linspace(low, high, n), (S, n))
+            c = centers[name][:, None]
+            return np.clip(c + np.linspace(-width, width, n)[None, :] * (high - low), low, high)
+
+        axes = {"alpha": axis("alpha", 0.02, 0.98), "beta_ratio": axis("beta_ratio", 0.0, 1.0)}
+        # phi / gamma ใช้ grid หยาบกว่า เพื่อให้จำนวน candidate ไม่โตเป็นกำลังสี่
+        coarse = max(self.grid_size // 2, 2)
+        axes["phi"] = axis("phi", 0.8, 0.995, coarse) if self.damped else np.ones((S, 1))
+        axes["gamma"] = axis("gamma", 0.0, 0.5, coarse) if self.seasonal_periods else np.zeros((S, 1))
+
+        # cartesian product ต่อ series -> (S, P)
+        names = list(axes)
+        grids = np.meshgrid(*[np.arange(axes[k].shape[1]) for k in names], indexing="ij")
+        flat = {k: np.take_along_axis(axes[k], g.ravel()[None, :].repeat(S, axis=0), axis=1)
+                for k, g in zip(names, grids)}
+        return flat
+
+    def fit(self, Y: np.ndarray) -> "PanelForecaster":
+        """fit ทุก series ใน Y (S, T) ด้วย vectorized grid search + refinement"""
+        Y = np.asarray(Y, dtype=float)
+        S = Y.shape[0]
+
+        best = None
+        width = 0.5
+        for step in range(self.refine_steps + 1):
+            cand = self._candidates(S, best, width)
+            # beta <= alpha (ETS admissible region แบบง่าย)
+            beta = cand["beta_ratio"] * cand["alpha"]
+            sse = self._run(Y, cand["alpha"], beta, cand["gamma"], cand["phi"])
+
+            pick = np.argmin(sse, axis=1)[:, None]
+            best = {k: np.take_along_axis(v, pick, axis=1)[:, 0] for k, v in cand.items()}
+            width /= self.grid_size / 2
+
+        self.params_ = {
+            "alpha": best["alpha"],
+            "beta": best["beta_ratio"] * best["alpha"],
+            "phi": best["phi"],
+            "gamma": best["gamma"],
+        }
+        p = {k: v[:, None] for k, v in self.params_.items()}
+        sse, level, trend, season = self._run(Y, p["alpha"], p["beta"], p["gamma"], p["phi"], keep_state=True)
+
+        self.n_obs_ = (~np.isnan(Y)).sum(axis=1)
+        self.sigma_ = np.sqrt(sse[:, 0] / np.maximum(self.n_obs_ - 1, 1))
+        self.state_ = {
+            "level": level[:, 0],
+            "trend": trend[:, 0],
+            "season": season[:, :, 0].T if season is not None else None,
+            "T": Y.shape[1],
+        }
+        return self
+
+    def forecast(self, horizon: int, confidence: float = 0.95) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """คืน (mean, lower, upper) ขนาด (S, horizon) พร้อม analytic prediction interval ของ ETS"""
+        if not self.params_:
+            raise ValueError("Model not fitted. Call fit() first.")
+
+        alpha, beta, phi, gamma = (self.params_[k][:, None] for k in ("alpha", "beta", "phi", "gamma"))
+        h = np.arange(1, horizon + 1)[None, :]
+        m = self.seasonal_periods or 0
+
+        # sum_{i=1..h} phi^i
+        phi_cum = np.cumsum(phi ** h, axis=1)
+        mean = self.state_["level"][:, None] + phi_cum * self.state_["trend"][:, None]
+        if m:
+            season_idx = (self.state_["T"] + h[0] - 1) % m
+            mean = mean + self.state_["season"][:, season_idx]
+
+        # var_h = sigma^2 * (1 + sum_{j=1}^{h-1} c_j^2), c_j = alpha + beta*sum phi^i + gamma*[j % m == 0]
+        c = alpha + beta * phi_cum
+        if m:
+            c = c + gamma * ((h % m) == 0)
+        c_sq_cum = np.concatenate([np.zeros((c.shape[0], 1)), np.cumsum(c ** 2, axis=1)[:, :-1]], axis=1)
+        std = self.sigma_[:, None] * np.sqrt(1 + c_sq_cum)
+
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return mean, mean - z * std, mean + z * std
+
+
+def _fit_panel(panel, horizon, confidence, seasonal_periods, damped):
+    panel = panel.dropna(axis=1, how='all')
+    Y = panel.to_numpy(dtype=float).T
+    model = PanelForecaster(seasonal_periods=seasonal_periods, damped=damped).fit(Y)
+    mean, lower, upper = model.forecast(horizon, confidence=confidence)
+
+    step = panel.index[-1] - panel.index[-2] if len(panel.index) > 1 else pd.Timedelta(days=1)
+    dates = pd.DatetimeIndex([panel.index[-1] + step * (i + 1) for i in range(horizon)])
+    return panel, model, mean, lower, upper, dates
+
+
+def forecast_panel(
+    panel: pd.DataFrame,
+    horizon: int = 4,
+    confidence: float = 0.95,
+    seasonal_periods: Optional[int] = None,
+    damped: bool = True
+) -> List[Dict]:
+    """
+    forecast ทุก column ของ panel (index = วันที่ที่มีความถี่คงที่, column = series) ใน call เดียว
+    """
+    panel, model, mean, lower, upper, dates = _fit_panel(panel, horizon, confidence, seasonal_periods, damped)
+    last_observed = panel.apply(lambda col: col.last_valid_index())
+
+    results = []
+    for s, key in enumerate(panel.columns):
+        results.append({
+            "series": key,
+            "last_observed": last_observed[key].strftime("%Y-%m-%d") if pd.notna(last_observed[key]) else None,
+            "observations": int(model.n_obs_[s]),
+            "params": {k: round(float(v[s]), 4) for k, v in model.params_.items()},
+            "predictions": [
+                {
+                    "day": int((dates[i] - panel.index[-1]).days),
+                    "date": dates[i].strftime("%Y-%m-%d"),
+                    "predicted_price": round(float(mean[s, i]), 2),
+                    "lower_bound": round(float(lower[s, i]), 2),
+                    "upper_bound": round(float(upper[s, i]), 2),
+                }
+                for i in range(horizon)
+            ],
+        })
+    return results
+
+
+def forecast_panel_columns(
+    panel: pd.DataFrame,
+    horizon: int = 4,
+    confidence: float = 0.95,
+    seasonal_periods: Optional[int] = None,
+    damped: bool = True
+) -> Dict:
+    """
+    เหมือน forecast_panel แต่คืนแบบ columnar: วันที่ใช้ร่วมกันทุก series
+    และราคาเป็น matrix (series x horizon) จาก NumPy โดยตรง ไม่สร้าง dict ต่อจุด
+    """
+    panel, model, mean, lower, upper, dates = _fit_panel(panel, horizon, confidence, seasonal_periods, damped)
+    observed = panel.notna().to_numpy()
+    # แถวสุดท้ายที่มีค่าของแต่ละ series (-1 = ไม่มีเลย)
+    last_idx = np.where(observed.any(axis=0), len(panel) - 1 - np.argmax(observed[::-1], axis=0), -1)
+    index_dates = panel.index.strftime("%Y-%m-%d").to_numpy()
+
+    return {
+        "series": [str(key) for key in panel.columns],
+        "last_observed": [index_dates[i] if i >= 0 else None for i in last_idx.tolist()],
+        "observations": model.n_obs_,
+        "params": {k: v.round(4) for k, v in model.params_.items()},
+        "day": (dates - panel.index[-1]).days.to_numpy(),
+        "date": dates.strftime("%Y-%m-%d").to_numpy(),
+        "predicted_price": mean.round(2),
+        "lower_bound": lower.round(2),
+        "upper_bound": upper.round(2),
+    }
@@ -4,46 +4,123 @@ from statsmodels.tsa.holtwinters import ExponentialSmoothing
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
-import pickle
+import hashlib
+import inspect
 import os
-from typing import List, Dict, Tuple
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Dict, Tuple, Optional
 import logging
 
+from models.model_store import ModelStore
+from utils.memory import memory_profiler, deep_sizeof, MB
+
 logger = logging.getLogger(__name__)
 
+# จำนวน iteration สูงสุดของ optimizer ตอน fit SARIMA
+SARIMA_MAXITER = 200
+
+# Monte-Carlo: จำนวน path / seed default, horizon ต่ำสุดที่ simulate (ให้ทุก horizon ของ /predict ใช้ cache เดียวกัน)
+# และจำนวน path matrix ที่ cache ไว้ต่อ model version
+SIMULATION_PATHS = 2000
+SIMULATION_SEED = 0
+SIMULATION_MIN_PERIODS = 30
+MAX_CACHED_SIMULATIONS = 4
+
+def training_fingerprint(ts: pd.Series) -> Dict[str, Any]:
+    """
+    fingerprint ของ training series: จำนวนแถว, ช่วงวันที่ และ hash ของค่า
+
+    hash ต่อเดือน (วันที่ + ค่า float64) แล้วต่อกันเป็น hash chain
+    ถ้าข้อมูลเดือนไหนเปลี่ยน hash รวมจะเปลี่ยน และ fingerprint_diff บอกได้ว่าเดือนไหน
+    """
+    months = {}
+    chain = hashlib.blake2b(digest_size=16)
+    for period, chunk in ts.groupby(ts.index.to_period('M'), sort=True):
+        h = hashlib.blake2b(digest_size=8)
+        h.update(chunk.index.asi8.tobytes())
+        h.update(chunk.to_numpy(dtype=np.float64).tobytes())
+        months[str(period)] = h.hexdigest()
+        chain.update(h.digest())
+
+    return {
+        "rows": int(len(ts)),
+        "start_date": ts.index.min().strftime("%Y-%m-%d"),
+        "end_date": ts.index.max().strftime("%Y-%m-%d"),
+        "hash": chain.hexdigest(),
+        "months": months
+    }
+
+def fingerprint_diff(previous: Optional[Dict], current: Dict) -> Dict[str, Any]:
+    """สรุปว่าข้อมูลเปลี่ยนอะไรไปจาก fingerprint ของ model ก่อนหน้า"""
+    if not previous:
+        return {"reason": "no previous fingerprint"}
+
+    diff: Dict[str, Any] = {}
+    for key in ("rows", "start_date", "end_date"):
+        if previous.get(key) != current[key]:
+            diff[key] = {"before": previous.get(key), "after": current[key]}
+
+    before, after = previous.get("months", {}), current["months"]
+    added = sorted(set(after) - set(before))
+    removed = sorted(set(before) - set(after))
+    changed = sorted(m for m in set(before) & set(after) if before[m] != after[m])
+    if added:
+        diff["added_months"] = added
+    if removed:
+        diff["removed_months"] = removed
+    if changed:
+        diff["changed_months"] = changed
+    return diff
+
 class OilPricePredictor:
     """
     Time series predictor ใช้ SARIMA model
+
+    model ของแต่ละ fuel_type อยู่ใน _resident เท่านั้น (ไม่มี model "active" ร่วมกันใน instance)
+    entry ถูกแทนที่ทั้ง dict ตอน train / โหลด version ใหม่ จึงใช้จากหลาย thread พร้อมกันได้
     """
     
     def __init__(self, model_dir: str = "./models", qdrant_service=None):
         self.model_dir = model_dir
-        self.model = None
-        self.model_fit = None
         self.scaler = None
-        self.fuel_type = None
-        self.last_train_date = None
         self.qdrant_service = qdrant_service
+        self.store = ModelStore(model_dir)
 
-        os.makedirs(model_dir, exist_ok=True)
+        # model ที่โหลดไว้ใน process นี้: fuel_type -> {model_fit, last_train_date, version, token}
+        self._resident: Dict[str, Dict] = {}
+        self._simulation_lock = threading.Lock()
     
+    @memory_profiler.profiled("train", lambda args: {"fuel_type": args["fuel_type"]})
     def train(
         self, 
         df: pd.DataFrame, 
         fuel_type: str = "diesel",
         order: Tuple[int, int, int] = (1, 1, 1),
-        seasonal_order: Tuple[int, int, int, int] = (1, 1, 1, 7)
-    ) -> Dict[str, float]:
+        seasonal_order: Tuple[int, int, int, int] = (1, 1, 1, 7),
+        force: bool = False,
+        progress: Optional[Callable] = None
+    ) -> Dict[str, Any]:
         """
         Train SARIMA model
         
+        ถ้า fingerprint ของข้อมูลและ hyperparameters ตรงกับ model ล่าสุดบน disk
+        จะใช้ model เดิมและคืน metrics เดิมทันที (เว้นแต่ force=True)
+        
         Args:
             df: DataFrame with 'date' and fuel_type columns
             fuel_type: ประเภทเชื้อเพลิง
             order: (p, d, q) for ARIMA
             seasonal_order: (P, D, Q, s) for seasonal component
+            force: train ใหม่เสมอ
+            progress: callable(stage, done=..., total=..., **fields) รับความคืบหน้า
+                (iteration = จำนวน iteration ของ optimizer ที่ทำไปแล้ว)
+        
+        Returns:
+            {"metrics", "version", "last_train_date", "retrained", "why"}
+            (retrained=False = ใช้ model เดิม; why = สิ่งที่เปลี่ยนไปจาก model ก่อนหน้า)
         """
-        self.fuel_type = fuel_type
+        report = progress or (lambda *args, **kwargs: None)
         
         # เตรียมข้อมูล
         df = df.sort_values('date').copy()
@@ -54,12 +131,57 @@ class OilPricePredictor:
         
         if len(ts) < 30:
             raise ValueError(f"Not enough data: {len(ts)} records. Need at least 30.")
+        report("prepared", rows=len(ts))
+        memory_profiler.mark("prepared", rows=len(ts))
+        
+        fingerprint = training_fingerprint(ts)
+        hyperparameters = {"order": list(order), "seasonal_order": list(seasonal_order)}
+        previous = self.store.manifest(fuel_type)
+        
+        if force:
+            why = {"reason": "forced"}
+        else:
+            why = fingerprint_diff(previous.get("fingerprint"), fingerprint)
+            if previous.get("hyperparameters") not in (None, hyperparameters):
+                why["hyperparameters"] = {"before": previous["hyperparameters"], "after": hyperparameters}
+            if not why and previous.get("metrics") is not None:
+                # ข้อมูลเหมือนเดิมทุกแถว: ใช้ model เดิม
+                self.ensure_current(fuel_type)
+                entry = self._resident[fuel_type]
+                report("unchanged", version=entry['version'])
+                logger.info(f"Skip retrain {fuel_type}: data unchanged since version {entry['version']}")
+                return {
+                    "metrics": previous["metrics"],
+                    "version": entry['version'],
+                    "last_train_date": entry['last_train_date'],
+                    "retrained": False,
+                    "why": {}
+                }
+        
+        # state ของการ train เป็น local ทั้งหมดแล้วส่งเข้า save_model ตรงๆ
+        # (request อื่นใช้ model ของ fuel อื่นจาก _resident ระหว่าง fit ได้โดยไม่ชนกัน)
+        last_train_date = ts.index.max()
+        
+        def save(model_fit, metrics: Dict) -> Dict[str, Any]:
+            version = self.save_model(
+                fuel_type, model_fit, last_train_date, metrics,
+                fingerprint=fingerprint, hyperparameters=hyperparameters
+            )
+            report("saved", version=version)
+            memory_profiler.mark("saved", version=version)
+            return {
+                "metrics": metrics,
+                "version": version,
+                "last_train_date": last_train_date,
+                "retrained": True,
+                "why": why
+            }
         
         logger.info(f"Training with {len(ts)} records from {ts.index.min()} to {ts.index.max()}")
         
         try:
             # Train SARIMA
-            self.model = SARIMAX(
+            model = SARIMAX(
                 ts,
                 order=order,
                 seasonal_order=seasonal_order,
@@ -67,11 +189,20 @@ class OilPricePredictor:
                 enforce_invertibility=False
             )
             
-            self.model_fit = self.model.fit(disp=False, maxiter=200)
-            self.last_train_date = ts.index.max()
+            iterations = [0]
+            
+            def on_iteration(params):
+                iterations[0] += 1
+                report("iteration", done=iterations[0], total=SARIMA_MAXITER, model="SARIMA")
+            
+            model_fit = model.fit(disp=False, maxiter=SARIMA_MAXITER, callback=on_iteration)
+            # callback ถูกเก็บไว้ใน fit result ซึ่งจะ pickle ไม่ได้ตอน save
+            model_fit.mlefit.mle_settings.pop('callback', None)
+            report("fitted", model="SARIMA", iterations=iterations[0])
+            memory_profiler.mark("fitted", model="SARIMA")
             
             # Calculate metrics
-            predictions = self.model_fit.fittedvalues
+            predictions = model_fit.fittedvalues
             residuals = ts - predictions
             
             mae = np.mean(np.abs(residuals))
@@ -82,141 +213,336 @@ class OilPricePredictor:
                 "mae": float(mae),
                 "rmse": float(rmse),
                 "mape": float(mape),
-                "aic": float(self.model_fit.aic),
-                "bic": float(self.model_fit.bic)
+                "aic": float(model_fit.aic),
+                "bic": float(model_fit.bic)
             }
             
             # Save model
-            self.save_model()
+            result = save(model_fit, metrics)
             
             logger.info(f"Training completed. MAE: {mae:.3f}, RMSE: {rmse:.3f}, MAPE: {mape:.2f}%")
             
-            return metrics
+            return result
             
         except Exception as e:
             logger.error(f"Training failed: {e}")
             
             # Fallback to Exponential Smoothing
             logger.info("Falling back to Exponential Smoothing...")
-            self.model = ExponentialSmoothing(
+            report("fallback", model="ExponentialSmoothing", reason=str(e))
+            model = ExponentialSmoothing(
                 ts, 
                 seasonal_periods=7, 
                 trend='add', 
                 seasonal='add'
             )
-            self.model_fit = self.model.fit()
-            self.last_train_date = ts.index.max()
+            model_fit = model.fit()
+            memory_profiler.mark("fitted", model="ExponentialSmoothing")
             
-            predictions = self.model_fit.fittedvalues
+            predictions = model_fit.fittedvalues
             residuals = ts - predictions
             mae = np.mean(np.abs(residuals))
             
-            self.save_model()
-            
-            return {"mae": float(mae), "model": "ExponentialSmoothing"}
+            metrics = {"mae": float(mae), "model": "ExponentialSmoothing"}
+            return save(model_fit, metrics)
     
-    def predict(self, periods: int = 7, confidence: float = 0.95) -> List[Dict]:
+    def predict_arrays(
+        self, periods: int = 7, confidence: float = 0.95, fuel_type: Optional[str] = None
+    ) -> Dict[str, np.ndarray]:
         """
-        ทำนายราคา N วันข้างหน้า
+        ทำนายราคา N วันข้างหน้าแบบ columnar (array ละ field, ปัดทศนิยม 2 ตำแหน่ง)
         
         Args:
             periods: จำนวนวันที่ต้องการทำนาย
             confidence: confidence level สำหรับ interval
+            fuel_type: ใช้ model ที่ resident ของ fuel_type นี้ (ไม่ระบุ = model เดียวที่ resident อยู่)
+        
+        Returns:
+            dict ของ day / date / predicted_price / lower_bound / upper_bound
         """
-        if self.model_fit is None:
-            raise ValueError("Model not trained. Call train() first.")
+        model_fit, last_train_date, entry = self._fitted(fuel_type)
         
         try:
             # SARIMA forecast
-            if hasattr(self.model_fit, 'get_forecast'):
-                forecast_result = self.model_fit.get_forecast(steps=periods)
-                forecast = forecast_result.predicted_mean
-                conf_int = forecast_result.conf_int(alpha=1-confidence)
-                
-                predictions = []
-                for i in range(periods):
-                    pred_date = self.last_train_date + pd.Timedelta(days=i+1)
-                    predictions.append({
-                        'day': i + 1,
-                        'date': pred_date.strftime("%Y-%m-%d"),
-                        'predicted_price': round(float(forecast.iloc[i]), 2),
-                        'lower_bound': round(float(conf_int.iloc[i, 0]), 2),
-                        'upper_bound': round(float(conf_int.iloc[i, 1]), 2)
-                    })
+            if hasattr(model_fit, 'get_forecast'):
+                forecast_result = model_fit.get_forecast(steps=periods)
+                forecast = np.asarray(forecast_result.predicted_mean, dtype=float)
+                conf_int = np.asarray(forecast_result.conf_int(alpha=1-confidence), dtype=float)
+                lower, upper = conf_int[:, 0], conf_int[:, 1]
             else:
-                # Exponential Smoothing
-                forecast = self.model_fit.forecast(periods)
-                predictions = []
-                for i in range(periods):
-                    pred_date = self.last_train_date + pd.Timedelta(days=i+1)
-                    pred_value = float(forecast[i])
-                    # ประมาณ confidence interval (±2%)
-                    predictions.append({
-                        'day': i + 1,
-                        'date': pred_date.strftime("%Y-%m-%d"),
-                        'predicted_price': round(pred_value, 2),
-                        'lower_bound': round(pred_value * 0.98, 2),
-                        'upper_bound': round(pred_value * 1.02, 2)
-                    })
+                # Exponential Smoothing ไม่มี interval แบบ analytic: ใช้ quantile ของ simulation (cache ต่อ version)
+                forecast = np.asarray(model_fit.forecast(periods), dtype=float)
+                paths = self._simulate(entry, periods, SIMULATION_PATHS, SIMULATION_SEED)
+                lower, upper = np.quantile(paths, [(1 - confidence) / 2, (1 + confidence) / 2], axis=1)
             
-            return predictions
+            day = np.arange(1, periods + 1)
+            return {
+                'day': day,
+                'date': self._forecast_dates(last_train_date, periods),
+                'predicted_price': forecast.round(2),
+                'lower_bound': lower.round(2),
+                'upper_bound': upper.round(2)
+            }
             
         except Exception as e:
             logger.error(f"Prediction failed: {e}")
             raise
     
-    def save_model(self):
-        """บันทึก model metadata ลง Qdrant และ save model file local"""
-        if self.model_fit is None:
-            return
+    def _fitted(self, fuel_type: Optional[str]) -> Tuple[Any, Any, Dict]:
+        """
+        (model_fit, last_train_date, resident entry) ของ fuel_type จาก entry เดียวกัน
+        (ไม่ระบุ = model เดียวที่ resident อยู่)
+        """
+        if fuel_type is None and len(self._resident) == 1:
+            fuel_type = next(iter(self._resident))
+        entry = self._resident.get(fuel_type) if fuel_type is not None else None
+        if entry is None:
+            if fuel_type is None:
+                raise ValueError("fuel_type is required when more than one model is loaded.")
+            raise ValueError(f"Model for {fuel_type} not loaded. Call train() or load_model() first.")
+        return entry['model_fit'], entry['last_train_date'], entry
+
+    @staticmethod
+    def _forecast_dates(last_train_date, periods: int) -> np.ndarray:
+        day = np.arange(1, periods + 1)
+        return pd.DatetimeIndex(last_train_date + pd.to_timedelta(day, unit='D')).strftime("%Y-%m-%d").to_numpy()
+
+    def simulate_paths(
+        self,
+        periods: int,
+        paths: int = SIMULATION_PATHS,
+        seed: int = SIMULATION_SEED,
+        fuel_type: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Monte-Carlo ราคา periods วันข้างหน้า paths เส้นจาก model ที่ fit แล้ว (simulate ครั้งเดียวทุก path)
+
+        path matrix ถูก cache ไว้ใน model ที่ resident ตาม (paths, seed) และ simulate อย่างน้อย
+        SIMULATION_MIN_PERIODS วัน จึงทุก horizon / ทุก quantile ใช้ simulation เดียวกัน
+        โหลด model version ใหม่ = cache ใหม่
+
+        Returns:
+            array (periods x paths) อ่านได้อย่างเดียว
+        """
+        return self._simulate(self._fitted(fuel_type)[2], periods, paths, seed)
+
+    def _simulate(self, entry: Dict, periods: int, paths: int, seed: int) -> np.ndarray:
+        """simulate_paths ของ resident entry ที่ resolve แล้ว (forecast และ interval มาจาก model เดียวกัน)"""
+        model_fit = entry['model_fit']
+        key = (paths, seed)
+        with self._simulation_lock:
+            cache = entry.setdefault('simulations', OrderedDict())
+            cached = cache.get(key)
+            if cached is not None and cached.shape[0] >= periods:
+                cache.move_to_end(key)
+                return cached[:periods]
 
+        steps = max(periods, SIMULATION_MIN_PERIODS)
+        # statsmodels ใหม่รับ rng, รุ่นเก่ารับ random_state
+        rng_arg = "rng" if "rng" in inspect.signature(model_fit.simulate).parameters else "random_state"
+        simulated = model_fit.simulate(
+            steps, anchor='end', repetitions=paths, **{rng_arg: np.random.default_rng(seed)}
+        )
+        matrix = np.asarray(simulated, dtype=float).reshape(steps, paths)
+        matrix.setflags(write=False)
+
+        with self._simulation_lock:
+            cache[key] = matrix
+            cache.move_to_end(key)
+            while len(cache) > MAX_CACHED_SIMULATIONS:
+                cache.popitem(last=False)
+        return matrix[:periods]
+
+    def forecast_distribution(
+        self,
+        periods: int = 7,
+        quantiles: Tuple[float, ...] = (0.05, 0.25, 0.5, 0.75, 0.95),
+        paths: int = SIMULATION_PATHS,
+        seed: int = SIMULATION_SEED,
+        sample_paths: int = 0,
+        fuel_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        forecast แบบ probabilistic จาก simulate_paths (columnar)
+
+        Returns:
+            day / date / mean / std, quantiles (quantile -> array ต่อวัน),
+            summary ของ path (ราคาวันสุดท้าย, สูงสุด / ต่ำสุดในแต่ละ path, โอกาสที่ราคาวันสุดท้ายสูงกว่าราคาล่าสุด)
+            และ sample_paths (path ตัวอย่าง sample_paths เส้น)
+        """
+        model_fit, last_train_date, entry = self._fitted(fuel_type)
+        matrix = self._simulate(entry, periods, paths, seed)
+        qs = np.asarray(quantiles, dtype=float)
+        labels = [f"{q:g}" for q in qs]
+        last_observed = float(np.asarray(model_fit.model.endog).ravel()[-1])
+
+        # ทุก quantile ทุกวัน / ทุก path ในครั้งเดียว
+        levels = np.quantile(matrix, qs, axis=1)
+        final = matrix[-1]
+        extremes = np.quantile(np.stack([matrix.max(axis=0), matrix.min(axis=0)]), qs, axis=1)
+
+        return {
+            'day': np.arange(1, periods + 1),
+            'date': self._forecast_dates(last_train_date, periods),
+            'mean': matrix.mean(axis=1).round(2),
+            'std': matrix.std(axis=1).round(4),
+            'quantiles': {label: levels[i].round(2) for i, label in enumerate(labels)},
+            'summary': {
+                'paths': paths,
+                'seed': seed,
+                'last_observed': round(last_observed, 2),
+                'final': {
+                    'mean': round(float(final.mean()), 2),
+                    'std': round(float(final.std()), 4),
+                    'quantiles': dict(zip(labels, levels[:, -1].round(2).tolist())),
+                },
+                'path_max': dict(zip(labels, extremes[:, 0].round(2).tolist())),
+                'path_min': dict(zip(labels, extremes[:, 1].round(2).tolist())),
+                'prob_above_last': round(float((final > last_observed).mean()), 4),
+            },
+            'sample_paths': matrix[:, :sample_paths].T.round(2),
+        }
+
+    def predict(self, periods: int = 7, confidence: float = 0.95, fuel_type: Optional[str] = None) -> List[Dict]:
+        """
+        ทำนายราคา N วันข้างหน้า (หนึ่ง dict ต่อวัน)
+        
+        Args:
+            periods: จำนวนวันที่ต้องการทำนาย
+            confidence: confidence level สำหรับ interval
+            fuel_type: ใช้ model ที่ resident ของ fuel_type นี้ (ไม่ระบุ = model เดียวที่ resident อยู่)
+        """
+        columns = self.predict_arrays(periods=periods, confidence=confidence, fuel_type=fuel_type)
+        keys = list(columns)
+        return [dict(zip(keys, row)) for row in zip(*(columns[k].tolist() for k in keys))]
+    
+    def save_model(
+        self,
+        fuel_type: str,
+        model_fit,
+        last_train_date,
+        metrics: Optional[Dict] = None,
+        fingerprint: Optional[Dict] = None,
+        hyperparameters: Optional[Dict] = None
+    ) -> int:
+        """
+        บันทึก model metadata ลง Qdrant และ save model file local (atomic + versioned)
+        แล้วใช้เป็น model ที่ resident ของ fuel_type คืนเลข version ใหม่
+        """
         # Save model metadata to Qdrant
         model_metadata = {
-            'fuel_type': self.fuel_type,
-            'last_train_date': self.last_train_date.strftime("%Y-%m-%d") if hasattr(self.last_train_date, 'strftime') else str(self.last_train_date),
-            'model_type': 'SARIMA' if hasattr(self.model_fit, 'get_forecast') else 'ExponentialSmoothing',
-            'created_at': pd.Timestamp.now().isoformat()
+            'fuel_type': fuel_type,
+            'last_train_date': last_train_date.strftime("%Y-%m-%d") if hasattr(last_train_date, 'strftime') else str(last_train_date),
+            'model_type': 'SARIMA' if hasattr(model_fit, 'get_forecast') else 'ExponentialSmoothing',
+            'created_at': pd.Timestamp.now().isoformat(),
+            'fingerprint': fingerprint,
+            'hyperparameters': hyperparameters,
+            'metrics': metrics
+        }
+
+        # Save actual model to local filesystem (SARIMA models are too large for Qdrant)
+        manifest, token = self.store.save(fuel_type, {
+            'model_fit': model_fit,
+            'fuel_type': fuel_type,
+            'last_train_date': last_train_date,
+            'metadata': model_metadata
+        })
+        version = manifest['version']
+        model_metadata['version'] = version
+        self._resident[fuel_type] = {
+            'model_fit': model_fit,
+            'last_train_date': last_train_date,
+            'version': version,
+            'token': token
         }
 
         # Store in Qdrant for tracking
         if self.qdrant_service:
             try:
-                self.qdrant_service.store_model_metadata(self.fuel_type, model_metadata)
-                logger.info(f"Model metadata stored in Qdrant for {self.fuel_type}")
+                self.qdrant_service.store_model_metadata(fuel_type, model_metadata)
+                logger.info(f"Model metadata stored in Qdrant for {fuel_type}")
             except Exception as e:
                 logger.warning(f"Could not store metadata in Qdrant: {e}")
         else:
             logger.info("No qdrant_service provided, skipping metadata storage")
 
-        # Save actual model to local filesystem (SARIMA models are too large for Qdrant)
-        model_path = os.path.join(self.model_dir, f"{self.fuel_type}_model.pkl")
-        with open(model_path, 'wb') as f:
-            pickle.dump({
-                'model_fit': self.model_fit,
-                'fuel_type': self.fuel_type,
-                'last_train_date': self.last_train_date,
-                'metadata': model_metadata
-            }, f)
-
-        logger.info(f"Model saved to {model_path}")
+        logger.info(f"Model saved to {self.store.model_path(fuel_type)} (version {version})")
+        return version
 
+    @memory_profiler.profiled("load_model", lambda args: {"fuel_type": args["fuel_type"]})
     def load_model(self, fuel_type: str):
         """โหลด model จาก local file"""
-        model_path = os.path.join(self.model_dir, f"{fuel_type}_model.pkl")
+        traced_before = memory_profiler.traced_bytes()
+        data, token = self.store.load(fuel_type)
+        memory_profiler.mark("unpickled", version=data['version'])
 
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model for {fuel_type} not found at {model_path}")
+        entry = {
+            'model_fit': data['model_fit'],
+            'last_train_date': data['last_train_date'],
+            'version': data['version'],
+            'token': token
+        }
+        if traced_before is not None:
+            # รวม buffer ที่ extension type จองเองซึ่ง deep_sizeof มองไม่เห็น
+            entry['traced_bytes'] = memory_profiler.traced_bytes() - traced_before
+        # แทนที่ทั้ง entry: thread ที่ถือ entry เดิมอยู่ยังใช้ version เดิมจนจบ request
+        self._resident[fuel_type] = entry
+
+        logger.info(f"Model loaded from {self.store.model_path(fuel_type)} (version {data['version']})")
 
-        with open(model_path, 'rb') as f:
-            data = pickle.load(f)
+    def ensure_current(self, fuel_type: str) -> bool:
+        """
+        ให้ model ของ fuel_type ใน process นี้เป็น version ล่าสุดบน disk
+        (worker อื่นอาจ train ใหม่ไปแล้ว) เช็คด้วย os.stat อย่างเดียวถ้าไม่มีอะไรเปลี่ยน
 
-        self.model_fit = data['model_fit']
-        self.fuel_type = data['fuel_type']
-        self.last_train_date = data['last_train_date']
+        Returns:
+            True ถ้ามีการโหลด model ใหม่ (hot-swap)
+        """
+        token = self.store.token(fuel_type)
+        if token is None:
+            raise FileNotFoundError(f"Model for {fuel_type} not found at {self.store.model_path(fuel_type)}")
 
-        logger.info(f"Model loaded from {model_path}")
+        entry = self._resident.get(fuel_type)
+        if entry is not None and entry['token'] == token:
+            return False
+
+        self.load_model(fuel_type)
+        if entry is not None:
+            logger.info(f"Hot-swapped {fuel_type} model: version {entry['version']} -> {self._resident[fuel_type]['version']}")
+        return True
+
+    def model_info(self, fuel_type: str) -> Dict:
+        """ข้อมูลของ model ที่ resident อยู่ใน process นี้"""
+        entry = self._resident.get(fuel_type)
+        if entry is None:
+            return {}
+        return {
+            "version": entry['version'],
+            "last_train_date": entry['last_train_date'].strftime("%Y-%m-%d")
+        }
+
+    def resident_memory(self) -> Dict[str, Dict]:
+        """
+        ขนาดในหน่วยความจำของ model ที่ resident ใน process นี้ เทียบกับขนาดไฟล์ pickle
+        (เดินทั้ง object graph จึงคำนวณครั้งเดียวต่อ version ที่โหลด)
+
+        resident_mb มาจาก deep_sizeof (ค่าต่ำสุด); traced_at_load_mb คือหน่วยความจำที่ tracemalloc
+        นับได้ระหว่าง unpickle (มีเฉพาะ model ที่โหลดตอนเปิด profiling)
+        """
+        sizes = {}
+        for fuel_type, entry in list(self._resident.items()):
+            if 'bytes' not in entry:
+                entry['bytes'] = deep_sizeof(entry['model_fit'])
+            path = self.store.model_path(fuel_type)
+            sizes[fuel_type] = {
+                "version": entry['version'],
+                "model_type": type(entry['model_fit']).__name__,
+                "resident_mb": round(entry['bytes'] / MB, 2),
+                "traced_at_load_mb": round(entry['traced_bytes'] / MB, 2) if 'traced_bytes' in entry else None,
+                "file_mb": round(os.path.getsize(path) / MB, 2) if os.path.exists(path) else None
+            }
+        return sizes
 
     def model_exists(self, fuel_type: str) -> bool:
         """ตรวจสอบว่ามี model สำหรับ fuel_type นี้หรือไม่"""
-        model_path = os.path.join(self.model_dir, f"{fuel_type}_model.pkl")
-        return os.path.exists(model_path)
+        return self.store.exists(fuel_type)
@@ -1,8 +1,11 @@
 # schemas/price_schemas.py
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 
+# horizon สูงสุดของ /predict (ใช้เป็น horizon ของ forecast ที่ precompute ด้วย)
+MAX_HORIZON = 30
+
 class PriceData(BaseModel):
     date: str = Field(..., description="วันที่ในรูปแบบ YYYY-MM-DD")
     diesel: Optional[float] = Field(None, ge=0, description="ราคาดีเซล")
@@ -24,7 +27,26 @@ class PriceData(BaseModel):
 
 class PredictionRequest(BaseModel):
     fuel_type: str = Field(default="diesel", description="ประเภทเชื้อเพลิง")
-    horizon: int = Field(default=7, ge=1, le=30, description="จำนวนวันที่ต้องการทำนาย")
+    horizon: int = Field(default=7, ge=1, le=MAX_HORIZON, description="จำนวนวันที่ต้องการทำนาย")
+    format: Literal["records", "columnar"] = Field(default="records", description="columnar = array ขนานกันต่อ field")
+
+class DistributionRequest(BaseModel):
+    fuel_type: str = Field(default="diesel", description="ประเภทเชื้อเพลิง")
+    horizon: int = Field(default=7, ge=1, le=MAX_HORIZON, description="จำนวนวันที่ต้องการทำนาย")
+    quantiles: List[float] = Field(
+        default=[0.05, 0.25, 0.5, 0.75, 0.95], min_length=1, max_length=99, description="quantile ที่ต้องการ (0-1)"
+    )
+    paths: int = Field(default=2000, ge=100, le=20000, description="จำนวน path ของ Monte-Carlo")
+    seed: int = Field(default=0, ge=0, description="seed ของ simulation (paths + seed เดียวกัน = ใช้ simulation ที่ cache ไว้)")
+    sample_paths: int = Field(default=0, ge=0, le=100, description="จำนวน path ตัวอย่างที่ส่งกลับ")
+    format: Literal["records", "columnar"] = Field(default="records", description="columnar = array ขนานกันต่อ field")
+
+    @field_validator("quantiles")
+    @classmethod
+    def check_quantiles(cls, quantiles: List[float]) -> List[float]:
+        if any(not 0 < q < 1 for q in quantiles):
+            raise ValueError("quantiles must be between 0 and 1 (exclusive)")
+        return sorted(set(quantiles))
 
 class PredictionResult(BaseModel):
     day: int
@@ -42,8 +64,37 @@ class PredictionResponse(BaseModel):
 class TrainingRequest(BaseModel):
     fuel_type: str = Field(default="diesel")
     retrain: bool = Field(default=False, description="บังคับ retrain ถึงแม้มี model อยู่แล้ว")
+    force: bool = Field(default=False, description="train ใหม่แม้ข้อมูลไม่เปลี่ยนจาก model ล่าสุด")
+    job_id: Optional[str] = Field(None, description="id สำหรับติดตามความคืบหน้าที่ /jobs/{job_id}/events")
+    background: bool = Field(default=False, description="ตอบ 202 ทันทีแล้ว train เบื้องหลัง")
+    start_date: Optional[str] = Field(None, description="ใช้ข้อมูลตั้งแต่วันที่ (YYYY-MM-DD)")
+    end_date: Optional[str] = Field(None, description="ใช้ข้อมูลถึงวันที่ (YYYY-MM-DD)")
 
 class UploadResponse(BaseModel):
     status: str
     records_added: int
     date_range: Dict[str, str]
+    job_id: Optional[str] = None
+
+class PanelPredictionRequest(BaseModel):
+    items: Optional[List[str]] = Field(None, description="Item ที่ต้องการ (ไม่ระบุ = ทั้งหมด) เช่น 1034-ULG 95")
+    countries: Optional[List[str]] = Field(None, description="Country ที่ต้องการ (ไม่ระบุ = ทั้งหมด)")
+    horizon: int = Field(default=4, ge=1, le=52, description="จำนวนช่วงเวลา (ตามความถี่ของ panel) ที่ต้องการทำนาย")
+    confidence: float = Field(default=0.95, gt=0.5, lt=1.0)
+    seasonal_periods: Optional[int] = Field(None, ge=2, le=104, description="ความยาว season (เช่น 52 สำหรับรายสัปดาห์)")
+    damped: bool = Field(default=True, description="ใช้ damped trend")
+    data_file: Optional[str] = Field(None, description="ไฟล์ long-format ใน data_dir")
+    format: Literal["records", "columnar"] = Field(default="records", description="columnar = matrix (series x horizon)")
+
+class PanelSeriesForecast(BaseModel):
+    series: str
+    last_observed: Optional[str]
+    observations: int
+    params: Dict[str, float]
+    predictions: List[PredictionResult]
+
+class PanelPredictionResponse(BaseModel):
+    frequency: str
+    last_date: str
+    series_count: int
+    forecasts: List[PanelSeriesForecast]
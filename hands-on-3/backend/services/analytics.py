@@ -0,0 +1,171 @@
+# services/analytics.py
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.price_history import PriceHistoryCache
+from utils.data_loader import PRICE_COLUMNS
+from utils.cross_fuel import (
+    nan_to_none, log_returns, stride_indices, spread_summary,
+    rolling_correlation, cross_correlation, pairs
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PriceAnalytics:
+    """
+    analytics ข้ามเชื้อเพลิงสำหรับ /analytics: spread เทียบ base, rolling correlation matrix
+    และ lead / lag จาก cross-correlation
+
+    - ใช้ frame ราคาทุก fuel ทุกวันจาก PriceHistoryCache (ดึงจาก Qdrant ครั้งเดียวแบบ columnar)
+    - คำนวณเป็น NumPy array (T x F) ทุกคู่พร้อมกัน
+    - ผลเก็บใน LRU ผูกกับ version ของข้อมูล ingest ใหม่ = คำนวณใหม่
+    """
+
+    def __init__(self, history: PriceHistoryCache, max_entries: int = 64):
+        self.history = history
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _prices(self, frame: pd.DataFrame, fuel_types: List[str], start_date: Optional[str],
+                end_date: Optional[str]) -> pd.DataFrame:
+        """ราคาของ fuel_types ที่มีข้อมูลในช่วงที่ขอ (forward fill วันที่บาง fuel ไม่มีราคา)"""
+        mask = pd.Series(True, index=frame.index)
+        if start_date:
+            mask &= frame['date'] >= pd.Timestamp(start_date)
+        if end_date:
+            mask &= frame['date'] <= pd.Timestamp(end_date)
+        df = frame.loc[mask, ['date'] + fuel_types].set_index('date')
+
+        # ราคาต้องเป็นบวก (log return) ค่าที่ detector flag ว่า invalid จึงถูกตัดออกก่อน
+        df = df.where(df > 0).ffill()
+        df = df.dropna(axis=1, how='all').dropna()
+        if len(df) == 0 or df.shape[1] == 0:
+            raise LookupError("No price data found")
+        return df
+
+    def compute(
+        self,
+        fuel_types: Optional[List[str]] = None,
+        base: str = "diesel",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        window: int = 30,
+        max_lag: int = 30,
+        points: int = 300
+    ) -> Dict:
+        """
+        Args:
+            fuel_types: fuel ที่ต้องการ (ไม่ระบุ = ทุกประเภท) base จะถูกเพิ่มให้เสมอ
+            base: fuel ที่ใช้คิด spread (fuel - base)
+            window: จำนวนวันของ rolling correlation
+            max_lag: lag สูงสุด (วัน) ของ cross-correlation
+            points: จำนวนจุดสูงสุดของ time series ใน response
+        """
+        fuel_types = list(dict.fromkeys([base] + (fuel_types or PRICE_COLUMNS)))
+        unknown = [f for f in fuel_types if f not in PRICE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fuel_type: {', '.join(unknown)}")
+
+        frame, version = self.history.versioned_frame()
+        key = (tuple(fuel_types), base, start_date, end_date, window, max_lag, points)
+        with self._lock:
+            if version is not None and version != self._version:
+                self._results.clear()
+                self._version = version
+            if version is not None and key in self._results:
+                self._results.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._results[key]
+            self._stats["misses"] += 1
+
+        df = self._prices(frame, fuel_types, start_date, end_date)
+        if base not in df.columns:
+            raise LookupError(f"No price data found for base fuel '{base}'")
+        fuels = list(df.columns)
+        prices = df.to_numpy(dtype=float)
+        dates = df.index.strftime("%Y-%m-%d")
+        returns = log_returns(prices)
+        if len(returns) < window + 1:
+            raise ValueError(f"Not enough data: {len(prices)} days. Need more than {window + 1} for window={window}.")
+        max_lag = min(max_lag, len(returns) - 1)
+
+        # spread ทุก fuel เทียบ base ในครั้งเดียว
+        b = fuels.index(base)
+        others = [i for i in range(len(fuels)) if i != b]
+        spreads = prices[:, others] - prices[:, [b]]
+        sampled = stride_indices(len(prices), points)
+        spread_result = {
+            "dates": dates[sampled].tolist(),
+            "series": {
+                fuels[i]: {**spread_summary(spreads[:, k]), "values": nan_to_none(spreads[sampled, k])}
+                for k, i in enumerate(others)
+            },
+        }
+
+        # rolling correlation ของ log return: matrix ล่าสุด + ค่าเฉลี่ยทั้งช่วง + series ต่อคู่
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rolling = rolling_correlation(returns, window)
+            full_period = np.atleast_2d(np.corrcoef(returns, rowvar=False))
+            valid = np.isfinite(rolling)
+            average = np.where(valid, rolling, 0).sum(axis=0) / valid.sum(axis=0)
+        rolling_dates = dates[window:]  # window ที่ index t ครอบคลุม return ถึงวันที่ t + window
+        sampled = stride_indices(len(rolling), points)
+        correlation_result = {
+            "window": window,
+            "fuel_types": fuels,
+            "latest": nan_to_none(rolling[-1]),
+            "average": nan_to_none(average),
+            "full_period": nan_to_none(full_period),
+            "dates": rolling_dates[sampled].tolist(),
+            "pairs": {
+                f"{fuels[i]}~{fuels[j]}": nan_to_none(rolling[sampled, i, j]) for i, j in pairs(fuels)
+            },
+        }
+
+        # lead / lag: lag ที่ |correlation| สูงสุดต่อคู่ (บวก = fuel แรกนำ)
+        xcorr = cross_correlation(returns, max_lag)
+        lags = np.arange(-max_lag, max_lag + 1)
+        lead_lag = {}
+        for i, j in pairs(fuels):
+            values = xcorr[i, j]
+            entry = {"best_lag": None, "correlation": None, "leader": None, "values": nan_to_none(values)}
+            if not np.isnan(values).all():
+                best = int(np.nanargmax(np.abs(values)))
+                lag = int(lags[best])
+                entry.update(
+                    best_lag=lag,
+                    correlation=round(float(values[best]), 4),
+                    leader=fuels[i] if lag > 0 else fuels[j] if lag < 0 else None
+                )
+            lead_lag[f"{fuels[i]}~{fuels[j]}"] = entry
+
+        result = {
+            "base": base,
+            "start_date": dates[0],
+            "end_date": dates[-1],
+            "observations": int(len(prices)),
+            "fuel_types": fuels,
+            "spreads": spread_result,
+            "correlation": correlation_result,
+            "cross_correlation": {"max_lag": int(max_lag), "lags": lags.tolist(), "pairs": lead_lag},
+        }
+        with self._lock:
+            if version is not None and version == self._version:
+                self._results[key] = result
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, "version": self._version, "cached_results": len(self._results)}
@@ -0,0 +1,249 @@
+# services/anomaly.py
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import PRICE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# ชนิดของความผิดปกติ (เก็บใน payload: anomalies.{fuel_type}.kind)
+INVALID = "invalid"            # ราคา <= 0 เช่น ค่าติดลบจากข้อมูลผิด
+SPIKE = "spike"                # ราคาเปลี่ยนจากวันก่อนมากผิดปกติ (z-score ของ log return)
+CHANGE_POINT = "change_point"  # CUSUM ยืนยันว่าระดับราคาเปลี่ยนไปจริง
+
+
+class FuelState:
+    """state ของ fuel หนึ่งตัว: ค่าสถิติสะสมไม่กี่ค่า ไม่เก็บประวัติราคา"""
+
+    __slots__ = (
+        "first_date", "last_date", "last_value", "n", "mean", "var", "ret_var",
+        "cusum_pos", "cusum_neg", "anomalies", "change_points", "late_rows"
+    )
+
+    def __init__(self):
+        self.first_date: Optional[pd.Timestamp] = None
+        self.last_date: Optional[pd.Timestamp] = None
+        self.last_value: Optional[float] = None
+        self.n = 0              # จำนวนราคาที่ถูกต้อง
+        self.mean = 0.0         # EWMA ของระดับราคา (baseline ของ CUSUM)
+        self.var = 0.0          # EWMA variance ของระดับราคารอบ mean
+        self.ret_var = 0.0      # EWMA ของ log return ยกกำลังสอง
+        self.cusum_pos = 0.0
+        self.cusum_neg = 0.0
+        self.anomalies = 0
+        self.change_points = 0
+        self.late_rows = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "observations": self.n,
+            "first_date": self.first_date.strftime("%Y-%m-%d") if self.first_date is not None else None,
+            "last_date": self.last_date.strftime("%Y-%m-%d") if self.last_date is not None else None,
+            "last_value": self.last_value,
+            "mean": round(self.mean, 4),
+            "std": round(math.sqrt(self.var), 4),
+            "return_std": round(math.sqrt(self.ret_var), 6),
+            "cusum_pos": round(self.cusum_pos, 3),
+            "cusum_neg": round(self.cusum_neg, 3),
+            "anomalies": self.anomalies,
+            "change_points": self.change_points,
+            "late_rows": self.late_rows,
+        }
+
+
+class AnomalyDetector:
+    """
+    ตรวจราคาผิดปกติและจุดเปลี่ยนระดับราคาแบบ online ระหว่าง ingest
+
+    - state คงที่ต่อ fuel_type (EWMA mean / variance ของราคา, variance ของ log return, ผลรวม CUSUM)
+      ทุกแถวอัปเดตด้วยการคำนวณ O(1)
+    - invalid: ราคา <= 0; spike: |log return| เกิน z_threshold เท่าของ std ของ return
+      (invalid / spike ไม่ถูกนำไปอัปเดต mean / variance / CUSUM)
+    - change_point: CUSUM สองทางของ (ราคา - mean) / std เกิน cusum_threshold
+      แล้วเริ่ม baseline ใหม่ที่ราคาปัจจุบัน
+    - ราคาที่คงที่นานๆ ทำให้ std ใกล้ 0 จึงมีค่าต่ำสุด min_return_std / min_level_std (สัดส่วนของราคา)
+    - แถวที่วันที่ไม่ใหม่กว่าวันล่าสุดที่เห็นแล้วจะถูกข้าม ยกเว้น batch ที่ครอบคลุมประวัติทั้งหมด
+      (เช่น upload CSV ทั้งไฟล์ซ้ำ) ซึ่งจะเริ่ม state ของ fuel นั้นใหม่
+    - history_loader (ถ้ามี) ใช้เติม state จากข้อมูลใน Qdrant: เรียก seed() ตอน startup
+      (ถ้ายังไม่ได้ seed จะทำตอน process ครั้งแรก)
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.05,
+        z_threshold: float = 8.0,
+        cusum_drift: float = 1.0,
+        cusum_threshold: float = 6.0,
+        warmup: int = 30,
+        min_return_std: float = 0.01,
+        min_level_std: float = 0.01,
+        history_loader: Optional[Callable[[], pd.DataFrame]] = None,
+        max_events: int = 500
+    ):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.cusum_drift = cusum_drift
+        self.cusum_threshold = cusum_threshold
+        self.warmup = warmup
+        self.min_return_std = min_return_std
+        self.min_level_std = min_level_std
+        self.history_loader = history_loader
+
+        self._lock = threading.Lock()
+        self._states: Dict[str, FuelState] = {}
+        self._events: deque = deque(maxlen=max_events)
+        self._seeded = history_loader is None
+
+    def _update(self, state: FuelState, date: pd.Timestamp, value: float) -> Optional[Dict]:
+        """ป้อนราคาหนึ่งค่า คืน event ถ้าผิดปกติ"""
+        if value <= 0:
+            state.anomalies += 1
+            return {"kind": INVALID, "value": value}
+
+        if state.first_date is None:
+            state.first_date = date
+        if state.n == 0:
+            state.mean, state.last_value, state.last_date, state.n = value, value, date, 1
+            return None
+
+        a = self.alpha
+        warm = state.n >= self.warmup
+        event = None
+
+        ret = math.log(value / state.last_value)
+        ret_std = max(math.sqrt(state.ret_var), self.min_return_std)
+        if warm and abs(ret) / ret_std > self.z_threshold:
+            state.anomalies += 1
+            event = {
+                "kind": SPIKE, "value": value, "previous": state.last_value,
+                "score": round(ret / ret_std, 2), "change_pct": round(100 * math.expm1(ret), 2)
+            }
+        else:
+            state.ret_var = (1 - a) * state.ret_var + a * ret * ret
+
+            level_std = max(math.sqrt(state.var), self.min_level_std * state.mean)
+            z = (value - state.mean) / level_std
+            state.cusum_pos = max(0.0, state.cusum_pos + z - self.cusum_drift)
+            state.cusum_neg = max(0.0, state.cusum_neg - z - self.cusum_drift)
+            score = max(state.cusum_pos, state.cusum_neg)
+            if warm and score > self.cusum_threshold:
+                state.change_points += 1
+                event = {
+                    "kind": CHANGE_POINT, "value": value, "previous_mean": round(state.mean, 4),
+                    "direction": "up" if state.cusum_pos >= state.cusum_neg else "down",
+                    "score": round(score, 2)
+                }
+                # baseline ใหม่ที่ระดับราคาหลังเปลี่ยน (variance เดิมยังใช้เป็น scale ได้)
+                state.mean, state.cusum_pos, state.cusum_neg = value, 0.0, 0.0
+            else:
+                diff = value - state.mean
+                state.mean += a * diff
+                state.var = (1 - a) * (state.var + a * diff * diff)
+
+        state.last_value, state.last_date = value, date
+        state.n += 1
+        return event
+
+    def _process(self, df: pd.DataFrame, record: bool) -> Tuple[List[Dict], List[Dict]]:
+        """process df (ถือ _lock อยู่) คืน (annotation ต่อแถวตามลำดับเดิม, event ที่เกิด)"""
+        fuels = [f for f in PRICE_COLUMNS if f in df.columns]
+        dates = pd.to_datetime(df['date']).to_numpy()
+        order = np.argsort(dates, kind='stable')
+        annotations: List[Dict] = [{"anomaly": False} for _ in range(len(df))]
+        events: List[Dict] = []
+        if not len(df):
+            return annotations, events
+
+        first_date = pd.Timestamp(dates[order[0]])
+        for fuel in fuels:
+            state = self._states.get(fuel)
+            # batch ครอบคลุมประวัติทั้งหมดที่เคยเห็น: เริ่มใหม่จาก batch นี้
+            if state is None or (state.first_date is not None and first_date <= state.first_date):
+                state = self._states[fuel] = FuelState()
+
+            values = pd.to_numeric(df[fuel], errors='coerce').to_numpy(dtype=float)
+            for i in order:
+                value = values[i]
+                if not math.isfinite(value):
+                    continue
+                date = pd.Timestamp(dates[i])
+                if state.last_date is not None and date <= state.last_date:
+                    state.late_rows += 1
+                    continue
+
+                event = self._update(state, date, float(value))
+                if event is None:
+                    continue
+                annotations[i]["anomaly"] = True
+                annotations[i].setdefault("anomalies", {})[fuel] = {
+                    k: event[k] for k in ("kind", "score") if k in event
+                }
+                if record:
+                    event = {"fuel_type": fuel, "date": date.strftime("%Y-%m-%d"),
+                             "detected_at": time.time(), **event}
+                    self._events.append(event)
+                    events.append(event)
+        return annotations, events
+
+    def _seed(self):
+        """เติม state จากประวัติใน Qdrant (เรียกขณะถือ _lock)"""
+        self._seeded = True
+        try:
+            history = self.history_loader()
+        except Exception as e:
+            logger.warning(f"Could not seed anomaly detector from history: {e}")
+            return
+        self._process(history, record=False)
+        logger.info(f"Anomaly detector seeded from {len(history)} rows")
+
+    def seed(self):
+        """เติม state จากประวัติครั้งเดียว (โหลดจาก Qdrant แบบ sync จึงควรเรียกนอก event loop)"""
+        with self._lock:
+            if not self._seeded:
+                self._seed()
+
+    def process(self, df: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
+        """
+        ตรวจแถวใหม่ใน df (ต้องมี 'date' และ column ราคา) แล้วอัปเดต state
+
+        Returns:
+            (annotations, events)
+            annotations: payload field ต่อแถวตามลำดับของ df ({"anomaly": bool, "anomalies": {fuel: {...}}})
+            events: ความผิดปกติที่พบใน batch นี้ (รวม change_point ที่ใช้สั่ง retrain)
+        """
+        with self._lock:
+            if not self._seeded:
+                self._seed()
+            return self._process(df, record=True)
+
+    def reset(self, fuel_type: Optional[str] = None):
+        """ล้าง state (ไม่ระบุ = ทุก fuel) ครั้งถัดไปจะเริ่มนับ warmup ใหม่"""
+        with self._lock:
+            if fuel_type:
+                self._states.pop(fuel_type, None)
+            else:
+                self._states.clear()
+
+    def events(self, fuel_type: Optional[str] = None, kind: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """event ล่าสุดที่ตรวจพบใน process นี้ (ใหม่สุดก่อน)"""
+        with self._lock:
+            events = list(self._events)
+        events = [
+            e for e in reversed(events)
+            if (fuel_type is None or e["fuel_type"] == fuel_type) and (kind is None or e["kind"] == kind)
+        ]
+        return events[:limit]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "seeded": self._seeded,
+                "fuel_types": {fuel: state.to_dict() for fuel, state in self._states.items()},
+            }
@@ -0,0 +1,120 @@
+# services/collection_profiles.py
+from qdrant_client.models import (
+    Distance, VectorParams, HnswConfigDiff,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig
+)
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Profile ของ collection ราคา
+# - quantization ใช้กับ text vector (384-d) เท่านั้น; features vector มีแค่ 48-d
+#   และใช้ Euclidean distance ซึ่ง binary quantization ไม่เหมาะ จึงเก็บ float32 ตามเดิม
+# - always_ram: เก็บ quantized vector ไว้ใน RAM แม้ original vector อยู่บน disk
+COLLECTION_PROFILES: Dict[str, Dict] = {
+    "memory": {
+        "description": "float32 vectors + payload ใน RAM (ค่าเดิม)",
+        "quantization": None,
+        "on_disk_vectors": False,
+        "on_disk_payload": False,
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 100,
+    },
+    "scalar": {
+        "description": "int8 scalar quantization ใน RAM, original vector บน disk",
+        "quantization": "scalar",
+        "on_disk_vectors": True,
+        "on_disk_payload": False,
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 100,
+    },
+    "binary": {
+        "description": "binary quantization ใน RAM (เล็กสุด, ต้อง rescore), original vector บน disk",
+        "quantization": "binary",
+        "on_disk_vectors": True,
+        "on_disk_payload": False,
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 100,
+    },
+    "disk": {
+        "description": "vectors + payload บน disk ทั้งหมด (ประหยัด RAM สุด, ช้าสุด)",
+        "quantization": None,
+        "on_disk_vectors": True,
+        "on_disk_payload": True,
+        "hnsw_m": 8,
+        "hnsw_ef_construct": 64,
+    },
+}
+
+DEFAULT_PROFILE = "memory"
+
+
+def get_profile(name: Optional[str]) -> Dict:
+    """คืน config ของ profile ตามชื่อ"""
+    name = name or DEFAULT_PROFILE
+    if name not in COLLECTION_PROFILES:
+        raise ValueError(
+            f"Unknown collection profile '{name}'. Choose one of {', '.join(COLLECTION_PROFILES)}"
+        )
+    return COLLECTION_PROFILES[name]
+
+
+def _quantization_config(profile: Dict):
+    if profile["quantization"] == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if profile["quantization"] == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def build_vectors_config(profile: Dict, text_size: int, feature_size: int,
+                         text_vector: str = "text", features_vector: str = "features") -> Dict:
+    """vectors_config (named vectors) สำหรับ create_collection ตาม profile"""
+    hnsw = HnswConfigDiff(m=profile["hnsw_m"], ef_construct=profile["hnsw_ef_construct"])
+    return {
+        text_vector: VectorParams(
+            size=text_size,
+            distance=Distance.COSINE,
+            on_disk=profile["on_disk_vectors"],
+            hnsw_config=hnsw,
+            quantization_config=_quantization_config(profile)
+        ),
+        features_vector: VectorParams(
+            size=feature_size,
+            distance=Distance.EUCLID,
+            on_disk=profile["on_disk_vectors"],
+            hnsw_config=hnsw
+        ),
+    }
+
+
+def estimate_memory(profile: Dict, points: int, text_size: int, feature_size: int,
+                    payload_bytes: int = 200) -> Dict[str, float]:
+    """
+    ประมาณ RAM ที่ collection ใช้ (MB) ตาม profile
+    vector/payload ที่อยู่บน disk ไม่นับ (ใช้ผ่าน page cache ของ OS)
+    """
+    mb = 1024 * 1024
+
+    text_ram = 0 if profile["on_disk_vectors"] else points * text_size * 4
+    feature_ram = 0 if profile["on_disk_vectors"] else points * feature_size * 4
+    if profile["quantization"] == "scalar":
+        text_ram += points * text_size
+    elif profile["quantization"] == "binary":
+        text_ram += points * text_size / 8
+
+    # HNSW level 0 เก็บ 2m links ต่อ point ต่อ vector (uint32)
+    hnsw_ram = 2 * points * profile["hnsw_m"] * 2 * 4
+    payload_ram = 0 if profile["on_disk_payload"] else points * payload_bytes
+
+    return {
+        "text_vectors_mb": round(text_ram / mb, 2),
+        "feature_vectors_mb": round(feature_ram / mb, 2),
+        "hnsw_mb": round(hnsw_ram / mb, 2),
+        "payload_mb": round(payload_ram / mb, 2),
+        "total_mb": round((text_ram + feature_ram + hnsw_ram + payload_ram) / mb, 2),
+    }
@@ -0,0 +1,244 @@
+# services/embeddings.py
+import hashlib
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+EMBEDDING_BACKENDS = ("sentence-transformers", "onnx", "hashing")
+
+
+class TextEncoder(ABC):
+    """
+    Interface ของ encoder ที่ QdrantService ใช้แปลงข้อความเป็น vector
+    encode() รับ list ของข้อความ และคืน array ขนาด (n, dimension) แบบ float32
+    """
+
+    name: str = "base"
+    dimension: int = 0
+
+    @abstractmethod
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class SentenceTransformerEncoder(TextEncoder):
+    """MiniLM ผ่าน sentence-transformers + torch (backend เดิม)"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_size: int = 64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class OnnxEncoder(TextEncoder):
+    """
+    MiniLM แบบ ONNX Runtime (แนะนำ int8 quantized) ไม่ต้องใช้ torch
+    ใช้ mean pooling แบบเดียวกับ sentence-transformers จึงได้ vector ใกล้เคียงกัน
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer_path: Optional[str] = None,
+        max_length: int = 128,
+        batch_size: int = 64,
+        num_threads: Optional[int] = None
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX model not found at {model_path}")
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        # tokenizer.json อยู่ข้างไฟล์ model (จาก optimum export) หรือโหลดจาก Hub
+        if tokenizer_path is None:
+            local = os.path.join(os.path.dirname(model_path), "tokenizer.json")
+            tokenizer_path = local if os.path.exists(local) else DEFAULT_MODEL_NAME
+        if os.path.exists(tokenizer_path):
+            self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        else:
+            self.tokenizer = Tokenizer.from_pretrained(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.batch_size = batch_size
+        self.dimension = int(self.session.get_outputs()[0].shape[-1])
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        chunks = []
+        for i in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[i:i + self.batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self.session.run(None, feeds)[0]
+
+            # mean pooling เฉพาะ token จริง (ไม่รวม padding)
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            chunks.append(pooled.astype(np.float32))
+
+        return np.vstack(chunks)
+
+
+class HashingEncoder(TextEncoder):
+    """
+    Encoder แบบ deterministic ไม่ต้องโหลด model ใดๆ (ใช้แค่ numpy)
+
+    ข้อความของเราเป็น template "label ค่า หน่วย" คั่นด้วย comma
+    เช่น "วันที่ 2024-01-01, ดีเซล 30.12 บาท" จึงแยกแต่ละส่วนเป็น
+    - คำทั่วไป -> feature hashing แบบมีเครื่องหมาย
+    - ตัวเลข -> soft binning หลายความละเอียด ผูกกับ label ของส่วนนั้น
+      ราคาที่ใกล้กันจึงได้ cosine similarity สูง
+    - วันที่ -> soft binning ของปี เดือน และวันในปี
+    """
+
+    name = "hashing"
+
+    _DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+    _NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+    _WORD_RE = re.compile(r"[^\W\d_]+|\d+", re.UNICODE)
+
+    # ความกว้างของ bin สำหรับค่าตัวเลข (หยาบ -> ละเอียด)
+    BIN_WIDTHS = (1.0, 0.25, 0.05)
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def _bucket(self, key: str) -> tuple:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dimension, 1.0 if (value >> 63) & 1 else -1.0
+
+    def _add(self, vector: np.ndarray, key: str, weight: float):
+        index, sign = self._bucket(key)
+        vector[index] += sign * weight
+
+    def _add_number(self, vector: np.ndarray, context: str, value: float, widths=BIN_WIDTHS):
+        for width in widths:
+            position = value / width
+            low = int(np.floor(position))
+            frac = position - low
+            self._add(vector, f"{context}|{width}|{low}", 1.0 - frac)
+            self._add(vector, f"{context}|{width}|{low + 1}", frac)
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+
+        for segment in text.split(","):
+            segment = segment.strip()
+            if not segment:
+                continue
+
+            date_match = self._DATE_RE.search(segment)
+            if date_match:
+                year, month, day = (int(p) for p in date_match.group().split("-"))
+                day_of_year = (month - 1) * 30.5 + day
+                self._add_number(vector, "date:year", float(year), widths=(4.0, 1.0))
+                self._add_number(vector, "date:month", float(month), widths=(3.0, 1.0))
+                self._add_number(vector, "date:doy", day_of_year, widths=(30.0, 7.0))
+                continue
+
+            numbers = list(self._NUMBER_RE.finditer(segment))
+            if numbers:
+                # ตัวเลขตัวสุดท้ายคือค่า ส่วนที่อยู่ก่อนหน้าคือ label (เช่น "แก๊สโซฮอล์ 95")
+                value_match = numbers[-1]
+                label = " ".join(self._WORD_RE.findall(segment[:value_match.start()])) or "_"
+                self._add(vector, f"label:{label}", 1.0)
+                self._add_number(vector, f"value:{label}", float(value_match.group()))
+                continue
+
+            for word in self._WORD_RE.findall(segment):
+                self._add(vector, f"word:{word}", 1.0)
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.vstack([self._encode_one(t) for t in texts])
+
+
+def create_encoder(
+    backend: str = "sentence-transformers",
+    model_name: str = DEFAULT_MODEL_NAME,
+    onnx_model_path: Optional[str] = None,
+    dimension: int = 384
+) -> TextEncoder:
+    """สร้าง encoder ตามชื่อ backend ที่ตั้งไว้ใน Settings"""
+    backend = backend.lower()
+
+    if backend == "sentence-transformers":
+        encoder = SentenceTransformerEncoder(model_name)
+    elif backend == "onnx":
+        if not onnx_model_path:
+            raise ValueError("onnx_model_path is required for the onnx embedding backend")
+        encoder = OnnxEncoder(onnx_model_path)
+    elif backend == "hashing":
+        encoder = HashingEncoder(dimension=dimension)
+    else:
+        raise ValueError(
+            f"Unknown embedding backend '{backend}'. Choose one of {', '.join(EMBEDDING_BACKENDS)}"
+        )
+
+    logger.info(f"Embedding backend: {encoder.name} (dim={encoder.dimension})")
+    return encoder
+
+
+def quantize_onnx_model(model_path: str, output_path: str) -> str:
+    """
+    แปลง ONNX model (fp32) เป็น int8 ด้วย dynamic quantization
+
+    model fp32 ได้จาก:
+        optimum-cli export onnx --model sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2 models/onnx/
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+    logger.info(f"Quantized ONNX model saved to {output_path}")
+    return output_path
@@ -0,0 +1,201 @@
+# services/forecast_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastTable:
+    """
+    ตาราง forecast ที่ precompute ไว้ (materialized) เก็บใน SQLite
+    หนึ่งแถวต่อ fuel_type: forecast ถึง horizon สูงสุด + ราคาปัจจุบัน + version ของ model ที่ใช้
+    data_date / current_price = แถวราคาล่าสุดตอนคำนวณ (ingest ใหม่ทำให้ entry ไม่ fresh ทันที)
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS forecasts (
+                    fuel_type TEXT PRIMARY KEY,
+                    model_version INTEGER NOT NULL,
+                    last_train_date TEXT NOT NULL,
+                    current_price REAL NOT NULL,
+                    horizon INTEGER NOT NULL,
+                    confidence REAL NOT NULL,
+                    predictions TEXT NOT NULL,
+                    computed_at REAL NOT NULL,
+                    data_date TEXT
+                )
+            """)
+            # ตารางที่สร้างก่อนมี data_date: แถวเดิมเป็น NULL จึงถูกคำนวณใหม่
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(forecasts)")}
+            if "data_date" not in columns:
+                conn.execute("ALTER TABLE forecasts ADD COLUMN data_date TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        # connection ต่อ call: ใช้ได้จากหลาย thread / หลาย worker (SQLite จัดการ lock ให้)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def put(self, fuel_type: str, entry: Dict):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO forecasts
+                (fuel_type, model_version, last_train_date, current_price, horizon, confidence, predictions,
+                 computed_at, data_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    fuel_type,
+                    entry["model_version"],
+                    entry["last_train_date"],
+                    entry["current_price"],
+                    len(entry["predictions"]),
+                    entry["confidence"],
+                    json.dumps(entry["predictions"]),
+                    entry.get("computed_at", time.time()),
+                    entry.get("data_date"),
+                )
+            )
+
+    def get(self, fuel_type: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM forecasts WHERE fuel_type = ?", (fuel_type,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["predictions"] = json.loads(entry["predictions"])
+        return entry
+
+    def list(self) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT fuel_type, model_version, last_train_date, current_price, horizon, confidence, computed_at, "
+                "data_date "
+                "FROM forecasts ORDER BY fuel_type"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, fuel_type: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM forecasts WHERE fuel_type = ?", (fuel_type,))
+
+    @staticmethod
+    def is_fresh(entry: Optional[Dict], model_version: Optional[int], horizon: int,
+                 confidence: float, max_age: float, latest: Optional[Tuple[str, float]] = None) -> bool:
+        """
+        entry ใช้ได้ถ้ามาจาก model version เดียวกัน, ยาวพอ, confidence ตรง, ยังไม่เก่าเกิน max_age
+        และ (ถ้าระบุ latest = (data_date, current_price) ของแถวราคาล่าสุดตอนนี้) คำนวณจากข้อมูลชุดเดียวกัน
+        """
+        return (
+            entry is not None
+            and model_version is not None
+            and entry["model_version"] == model_version
+            and entry["horizon"] >= horizon
+            and abs(entry["confidence"] - confidence) < 1e-9
+            and time.time() - entry["computed_at"] <= max_age
+            and (latest is None or (
+                entry.get("data_date") == latest[0] and abs(entry["current_price"] - latest[1]) < 1e-9
+            ))
+        )
+
+
+class ForecastScheduler:
+    """
+    background thread ที่ precompute forecast ลง ForecastTable
+
+    - trigger(): หลัง ingest / train (ระบุ fuel_type หรือทุก fuel ที่มี model)
+    - ทุก interval วินาที refresh ทุก fuel ที่มี model
+    """
+
+    def __init__(
+        self,
+        table: ForecastTable,
+        compute_fn: Callable[[str], Dict],
+        list_fuel_types: Callable[[], Iterable[str]],
+        interval: float = 3600
+    ):
+        self.table = table
+        self.compute_fn = compute_fn
+        self.list_fuel_types = list_fuel_types
+        self.interval = interval
+
+        self._queue: set = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._next_run = 0.0
+
+        self.stats = {"runs": 0, "computed": 0, "failed": 0, "last_run_at": None, "last_error": None}
+
+    def start(self):
+        self._stopping = False
+        self._next_run = time.monotonic()  # precompute ทันทีตอน start
+        self._thread = threading.Thread(target=self._run, name="forecast-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def trigger(self, fuel_types: Optional[Iterable[str]] = None, reason: str = ""):
+        """ขอให้ precompute ใหม่ (None = ทุก fuel ที่มี model)"""
+        with self._lock:
+            if fuel_types is None:
+                self._queue.add(None)
+            else:
+                self._queue.update(fuel_types)
+        logger.info(f"Forecast precompute triggered ({reason or 'manual'}): {fuel_types or 'all'}")
+        self._wakeup.set()
+
+    def run_once(self, fuel_types: Optional[Iterable[str]] = None) -> int:
+        """precompute ทันทีใน thread ปัจจุบัน คืนจำนวน fuel ที่สำเร็จ"""
+        fuel_types = list(fuel_types) if fuel_types is not None else list(self.list_fuel_types())
+        computed = 0
+        for fuel_type in fuel_types:
+            try:
+                entry = self.compute_fn(fuel_type)
+                self.table.put(fuel_type, entry)
+                computed += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                self.stats["last_error"] = f"{fuel_type}: {e}"
+                logger.warning(f"Forecast precompute failed for {fuel_type}: {e}")
+        self.stats["runs"] += 1
+        self.stats["computed"] += computed
+        self.stats["last_run_at"] = pd.Timestamp.now().isoformat()
+        return computed
+
+    def _run(self):
+        while not self._stopping:
+            timeout = max(0.0, self._next_run - time.monotonic())
+            self._wakeup.wait(timeout=timeout)
+            self._wakeup.clear()
+            if self._stopping:
+                return
+
+            with self._lock:
+                queued, self._queue = self._queue, set()
+
+            if time.monotonic() >= self._next_run:
+                queued = {None}
+                self._next_run = time.monotonic() + self.interval
+
+            if not queued:
+                continue
+            self.run_once(None if None in queued else queued)
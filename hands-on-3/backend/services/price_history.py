@@ -0,0 +1,146 @@
+# services/price_history.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.data_loader import PRICE_COLUMNS
+from utils.downsampling import resample_ohlc, pick_interval, downsample_ohlc, ohlc_records, ohlc_columns
+
+logger = logging.getLogger(__name__)
+
+
+class PriceHistoryCache:
+    """
+    cache ของประวัติราคาสำหรับ /prices/history
+
+    - ดึงราคาทุก fuel ทุกวันจาก Qdrant ครั้งเดียว (loader) แล้วเก็บเป็น DataFrame
+    - ผล resample + LTTB ของแต่ละ query เก็บใน LRU ผูกกับ version ของข้อมูล
+    - invalidate() หลัง ingest; ttl กันกรณี worker อื่นเป็นคน ingest
+    """
+
+    def __init__(self, loader: Callable[[], pd.DataFrame], ttl: float = 300, max_entries: int = 128):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._frame: Optional[pd.DataFrame] = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._results: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "invalidations": 0}
+
+    def invalidate(self):
+        with self._lock:
+            self._frame = None
+            self._version += 1
+            self._results.clear()
+            self._stats["invalidations"] += 1
+
+    def frame(self) -> pd.DataFrame:
+        """ราคารายวันทุก fuel (โหลดใหม่เมื่อถูก invalidate หรือเก่ากว่า ttl)"""
+        return self._current()[0]
+
+    def versioned_frame(self) -> Tuple[pd.DataFrame, Optional[int]]:
+        """เหมือน frame() แต่คืน version ด้วย ให้ cache ที่คำนวณจาก frame นี้ผูกผลกับ version ได้"""
+        return self._current()
+
+    def _current(self) -> Tuple[pd.DataFrame, Optional[int]]:
+        """คืน (frame, version) โดย version = None ถ้า frame นี้ห้ามเก็บเป็น cache"""
+        with self._lock:
+            if self._frame is not None and time.monotonic() - self._loaded_at <= self.ttl:
+                return self._frame, self._version
+            version = self._version
+
+        frame = self.loader()
+        with self._lock:
+            # มี ingest ระหว่างโหลด: ใช้ผลนี้ตอบ request นี้ได้ แต่ไม่เก็บเป็น cache
+            if version != self._version:
+                return frame, None
+            if self._frame is not None:
+                # หมด ttl: ผลของ query เดิมอาจไม่ตรงกับข้อมูลใหม่
+                self._version += 1
+                self._results.clear()
+            self._frame = frame
+            self._loaded_at = time.monotonic()
+            self._stats["loads"] += 1
+            return frame, self._version
+
+    def history(
+        self,
+        fuel_types: Optional[List[str]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        interval: str = "auto",
+        points: int = 300,
+        columnar: bool = False
+    ) -> Dict:
+        """
+        ประวัติราคาแบบ OHLC ต่อ fuel_type ไม่เกิน points แถวต่อ fuel
+
+        interval='auto' เลือกช่วงที่ละเอียดที่สุดที่ไม่เกิน points ถ้ายังเกิน (หรือระบุ interval เอง)
+        จะลดจำนวนแถวด้วย LTTB บนราคาปิด
+        columnar=True คืน data เป็น array ขนานกัน (date / open / high / low / close)
+        """
+        fuel_types = fuel_types or PRICE_COLUMNS
+        unknown = [f for f in fuel_types if f not in PRICE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fuel_type: {', '.join(unknown)}")
+
+        frame, version = self._current()
+        key = (version, tuple(fuel_types), start_date, end_date, interval, points, columnar)
+        with self._lock:
+            if version is not None and key in self._results:
+                self._results.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._results[key]
+            self._stats["misses"] += 1
+
+        mask = pd.Series(True, index=frame.index)
+        if start_date:
+            mask &= frame['date'] >= pd.Timestamp(start_date)
+        if end_date:
+            mask &= frame['date'] <= pd.Timestamp(end_date)
+        df = frame.loc[mask, ['date'] + fuel_types]
+
+        if len(df) == 0:
+            raise LookupError("No price data found")
+
+        if interval == "auto":
+            interval = pick_interval(df['date'].iloc[0], df['date'].iloc[-1], points)
+
+        series = {}
+        for fuel, ohlc in resample_ohlc(df, fuel_types, interval).items():
+            sampled = downsample_ohlc(ohlc, points)
+            series[fuel] = {
+                "source_points": int(len(ohlc)),
+                "points": int(len(sampled)),
+                "downsampled": len(sampled) < len(ohlc),
+                "data": ohlc_columns(sampled) if columnar else ohlc_records(sampled),
+            }
+
+        result = {
+            "interval": interval,
+            "start_date": df['date'].iloc[0].strftime("%Y-%m-%d"),
+            "end_date": df['date'].iloc[-1].strftime("%Y-%m-%d"),
+            "series": series,
+        }
+        with self._lock:
+            if version is not None and version == self._version:
+                self._results[key] = result
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "version": self._version,
+                "cached_rows": len(self._frame) if self._frame is not None else 0,
+                "cached_queries": len(self._results),
+            }
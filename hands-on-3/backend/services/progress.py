@@ -0,0 +1,176 @@
+# services/progress.py
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# stage สุดท้ายของ job (subscriber หยุดอ่านเมื่อเจอ)
+TERMINAL_STAGES = ("done", "error")
+
+
+class _Job:
+    def __init__(self, job_id: str, kind: str, max_events: int):
+        self.job_id = job_id
+        self.kind = kind
+        self.created_at = time.time()
+        self.events: deque = deque(maxlen=max_events)
+        self.subscribers: List[tuple] = []
+        self.finished = False
+
+
+class ProgressReporter:
+    """
+    callable ที่ pipeline เรียกเพื่อรายงานความคืบหน้า: reporter(stage, done=..., total=..., **fields)
+
+    ถ้ามี done/total จะคำนวณ percent และ ETA ของ stage นั้นจากเวลาที่ใช้ไปแล้ว
+    """
+
+    def __init__(self, bus: "ProgressBus", job_id: str):
+        self.bus = bus
+        self.job_id = job_id
+        self.started = time.monotonic()
+        self._stage_started: Dict[str, float] = {}
+
+    def __call__(self, stage: str, done: Optional[int] = None, total: Optional[int] = None, **fields):
+        now = time.monotonic()
+        stage_started = self._stage_started.setdefault(stage, now)
+        event = {"stage": stage, "elapsed": round(now - self.started, 3), **fields}
+        if done is not None:
+            event["done"] = done
+        if total:
+            event["total"] = total
+            if done is not None:
+                event["percent"] = round(100 * done / total, 1)
+                if done:
+                    event["eta"] = round((now - stage_started) / done * (total - done), 3)
+        self.bus.publish(self.job_id, event)
+
+
+class ProgressBus:
+    """
+    pub/sub ใน process สำหรับความคืบหน้าของ ingest / train
+
+    - pipeline (รันใน thread) publish event ผ่าน ProgressReporter
+    - SSE endpoint (async) subscribe ด้วย job_id; event ที่เกิดก่อน subscribe จะถูกส่งให้ก่อน
+      job ต้องถูกเริ่มแล้ว (wait_for_job รอ job ที่ client ส่ง job_id มาพร้อม request ได้สั้นๆ)
+      subscriber ไม่สร้าง job เอง job_id มั่วๆ จึงไม่ดัน job จริงออกจาก max_jobs
+    - เก็บ job ล่าสุดไว้ max_jobs งาน งานละไม่เกิน max_events event
+    """
+
+    def __init__(self, max_jobs: int = 100, max_events: int = 1000):
+        self.max_jobs = max_jobs
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, _Job]" = OrderedDict()
+
+    def _job(self, job_id: str, kind: str = "unknown") -> _Job:
+        """คืน job (สร้างใหม่ถ้ายังไม่มี) เรียกขณะถือ _lock"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            job = self._jobs[job_id] = _Job(job_id, kind, self.max_events)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        elif job.kind == "unknown":
+            job.kind = kind
+        return job
+
+    def start_job(self, kind: str, job_id: Optional[str] = None) -> ProgressReporter:
+        """เริ่ม job ใหม่ (job_id จาก client หรือสุ่ม) คืน reporter ของ job นั้น"""
+        job_id = job_id or uuid.uuid4().hex
+        with self._lock:
+            self._job(job_id, kind)
+        return ProgressReporter(self, job_id)
+
+    def has_job(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._jobs
+
+    async def wait_for_job(self, job_id: str, timeout: float = 5.0, interval: float = 0.05) -> bool:
+        """รอจน job_id ถูกเริ่ม (เช่นเปิด stream ก่อนส่ง request) คืน False ถ้าไม่มีภายใน timeout"""
+        deadline = time.monotonic() + timeout
+        while not self.has_job(job_id):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(interval)
+        return True
+
+    def publish(self, job_id: str, event: Dict):
+        event = {"job_id": job_id, "time": time.time(), **event}
+        with self._lock:
+            job = self._job(job_id)
+            job.events.append(event)
+            if event["stage"] in TERMINAL_STAGES:
+                job.finished = True
+            subscribers = list(job.subscribers)
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # event loop ของ subscriber ปิดไปแล้ว
+                pass
+
+    def finish(self, reporter: ProgressReporter, result: Optional[Dict] = None, error: Optional[str] = None):
+        if error is not None:
+            reporter("error", detail=error)
+        else:
+            reporter("done", result=result)
+
+    async def subscribe(self, job_id: str, heartbeat: float = 15.0) -> AsyncIterator[Optional[Dict]]:
+        """
+        อ่าน event ของ job ตั้งแต่ต้นจนถึง done / error
+        yield None ทุก heartbeat วินาทีที่ไม่มี event (ให้ SSE ส่ง keep-alive)
+        raise LookupError ถ้าไม่มี job_id (ไม่สร้าง job ใหม่)
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise LookupError(f"Job '{job_id}' not found")
+            backlog = list(job.events)
+            finished = job.finished
+            subscriber = (loop, queue)
+            if not finished:
+                job.subscribers.append(subscriber)
+
+        try:
+            for event in backlog:
+                yield event
+            if finished:
+                return
+
+            # snapshot backlog กับ register subscriber อยู่ใต้ lock เดียวกับ publish จึงไม่มี event ซ้ำหรือหาย
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event["stage"] in TERMINAL_STAGES:
+                    return
+        finally:
+            with self._lock:
+                if subscriber in job.subscribers:
+                    job.subscribers.remove(subscriber)
+
+    def jobs(self) -> List[Dict]:
+        """สรุป job ล่าสุด (ใหม่สุดก่อน)"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            {
+                "job_id": job.job_id,
+                "kind": job.kind,
+                "created_at": job.created_at,
+                "finished": job.finished,
+                "last_event": job.events[-1] if job.events else None,
+            }
+            for job in reversed(jobs)
+        ]
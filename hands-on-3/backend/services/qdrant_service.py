@@ -1,66 +1,327 @@
 # services/qdrant_service.py
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
-    PointStruct, Distance, VectorParams, 
-    Filter, FieldCondition, MatchValue
+    PointStruct, Distance, VectorParams,
+    Filter, FieldCondition, MatchValue, DatetimeRange, HasIdCondition,
+    Range, OrderBy, Direction, PayloadSchemaType, IsEmptyCondition, PayloadField,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
 )
-from sentence_transformers import SentenceTransformer
+import numpy as np
 import pandas as pd
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict
 import logging
-import os
+
+from services.embeddings import TextEncoder, SentenceTransformerEncoder
+from services.collection_profiles import get_profile, build_vectors_config, estimate_memory
+from utils.data_loader import PRICE_COLUMNS, MARKET_FEATURE_NAMES, build_market_features
+from utils.memory import memory_profiler
 
 logger = logging.getLogger(__name__)
 
+# ชื่อ named vectors ใน collection ราคา
+TEXT_VECTOR = "text"
+FEATURES_VECTOR = "features"
+
+# จำนวนแถวต่อการ encode หนึ่งครั้ง / จำนวน point ต่อ upsert ใน add_price_data
+ENCODE_CHUNK_SIZE = 256
+UPSERT_BATCH_SIZE = 100
+
+# ประวัติย้อนหลังที่ต้องใช้คำนวณ lag/rolling ของ feature vector
+FEATURE_HISTORY_DAYS = 30
+
+# payload index ที่ใช้ filter / order_by ฝั่ง server
+PAYLOAD_INDEXES = {
+    "date": PayloadSchemaType.DATETIME,
+    "year": PayloadSchemaType.INTEGER,
+    "month": PayloadSchemaType.INTEGER,
+    "day_of_week": PayloadSchemaType.INTEGER,
+    "anomaly": PayloadSchemaType.BOOL,
+    **{fuel: PayloadSchemaType.FLOAT for fuel in PRICE_COLUMNS}
+}
+
+def price_to_text(row) -> str:
+    """สร้าง text description ของราคาในแต่ละวัน สำหรับทำ embedding"""
+    text_parts = [f"วันที่ {row['date'].strftime('%Y-%m-%d')}"]
+
+    if 'diesel' in row and pd.notna(row['diesel']):
+        text_parts.append(f"ดีเซล {row['diesel']:.2f} บาท")
+    if 'gasohol_95' in row and pd.notna(row['gasohol_95']):
+        text_parts.append(f"แก๊สโซฮอล์ 95 {row['gasohol_95']:.2f} บาท")
+
+    return ", ".join(text_parts)
+
+def date_to_point_id(date) -> int:
+    """point id จากวันที่ (YYYYMMDD) ข้อมูลวันเดียวกันจึง upsert ทับกันแทนที่จะซ้ำ"""
+    return int(pd.Timestamp(date).strftime("%Y%m%d"))
+
+def build_filter(
+    fuel_type: Optional[str] = None,
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
+) -> Optional[Filter]:
+    """
+    สร้าง Qdrant payload filter ให้ filter ฝั่ง server
+    ถ้าระบุ fuel_type จะคืนเฉพาะ point ที่มีราคาของเชื้อเพลิงนั้น (ไม่หาย / ไม่เป็น null)
+    และอยู่ในช่วง min/max เฉพาะเมื่อกำหนด
+    """
+    conditions = []
+    excluded = []
+
+    if fuel_type is not None:
+        excluded.append(IsEmptyCondition(is_empty=PayloadField(key=fuel_type)))
+        if min_price is not None or max_price is not None:
+            conditions.append(FieldCondition(
+                key=fuel_type,
+                range=Range(gte=min_price, lte=max_price)
+            ))
+
+    if year is not None:
+        conditions.append(FieldCondition(key="year", match=MatchValue(value=year)))
+    if month is not None:
+        conditions.append(FieldCondition(key="month", match=MatchValue(value=month)))
+    if start_date is not None or end_date is not None:
+        conditions.append(FieldCondition(
+            key="date",
+            range=DatetimeRange(
+                gte=pd.Timestamp(start_date).isoformat() if start_date else None,
+                lte=pd.Timestamp(end_date).isoformat() if end_date else None
+            )
+        ))
+
+    if not conditions and not excluded:
+        return None
+    return Filter(must=conditions or None, must_not=excluded or None)
+
+def activate_collection(client: QdrantClient, alias_name: str, target_name: str) -> Optional[str]:
+    """
+    ให้ alias_name ชี้ไปที่ collection target_name แล้วลบ collection เดิม
+    (ถ้า alias_name เป็น alias อยู่แล้วจะสลับแบบ atomic) คืนชื่อ collection เดิม (None ถ้าไม่มี)
+    """
+    aliases = {a.alias_name: a.collection_name for a in client.get_aliases().aliases}
+    previous = aliases.get(alias_name)
+    if previous is not None:
+        client.update_collection_aliases(change_aliases_operations=[
+            DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias_name)),
+            CreateAliasOperation(create_alias=CreateAlias(collection_name=target_name, alias_name=alias_name))
+        ])
+    else:
+        if client.collection_exists(alias_name):
+            previous = alias_name
+            client.delete_collection(alias_name)
+        client.update_collection_aliases(change_aliases_operations=[
+            CreateAliasOperation(create_alias=CreateAlias(collection_name=target_name, alias_name=alias_name))
+        ])
+    if previous is not None and previous != alias_name:
+        client.delete_collection(previous)
+    return previous
+
 class QdrantService:
     def __init__(
         self, 
         host: str = "localhost", 
         port: int = 6333,
-        collection_name: str = "oil_prices_eppo"
+        collection_name: str = "oil_prices_eppo",
+        encoder: Optional[TextEncoder] = None,
+        profile: str = "memory"
     ):
         self.client = QdrantClient(host=host, port=port)
         self.collection_name = collection_name
-        self.embedding_model = SentenceTransformer(
-            'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
-        )
-        self.vector_size = 384
+        self.profile_name = profile
+        self.profile = get_profile(profile)
+        self.encoder = encoder or SentenceTransformerEncoder()
+        self.vector_size = self.encoder.dimension
+        self.feature_size = len(MARKET_FEATURE_NAMES)
+        self.named_vectors = True
         
         self._ensure_collection()
     
     def _ensure_collection(self):
         """สร้าง collection ถ้ายังไม่มี"""
         try:
-            self.client.get_collection(self.collection_name)
+            info = self.client.get_collection(self.collection_name)
             logger.info(f"Collection '{self.collection_name}' already exists")
-        except:
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=VectorParams(
-                    size=self.vector_size, 
-                    distance=Distance.COSINE
+
+            vectors = info.config.params.vectors
+            if isinstance(vectors, dict):
+                existing_size = vectors[TEXT_VECTOR].size if TEXT_VECTOR in vectors else None
+                self.named_vectors = FEATURES_VECTOR in vectors
+            else:
+                existing_size = getattr(vectors, 'size', None)
+                self.named_vectors = False
+
+            if not self.named_vectors:
+                logger.warning(
+                    f"Collection '{self.collection_name}' has no '{FEATURES_VECTOR}' vector; "
+                    f"run 'python manage.py migrate' to enable market condition search"
+                )
+            if existing_size is not None and existing_size != self.vector_size:
+                logger.warning(
+                    f"Collection '{self.collection_name}' uses {existing_size}-d vectors but "
+                    f"embedding backend '{self.encoder.name}' produces {self.vector_size}-d vectors"
                 )
+        except:
+            self._create_collection(self.collection_name, self.profile, self.vector_size)
+            self.named_vectors = True
+            logger.info(f"Created collection '{self.collection_name}' (profile: {self.profile_name})")
+
+        self._ensure_payload_indexes()
+        self._check_point_ids()
+
+    def _check_point_ids(self):
+        """เตือนถ้า collection ยังใช้ point id แบบเก่า (ลำดับแถว) ซึ่ง ingest วันเดิมซ้ำจะได้ point ซ้ำ"""
+        try:
+            page, _ = self.client.scroll(collection_name=self.collection_name, limit=1, with_payload=["date"])
+        except Exception as e:
+            logger.warning(f"Could not check point ids: {e}")
+            return
+        if page and page[0].payload.get('date') and page[0].id != date_to_point_id(page[0].payload['date']):
+            logger.warning(
+                f"Collection '{self.collection_name}' uses legacy point ids; re-ingested days will be "
+                f"duplicated until you run 'python manage.py migrate --profile {self.profile_name}'"
             )
-            logger.info(f"Created collection '{self.collection_name}'")
+
+    def _create_collection(self, collection_name: str, profile: Dict, text_size: int):
+        """สร้าง collection ราคา (named vectors) ตาม collection profile"""
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=build_vectors_config(
+                profile,
+                text_size=text_size,
+                feature_size=self.feature_size,
+                text_vector=TEXT_VECTOR,
+                features_vector=FEATURES_VECTOR
+            ),
+            on_disk_payload=profile["on_disk_payload"]
+        )
+
+    def _ensure_payload_indexes(self, collection_name: Optional[str] = None):
+        """สร้าง payload index (ถ้ามีอยู่แล้ว Qdrant จะข้ามให้)"""
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            try:
+                self.client.create_payload_index(
+                    collection_name=collection_name or self.collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema
+                )
+            except Exception as e:
+                logger.warning(f"Could not create payload index on '{field_name}': {e}")
     
-    def add_price_data(self, df: pd.DataFrame) -> int:
-        """เพิ่มข้อมูลราคาเข้า Qdrant"""
+    def _history_before(self, date: pd.Timestamp, days: int = FEATURE_HISTORY_DAYS) -> pd.DataFrame:
+        """ดึงราคาทุกประเภทช่วง N วันก่อน date (ใช้เป็น context ของ lag/rolling)"""
+        results, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=Filter(must=[FieldCondition(
+                key="date",
+                range=DatetimeRange(
+                    gte=(date - pd.Timedelta(days=days)).isoformat(),
+                    lt=date.isoformat()
+                )
+            )]),
+            limit=days + 1,
+            with_payload=True
+        )
+
+        rows = [
+            {'date': pd.to_datetime(p.payload['date']), **{f: p.payload.get(f) for f in PRICE_COLUMNS}}
+            for p in results
+        ]
+        return pd.DataFrame(rows, columns=['date'] + PRICE_COLUMNS)
+
+    def _market_features(self, df: pd.DataFrame) -> np.ndarray:
+        """feature vector ของทุกแถวใน df โดยต่อประวัติจาก Qdrant ไว้ข้างหน้า"""
+        df = df.reindex(columns=['date'] + PRICE_COLUMNS)
+        if len(df) == 0:
+            return build_market_features(df)
+
+        # ทุก batch ใช้ประวัติก่อนวันแรกเสมอ แถวต้น batch จึงได้ lag / rolling เท่ากับ ingest ทีละวัน
+        history = pd.DataFrame(columns=df.columns)
+        try:
+            history = self._history_before(pd.Timestamp(df['date'].min()))
+        except Exception as e:
+            logger.warning(f"Could not load feature history: {e}")
+
+        # build_market_features ไม่ต้องการให้เรียง จึงคืนแถวท้ายตามลำดับเดิมของ df ได้เลย
+        combined = pd.concat([history, df.reset_index(drop=True)], ignore_index=True)
+        return build_market_features(combined)[len(history):]
+
+    def _merge_anomaly_flags(self, df: pd.DataFrame, annotations: List[Dict]) -> List[Dict]:
+        """
+        รวม anomalies ที่เก็บใน payload ของวันเดียวกันอยู่แล้วกับ annotation ใหม่ราย fuel
+
+        - fuel ที่ annotation ใหม่ flag: ใช้ของใหม่
+        - fuel ที่ราคาใหม่ต่างจากที่เก็บไว้ (ข้อมูลแก้แล้ว): ผลใหม่แทน flag เดิม (ไม่ flag = ลบ)
+        - fuel ที่ราคาเท่าเดิมหรือไม่มีในแถวใหม่: คง flag เดิม (detector ข้ามวันที่เคยเห็นแล้ว จึงไม่ได้ตรวจซ้ำ)
+        anomaly คำนวณจาก anomalies ที่รวมแล้ว
+        """
+        ids = [date_to_point_id(date) for date in df['date']]
+        existing = {}
+        for start in range(0, len(ids), ENCODE_CHUNK_SIZE):
+            for point in self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=list(set(ids[start:start + ENCODE_CHUNK_SIZE])),
+                with_payload=["anomalies"] + PRICE_COLUMNS,
+                with_vectors=False
+            ):
+                if point.payload and point.payload.get("anomalies"):
+                    existing[point.id] = point.payload
+
+        merged = []
+        for i, (point_id, annotation) in enumerate(zip(ids, annotations)):
+            stored = existing.get(point_id)
+            if stored is not None:
+                anomalies = {}
+                for fuel, flag in stored["anomalies"].items():
+                    value = df[fuel].iloc[i] if fuel in df.columns else None
+                    if value is None or pd.isna(value) or (
+                        stored.get(fuel) is not None and np.isclose(float(value), stored[fuel])
+                    ):
+                        anomalies[fuel] = flag
+                anomalies.update(annotation.get("anomalies", {}))
+                annotation = {k: v for k, v in annotation.items() if k != "anomalies"}
+                annotation["anomaly"] = bool(anomalies)
+                if anomalies:
+                    annotation["anomalies"] = anomalies
+            merged.append(annotation)
+        return merged
+
+    @memory_profiler.profiled("add_price_data", lambda args: {"rows": len(args["df"])})
+    def add_price_data(
+        self,
+        df: pd.DataFrame,
+        progress: Optional[Callable] = None,
+        annotations: Optional[List[Dict]] = None
+    ) -> int:
+        """
+        เพิ่มข้อมูลราคาเข้า Qdrant
+        
+        progress: callable(stage, done=..., total=..., **fields) รับความคืบหน้า
+        (embedded = จำนวนแถวที่ encode แล้ว, upserted = จำนวน batch ที่ upsert แล้ว)
+        annotations: payload field เพิ่มเติมต่อแถวตามลำดับของ df (เช่น flag จาก AnomalyDetector)
+        flag anomaly ของวันที่มีอยู่แล้วจะถูกรวมกับของใหม่ (ดู _merge_anomaly_flags)
+        """
+        report = progress or (lambda *args, **kwargs: None)
         points = []
+        if annotations is not None:
+            annotations = self._merge_anomaly_flags(df, annotations)
         
-        for idx, row in df.iterrows():
-            # สร้าง text description
-            text_parts = [f"วันที่ {row['date'].strftime('%Y-%m-%d')}"]
-            
-            if 'diesel' in row and pd.notna(row['diesel']):
-                text_parts.append(f"ดีเซล {row['diesel']:.2f} บาท")
-            if 'gasohol_95' in row and pd.notna(row['gasohol_95']):
-                text_parts.append(f"แก๊สโซฮอล์ 95 {row['gasohol_95']:.2f} บาท")
-            
-            text = ", ".join(text_parts)
-            
-            # สร้าง embedding
-            vector = self.embedding_model.encode(text).tolist()
-            
+        # สร้าง embedding เป็นชุดใหญ่ (ชุดละ ENCODE_CHUNK_SIZE แถว)
+        texts = [price_to_text(row) for _, row in df.iterrows()]
+        chunks = []
+        for start in range(0, len(texts), ENCODE_CHUNK_SIZE):
+            chunks.append(self.encoder.encode(texts[start:start + ENCODE_CHUNK_SIZE]))
+            report("embedded", done=start + len(chunks[-1]), total=len(texts))
+        vectors = np.concatenate(chunks) if chunks else np.empty((0, self.vector_size), dtype=np.float32)
+        memory_profiler.mark("embedded")
+        features = self._market_features(df) if self.named_vectors else None
+        if features is not None:
+            report("features", done=len(df), total=len(df))
+            memory_profiler.mark("features")
+        
+        for i, (_, row) in enumerate(df.iterrows()):
             # สร้าง payload
             payload = {
                 "date": row['date'].isoformat(),
@@ -74,79 +335,209 @@ class QdrantService:
                 "month": int(row['date'].month),
                 "year": int(row['date'].year)
             }
+            if annotations is not None:
+                payload.update(annotations[i])
+            
+            if self.named_vectors:
+                vector = {
+                    TEXT_VECTOR: vectors[i].tolist(),
+                    FEATURES_VECTOR: features[i].tolist()
+                }
+            else:
+                vector = vectors[i].tolist()
             
             points.append(
                 PointStruct(
-                    id=int(idx),
+                    id=date_to_point_id(row['date']),
                     vector=vector,
                     payload=payload
                 )
             )
         
+        memory_profiler.mark("points", points=len(points))
+
         # Batch upsert
-        batch_size = 100
+        batch_size = UPSERT_BATCH_SIZE
+        batches = (len(points) + batch_size - 1) // batch_size
         for i in range(0, len(points), batch_size):
             self.client.upsert(
                 collection_name=self.collection_name,
                 points=points[i:i+batch_size]
             )
+            report("upserted", done=i // batch_size + 1, total=batches, points=min(i + batch_size, len(points)))
         
+        memory_profiler.mark("upserted")
         logger.info(f"Added {len(points)} records to Qdrant")
         return len(points)
     
-    def get_all_prices(self, fuel_type: str = "diesel", limit: int = 10000) -> pd.DataFrame:
-        """ดึงข้อมูลราคาทั้งหมด"""
+    @memory_profiler.profiled("get_all_prices", lambda args: {"fuel_type": args["fuel_type"]})
+    def get_all_prices(
+        self,
+        fuel_type: str = "diesel",
+        limit: int = 10000,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        year: Optional[int] = None,
+        month: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        ดึงข้อมูลราคา (ล่าสุด limit วัน) เรียงตามวันที่
+        filter และเรียงลำดับทำที่ Qdrant จึงส่งกลับมาเฉพาะแถวที่ต้องใช้
+        """
         results, _ = self.client.scroll(
             collection_name=self.collection_name,
+            scroll_filter=build_filter(
+                fuel_type=fuel_type,
+                year=year,
+                month=month,
+                start_date=start_date,
+                end_date=end_date
+            ),
+            order_by=OrderBy(key="date", direction=Direction.DESC),
             limit=limit,
-            with_payload=True
+            with_payload=["date", fuel_type]
         )
+        memory_profiler.mark("scrolled", points=len(results))
         
-        data = []
-        for point in results:
-            if point.payload.get(fuel_type) is not None:
-                data.append({
-                    'date': pd.to_datetime(point.payload['date']),
-                    fuel_type: point.payload[fuel_type]
-                })
+        data = [
+            {
+                'date': pd.to_datetime(point.payload['date']),
+                fuel_type: point.payload[fuel_type]
+            }
+            for point in results
+        ]
         
-        df = pd.DataFrame(data)
+        df = pd.DataFrame(data, columns=['date', fuel_type])
         df = df.sort_values('date').reset_index(drop=True)
         
         return df
     
+    def get_price_frame(
+        self,
+        fuel_types: Optional[List[str]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        batch_size: int = 2048
+    ) -> pd.DataFrame:
+        """
+        ดึงราคาทุกวันของหลาย fuel_type ในครั้งเดียว (ไม่จำกัดจำนวนแถว)
+        คืน DataFrame แบบ columnar: date + หนึ่ง column ต่อ fuel_type เรียงตามวันที่
+        """
+        fuel_types = fuel_types or PRICE_COLUMNS
+        scroll_filter = build_filter(start_date=start_date, end_date=end_date)
+
+        dates, values = [], {fuel: [] for fuel in fuel_types}
+        offset = None
+        while True:
+            page, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=["date"] + fuel_types,
+                with_vectors=False
+            )
+            for point in page:
+                dates.append(point.payload['date'])
+                for fuel in fuel_types:
+                    values[fuel].append(point.payload.get(fuel))
+            if offset is None:
+                break
+
+        df = pd.DataFrame({'date': pd.to_datetime(dates), **values}, columns=['date'] + fuel_types)
+        df[fuel_types] = df[fuel_types].astype(float)
+        return df.sort_values('date').reset_index(drop=True)
+
+    def get_anomalies(
+        self,
+        fuel_type: Optional[str] = None,
+        kind: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict]:
+        """
+        วันที่ถูก flag ว่าผิดปกติ (payload anomaly = true) ใหม่สุดก่อน
+        filter ตาม fuel_type / kind ของ flag ได้ (ทำที่ Qdrant)
+        """
+        scroll_filter = build_filter(start_date=start_date, end_date=end_date) or Filter(must=[])
+        scroll_filter.must = list(scroll_filter.must or []) + [
+            FieldCondition(key="anomaly", match=MatchValue(value=True))
+        ]
+        fuel_types = [fuel_type] if fuel_type else PRICE_COLUMNS
+        if kind is not None:
+            scroll_filter.should = [
+                FieldCondition(key=f"anomalies.{fuel}.kind", match=MatchValue(value=kind)) for fuel in fuel_types
+            ]
+        elif fuel_type is not None:
+            scroll_filter.must_not = list(scroll_filter.must_not or []) + [
+                IsEmptyCondition(is_empty=PayloadField(key=f"anomalies.{fuel_type}"))
+            ]
+
+        results, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=scroll_filter,
+            order_by=OrderBy(key="date", direction=Direction.DESC),
+            limit=limit,
+            with_payload=["date", "anomalies"] + fuel_types
+        )
+        return [
+            {
+                "date": point.payload['date'][:10],
+                "anomalies": {
+                    fuel: {**flag, "price": point.payload.get(fuel)}
+                    for fuel, flag in point.payload.get("anomalies", {}).items()
+                    if fuel in fuel_types and (kind is None or flag.get("kind") == kind)
+                }
+            }
+            for point in results
+        ]
+
     def search_similar_prices(
         self, 
         price: float, 
         fuel_type: str = "diesel", 
-        limit: int = 5
+        limit: int = 5,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        year: Optional[int] = None,
+        month: Optional[int] = None
     ) -> list:
         """
         ค้นหาวันที่มีราคาใกล้เคียง
-        ใช้ scroll แทน search เพราะ Qdrant client version ใหม่เปลี่ยน API
+        ใช้ order_by บน payload index ของ fuel_type: ดึง limit จุดที่ราคา <= price
+        และ limit จุดที่ราคา > price แล้วเลือกที่ใกล้ที่สุด (ได้ผลเท่ากับ scan ทั้งหมด)
         """
         try:
-            # ใช้ scroll ดึงข้อมูลทั้งหมดแล้ว filter เอง
-            results, _ = self.client.scroll(
+            filters = dict(year=year, month=month, start_date=start_date, end_date=end_date)
+            below, _ = self.client.scroll(
                 collection_name=self.collection_name,
-                limit=1000,
-                with_payload=True
+                scroll_filter=build_filter(fuel_type=fuel_type, max_price=price, **filters),
+                order_by=OrderBy(key=fuel_type, direction=Direction.DESC),
+                limit=limit,
+                with_payload=["date", fuel_type]
+            )
+            above, _ = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=build_filter(fuel_type=fuel_type, min_price=price, **filters),
+                order_by=OrderBy(key=fuel_type, direction=Direction.ASC),
+                limit=limit + len(below),
+                with_payload=["date", fuel_type]
             )
             
-            similar_dates = []
-            for point in results:
-                if point.payload.get(fuel_type) is not None:
-                    point_price = point.payload[fuel_type]
-                    price_diff = abs(point_price - price)
-                    similar_dates.append({
-                        "date": point.payload['date'],
-                        "price": float(point_price),
-                        "price_difference": round(price_diff, 2),
-                        "similarity_score": 1.0 / (1.0 + price_diff)  # แปลง diff เป็น similarity score
-                    })
+            similar_dates = {}
+            for point in below + above:
+                point_price = point.payload[fuel_type]
+                price_diff = abs(point_price - price)
+                similar_dates[point.id] = {
+                    "date": point.payload['date'],
+                    "price": float(point_price),
+                    "price_difference": round(price_diff, 2),
+                    "similarity_score": 1.0 / (1.0 + price_diff)  # แปลง diff เป็น similarity score
+                }
             
             # Sort by price difference และเอาแค่ limit records
-            similar_dates = sorted(similar_dates, key=lambda x: x['price_difference'])[:limit]
+            similar_dates = sorted(similar_dates.values(), key=lambda x: abs(x['price'] - price))[:limit]
             
             return similar_dates
             
@@ -154,6 +545,57 @@ class QdrantService:
             logger.error(f"Search failed: {e}")
             return []
 
+    def search_market_conditions(
+        self,
+        date: str,
+        limit: int = 5,
+        year: Optional[int] = None,
+        month: Optional[int] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> list:
+        """
+        ค้นหาวันในอดีตที่สภาวะตลาดคล้ายกับวันที่ระบุ
+        ใช้ kNN (HNSW) บน features vector ฝั่ง Qdrant พร้อม payload filter
+        """
+        if not self.named_vectors:
+            raise ValueError(
+                f"Collection '{self.collection_name}' has no '{FEATURES_VECTOR}' vector"
+            )
+
+        # หา point ของวันที่ผ่าน payload (collection ที่ migrate มาอาจใช้ id แบบเดิม)
+        points, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=build_filter(start_date=date, end_date=date),
+            limit=1,
+            with_vectors=[FEATURES_VECTOR]
+        )
+        if not points:
+            raise LookupError(f"No price data for {date}")
+        point_id = points[0].id
+
+        query_filter = build_filter(year=year, month=month, start_date=start_date, end_date=end_date)
+        query_filter = query_filter or Filter()
+        query_filter.must_not = [HasIdCondition(has_id=[point_id])]
+
+        response = self.client.query_points(
+            collection_name=self.collection_name,
+            query=points[0].vector[FEATURES_VECTOR],
+            using=FEATURES_VECTOR,
+            query_filter=query_filter,
+            limit=limit,
+            with_payload=True
+        )
+
+        return [
+            {
+                "date": point.payload['date'],
+                "distance": round(float(point.score), 4),
+                "prices": {f: point.payload.get(f) for f in PRICE_COLUMNS}
+            }
+            for point in response.points
+        ]
+
     def store_model_metadata(self, fuel_type: str, metadata: Dict):
         """
         เก็บ model metadata ลง Qdrant collection แยก
@@ -178,7 +620,7 @@ class QdrantService:
 
             # สร้าง embedding จาก metadata description
             text = f"Model for {fuel_type}, trained on {metadata.get('last_train_date')}, type {metadata.get('model_type')}"
-            vector = self.embedding_model.encode(text).tolist()
+            vector = self.encoder.encode([text])[0].tolist()
 
             # สร้าง point ID จาก fuel_type + timestamp
             point_id = hash(f"{fuel_type}_{metadata.get('created_at', '')}") % (10**10)
@@ -201,3 +643,89 @@ class QdrantService:
         except Exception as e:
             logger.error(f"Failed to store model metadata: {e}")
             raise
+
+    def migrate_collection(self, profile_name: str, batch_size: int = 512) -> Dict:
+        """
+        สร้าง collection ใหม่ตาม profile แล้วย้าย points ทั้งหมด (พร้อม vectors) ไป
+        ไม่ต้อง encode ใหม่; features vector คำนวณใหม่จาก payload ทุกครั้ง (สูตรเดียวกับตอน ingest)
+        point id ถูก remap เป็น YYYYMMDD (date_to_point_id) ถ้าวันเดียวกันมีหลาย point
+        (collection เก่าที่ใช้ id ตามลำดับแถว) จะเก็บ point สุดท้ายตามลำดับ scroll
+
+        เมื่อย้ายเสร็จ collection_name จะกลายเป็น alias ที่ชี้ไป collection ใหม่
+        (ถ้าเดิมเป็น alias อยู่แล้วจะสลับ alias แบบ atomic)
+        """
+        profile = get_profile(profile_name)
+        source_info = self.client.get_collection(self.collection_name)
+        source_vectors = source_info.config.params.vectors
+        if isinstance(source_vectors, dict):
+            text_size = source_vectors[TEXT_VECTOR].size
+        else:
+            text_size = source_vectors.size
+
+        aliases = {a.alias_name: a.collection_name for a in self.client.get_aliases().aliases}
+        source_name = aliases.get(self.collection_name, self.collection_name)
+        target_name = f"{self.collection_name}_{profile_name}_{pd.Timestamp.now().strftime('%Y%m%d%H%M%S')}"
+
+        self._create_collection(target_name, profile, text_size)
+        self._ensure_payload_indexes(target_name)
+        logger.info(f"Migrating '{source_name}' -> '{target_name}' (profile: {profile_name})")
+
+        # ดึง points ทั้งหมดพร้อม vectors
+        points = []
+        offset = None
+        while True:
+            page, offset = self.client.scroll(
+                collection_name=source_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            points.extend(page)
+            if offset is None:
+                break
+
+        # หนึ่ง point ต่อวัน ให้ ingest ครั้งถัดไป upsert ทับแทนที่จะเพิ่มวันซ้ำ
+        by_date = {}
+        for point in points:
+            by_date[date_to_point_id(point.payload['date'])] = point
+        points = sorted(by_date.items())
+
+        features = None
+        if points:
+            frame = pd.DataFrame([
+                {'date': pd.to_datetime(p.payload['date']), **{f: p.payload.get(f) for f in PRICE_COLUMNS}}
+                for _, p in points
+            ])
+            features = build_market_features(frame)
+
+        for i in range(0, len(points), batch_size):
+            batch = []
+            for j, (point_id, point) in enumerate(points[i:i + batch_size], start=i):
+                if isinstance(point.vector, dict):
+                    text = point.vector[TEXT_VECTOR]
+                else:
+                    text = point.vector
+                vector = {TEXT_VECTOR: text, FEATURES_VECTOR: features[j].tolist()}
+                batch.append(PointStruct(id=point_id, vector=vector, payload=point.payload))
+            self.client.upsert(collection_name=target_name, points=batch, wait=True)
+
+        migrated = self.client.count(collection_name=target_name, exact=True).count
+        if migrated != len(points):
+            raise RuntimeError(f"Migration incomplete: {migrated}/{len(points)} points in '{target_name}'")
+
+        # สลับไปใช้ collection ใหม่
+        activate_collection(self.client, self.collection_name, target_name)
+
+        self.profile_name = profile_name
+        self.profile = profile
+        self.named_vectors = True
+
+        logger.info(f"Migrated {migrated} points to '{target_name}'")
+        return {
+            "source": source_name,
+            "target": target_name,
+            "profile": profile_name,
+            "points": migrated,
+            "estimated_memory": estimate_memory(profile, migrated, text_size, self.feature_size)
+        }
@@ -0,0 +1,72 @@
+# services/singleflight.py
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    รวม call ที่เหมือนกัน (key เดียวกัน) ที่เข้ามาพร้อมกันให้คำนวณแค่ครั้งเดียว
+
+    call แรกของ key เป็นคนคำนวณ call อื่นที่เข้ามาระหว่างนั้นรอผลเดียวกัน (รวมถึง exception)
+    เมื่อคำนวณเสร็จ key ถูกลบทันที call ถัดไปจึงคำนวณใหม่ (ไม่ใช่ cache)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "executions": 0, "shared": 0, "errors": 0, "max_waiters": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """เรียก fn(*args, **kwargs) หรือรอผลของ call ที่กำลังทำอยู่ คืน (result, shared)"""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["shared"] += 1
+                self._stats["max_waiters"] = max(self._stats["max_waiters"], call.waiters)
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.waiters:
+                logger.debug(f"singleflight[{self.name}] {key!r} shared with {call.waiters} waiters")
+        return call.result, False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["coalescing_ratio"] = round(stats["shared"] / stats["calls"], 3) if stats["calls"] else 0.0
+        return stats
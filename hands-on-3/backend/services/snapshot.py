@@ -0,0 +1,343 @@
+# services/snapshot.py
+"""
+export / import collection ราคา + collection model metadata + model files เป็น bundle เดียว (.tar.gz)
+
+bundle เก็บ vector ที่ encode แล้ว จึง restore ได้โดยไม่ต้องโหลด embedding model
+
+    manifest.json               ข้อมูล bundle (ขนาด vector, embedding backend, จำนวน point)
+    prices/ids.npy              point id (int64)
+    prices/text.npy             text vector (float32, N x d)
+    prices/features.npy         features vector (float32, N x f)
+    prices/payloads.jsonl       payload หนึ่งบรรทัดต่อ point
+    models_meta/...             เหมือนกันสำหรับ {collection}_models (vector เดียว)
+    models/*                    {fuel_type}_model.pkl / .json จาก model_dir
+"""
+import fnmatch
+import io
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import time
+from glob import glob
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, VectorParams
+
+from services.collection_profiles import get_profile, build_vectors_config
+from services.forecast_store import ForecastTable
+from services.qdrant_service import TEXT_VECTOR, FEATURES_VECTOR, PAYLOAD_INDEXES, activate_collection
+from utils.data_loader import PRICE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+MODEL_FILE_PATTERNS = ("*_model.pkl", "*_model.json")
+
+
+def _scroll_all(client: QdrantClient, collection_name: str, batch_size: int) -> List:
+    points = []
+    offset = None
+    while True:
+        page, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        points.extend(page)
+        if offset is None:
+            return points
+
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _add_array(tar: tarfile.TarFile, name: str, array: np.ndarray):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    _add_bytes(tar, name, buffer.getvalue())
+
+
+def _add_payloads(tar: tarfile.TarFile, name: str, payloads: List[Dict]):
+    lines = "\n".join(json.dumps(p, ensure_ascii=False) for p in payloads)
+    _add_bytes(tar, name, lines.encode("utf-8"))
+
+
+def _read(tar: tarfile.TarFile, name: str) -> bytes:
+    member = tar.extractfile(name)
+    if member is None:
+        raise ValueError(f"Snapshot is missing '{name}'")
+    return member.read()
+
+
+def _read_array(tar: tarfile.TarFile, name: str) -> np.ndarray:
+    return np.load(io.BytesIO(_read(tar, name)), allow_pickle=False)
+
+
+def _read_payloads(tar: tarfile.TarFile, name: str) -> List[Dict]:
+    text = _read(tar, name).decode("utf-8")
+    return [json.loads(line) for line in text.splitlines() if line]
+
+
+def export_snapshot(
+    client: QdrantClient,
+    collection_name: str,
+    model_dir: str,
+    output_path: str,
+    batch_size: int = 1024,
+    embedding: Optional[Dict] = None
+) -> Dict:
+    """
+    export collection ราคา, {collection}_models และ model files ลง output_path (.tar.gz)
+
+    Args:
+        embedding: ข้อมูล embedding backend ที่ใช้สร้าง vector (เก็บไว้เตือนตอน import)
+    """
+    vectors_config = client.get_collection(collection_name).config.params.vectors
+    if not isinstance(vectors_config, dict) or FEATURES_VECTOR not in vectors_config:
+        raise ValueError(
+            f"Collection '{collection_name}' has no '{FEATURES_VECTOR}' vector; "
+            f"run 'python manage.py migrate' before taking a snapshot"
+        )
+
+    start = time.perf_counter()
+    points = _scroll_all(client, collection_name, batch_size)
+    text = np.asarray([p.vector[TEXT_VECTOR] for p in points], dtype=np.float32)
+    features = np.asarray([p.vector[FEATURES_VECTOR] for p in points], dtype=np.float32)
+
+    metadata_collection = f"{collection_name}_models"
+    meta_points = _scroll_all(client, metadata_collection, batch_size) \
+        if client.collection_exists(metadata_collection) else []
+
+    model_files = sorted(
+        path for pattern in MODEL_FILE_PATTERNS for path in glob(os.path.join(model_dir, pattern))
+    )
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "created_at": pd.Timestamp.now().isoformat(),
+        "collection_name": collection_name,
+        "embedding": embedding or {},
+        "prices": {
+            "points": len(points),
+            "text_size": vectors_config[TEXT_VECTOR].size,
+            "feature_size": vectors_config[FEATURES_VECTOR].size,
+        },
+        "models_meta": {
+            "points": len(meta_points),
+            "vector_size": len(meta_points[0].vector) if meta_points else None,
+        },
+        "model_files": [os.path.basename(path) for path in model_files],
+    }
+
+    # เขียนไฟล์ชั่วคราวแล้ว rename: ไม่มี bundle ครึ่งๆ ถ้า export ล้ม
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=".tmp-", suffix=".tar.gz")
+    try:
+        with os.fdopen(fd, "wb") as f, tarfile.open(fileobj=f, mode="w:gz") as tar:
+            _add_bytes(tar, "manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8"))
+
+            _add_array(tar, "prices/ids.npy", np.asarray([p.id for p in points], dtype=np.int64))
+            _add_array(tar, "prices/text.npy", text)
+            _add_array(tar, "prices/features.npy", features)
+            _add_payloads(tar, "prices/payloads.jsonl", [p.payload for p in points])
+
+            if meta_points:
+                _add_array(tar, "models_meta/ids.npy", np.asarray([p.id for p in meta_points], dtype=np.int64))
+                _add_array(tar, "models_meta/vectors.npy",
+                           np.asarray([p.vector for p in meta_points], dtype=np.float32))
+                _add_payloads(tar, "models_meta/payloads.jsonl", [p.payload for p in meta_points])
+
+            for path in model_files:
+                tar.add(path, arcname=f"models/{os.path.basename(path)}")
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logger.info(f"Exported {len(points)} points, {len(meta_points)} model metadata points "
+                f"and {len(model_files)} model files to {output_path}")
+    return {
+        **manifest,
+        "path": output_path,
+        "bytes": os.path.getsize(output_path),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def _check_model_file_name(name: str):
+    """ชื่อไฟล์จาก manifest ต้องเป็นชื่อเปล่าๆ ตาม MODEL_FILE_PATTERNS (กัน bundle ที่เขียนออกนอก model_dir)"""
+    if not isinstance(name, str) or os.path.basename(name) != name or name in ("", ".", ".."):
+        raise ValueError(f"Invalid model file name in snapshot: {name!r}")
+    if not any(fnmatch.fnmatchcase(name, pattern) for pattern in MODEL_FILE_PATTERNS):
+        raise ValueError(f"Unexpected model file in snapshot: {name!r}")
+
+
+def _restore_models(tar: tarfile.TarFile, names: List[str], model_dir: str, replace: bool) -> Tuple[List[str], List[str]]:
+    """เขียน model files ลง model_dir แบบ atomic คืน (restored, skipped)"""
+    for name in names:
+        _check_model_file_name(name)
+    os.makedirs(model_dir, exist_ok=True)
+    restored, skipped = [], []
+    # .pkl ก่อน .json: worker ที่เห็น manifest ใหม่จะเจอไฟล์ model ใหม่แล้ว
+    for name in sorted(names, key=lambda n: not n.endswith(".pkl")):
+        target = os.path.join(model_dir, name)
+        if os.path.exists(target) and not replace:
+            skipped.append(name)
+            continue
+        fd, tmp_path = tempfile.mkstemp(dir=model_dir, prefix=".tmp-", suffix=name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_read(tar, f"models/{name}"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        restored.append(name)
+    return restored, skipped
+
+
+def _invalidate_forecasts(db_path: str, payloads: List[Dict], model_files: List[str]) -> List[str]:
+    """ลบ forecast ที่ precompute ไว้ของ fuel ที่ราคาหรือ model ถูก restore (model version อาจซ้ำกับของเดิม)"""
+    fuels = {fuel for fuel in PRICE_COLUMNS if any(p.get(fuel) is not None for p in payloads)}
+    fuels.update(name.rsplit("_model.", 1)[0] for name in model_files)
+    table = ForecastTable(db_path)
+    for fuel in sorted(fuels):
+        table.delete(fuel)
+    return sorted(fuels)
+
+
+def import_snapshot(
+    client: QdrantClient,
+    collection_name: str,
+    model_dir: str,
+    input_path: str,
+    profile_name: str = "memory",
+    batch_size: int = 1024,
+    parallel: int = 4,
+    replace: bool = False,
+    embedding: Optional[Dict] = None,
+    forecast_db_path: Optional[str] = None
+) -> Dict:
+    """
+    restore bundle เข้า Qdrant ด้วย upload_collection (batch ใหญ่, หลาย process) ไม่เรียก encoder
+
+    collection ใหม่ถูกสร้างตาม profile แล้วให้ collection_name เป็น alias ชี้ไป
+    ถ้ามี collection_name อยู่แล้วต้องระบุ replace=True (สลับ alias แบบ atomic แล้วลบของเดิม)
+    {collection}_models และ model files ที่มีอยู่แล้วจะถูกข้ามถ้าไม่ระบุ replace
+
+    Args:
+        forecast_db_path: ตาราง forecast (SQLite) ที่ต้องลบแถวของ fuel ที่ถูก restore
+    """
+    start = time.perf_counter()
+    exists = client.collection_exists(collection_name) or any(
+        a.alias_name == collection_name for a in client.get_aliases().aliases
+    )
+    if exists and not replace:
+        raise ValueError(f"Collection '{collection_name}' already exists; use --replace to overwrite it")
+
+    with tarfile.open(input_path, mode="r:gz") as tar:
+        manifest = json.loads(_read(tar, "manifest.json"))
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {manifest.get('format')}")
+        # ตรวจก่อนสร้าง collection ใดๆ
+        for name in manifest.get("model_files", []):
+            _check_model_file_name(name)
+        if embedding and manifest.get("embedding") and manifest["embedding"] != embedding:
+            logger.warning(
+                f"Snapshot vectors were built with {manifest['embedding']} but this environment uses "
+                f"{embedding}; text search quality will suffer until data is re-embedded"
+            )
+
+        ids = _read_array(tar, "prices/ids.npy")
+        text = _read_array(tar, "prices/text.npy")
+        features = _read_array(tar, "prices/features.npy")
+        payloads = _read_payloads(tar, "prices/payloads.jsonl")
+
+        target_name = f"{collection_name}_restore_{pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')}"
+        client.create_collection(
+            collection_name=target_name,
+            vectors_config=build_vectors_config(
+                get_profile(profile_name),
+                text_size=manifest["prices"]["text_size"],
+                feature_size=manifest["prices"]["feature_size"],
+                text_vector=TEXT_VECTOR,
+                features_vector=FEATURES_VECTOR
+            ),
+            on_disk_payload=get_profile(profile_name)["on_disk_payload"]
+        )
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            client.create_payload_index(collection_name=target_name, field_name=field_name, field_schema=field_schema)
+
+        client.upload_collection(
+            collection_name=target_name,
+            vectors={TEXT_VECTOR: text, FEATURES_VECTOR: features},
+            payload=payloads,
+            ids=ids.tolist(),
+            batch_size=batch_size,
+            parallel=parallel,
+            wait=True
+        )
+        restored = client.count(collection_name=target_name, exact=True).count
+        if restored != len(ids):
+            client.delete_collection(target_name)
+            raise RuntimeError(f"Restore incomplete: {restored}/{len(ids)} points in '{target_name}'")
+        previous = activate_collection(client, collection_name, target_name)
+
+        meta_restored = 0
+        meta_skipped = False
+        metadata_collection = f"{collection_name}_models"
+        if manifest["models_meta"]["points"] and client.collection_exists(metadata_collection) and not replace:
+            meta_skipped = True
+            logger.warning(f"Collection '{metadata_collection}' already exists; skipped (use --replace to overwrite it)")
+        elif manifest["models_meta"]["points"]:
+            if client.collection_exists(metadata_collection):
+                client.delete_collection(metadata_collection)
+            client.create_collection(
+                collection_name=metadata_collection,
+                vectors_config=VectorParams(size=manifest["models_meta"]["vector_size"], distance=Distance.COSINE)
+            )
+            client.upload_collection(
+                collection_name=metadata_collection,
+                vectors=_read_array(tar, "models_meta/vectors.npy"),
+                payload=_read_payloads(tar, "models_meta/payloads.jsonl"),
+                ids=_read_array(tar, "models_meta/ids.npy").tolist(),
+                batch_size=batch_size,
+                wait=True
+            )
+            meta_restored = manifest["models_meta"]["points"]
+
+        models, skipped = _restore_models(tar, manifest["model_files"], model_dir, replace)
+
+    invalidated = []
+    if forecast_db_path and os.path.exists(forecast_db_path):
+        invalidated = _invalidate_forecasts(forecast_db_path, payloads, models)
+
+    logger.info(f"Restored {restored} points into '{target_name}' (alias '{collection_name}')")
+    return {
+        "collection": target_name,
+        "alias": collection_name,
+        "replaced": previous,
+        "points": restored,
+        "model_metadata_points": meta_restored,
+        "skipped_model_metadata": meta_skipped,
+        "model_files": models,
+        "skipped_model_files": skipped,
+        "invalidated_forecasts": invalidated,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
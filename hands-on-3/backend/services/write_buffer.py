@@ -0,0 +1,354 @@
+# services/write_buffer.py
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# จำนวน WAL slot สูงสุด (หนึ่ง slot ต่อ worker ที่ใช้ wal_path เดียวกัน)
+WAL_SLOTS = 64
+
+
+class BufferFullError(Exception):
+    """buffer เต็ม (backpressure) ให้ client ส่งใหม่ภายหลัง"""
+
+
+class PriceWriteBuffer:
+    """
+    Write-behind buffer สำหรับ /prices
+
+    สะสม record ไว้แล้ว flush เป็น batch เดียว (encode + upsert ครั้งเดียว)
+    เมื่อครบ max_batch record หรือ record แรกรอนานเกิน max_delay วินาที
+
+    ถ้ากำหนด wal_path ทุก record จะถูกเขียนลง WAL (JSON lines) ก่อนตอบ client
+    และ replay ตอน start ถ้า process ตายก่อน flush
+
+    หลาย worker ที่ตั้ง wal_path เดียวกันจะจอง slot คนละไฟล์ด้วย file lock
+    (prices.wal, prices.1.wal, ...) WAL ของ slot ที่ไม่มี worker ถืออยู่ (เช่นลดจำนวน worker)
+    จะถูก worker ที่ start ทีหลัง replay ต่อ
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[pd.DataFrame], int],
+        max_batch: int = 500,
+        max_delay: float = 1.0,
+        max_pending: int = 10000,
+        wal_path: Optional[str] = None,
+        fsync: bool = False
+    ):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.wal_path = wal_path
+        self.base_wal_path = wal_path
+        self.fsync = fsync
+
+        self._pending: deque = deque()
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._wal = None
+        self._wal_lock = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self._stats = {
+            "flushes": 0,
+            "failed_flushes": 0,
+            "flushed_records": 0,
+            "rejected_records": 0,
+            "last_flush_ms": None,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "last_batch_size": 0,
+            "last_error": None,
+        }
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        """replay WAL ที่ค้างอยู่ แล้วเริ่ม background flush thread"""
+        if self.wal_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.wal_path)), exist_ok=True)
+            self._claim_wal()
+            replayed = self._replay_wal()
+            if replayed:
+                logger.info(f"Replayed {replayed} records from WAL {self.wal_path}")
+            self._wal = open(self.wal_path, "a", encoding="utf-8")
+
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="price-write-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """flush ที่เหลือทั้งหมดแล้วหยุด thread"""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        while self.pending:
+            if not self.flush():
+                break
+        if self._wal:
+            self._wal.close()
+            self._wal = None
+        if self._wal_lock:
+            self._unlock(self._wal_lock)
+            self._wal_lock = None
+
+    # ---------- write path ----------
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, record: Dict) -> int:
+        """เพิ่ม record เข้า buffer คืนจำนวนที่รอ flush; buffer เต็มจะ raise BufferFullError"""
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._stats["rejected_records"] += 1
+                raise BufferFullError(
+                    f"Write buffer full ({len(self._pending)}/{self.max_pending} pending)"
+                )
+
+            if self._wal:
+                self._wal.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._wal.flush()
+                if self.fsync:
+                    os.fsync(self._wal.fileno())
+
+            self._pending.append(record)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.notify()
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """flush หนึ่ง batch (สูงสุด max_batch record) คืนจำนวน record ที่เขียนสำเร็จ"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                self._oldest = time.monotonic() if self._pending else None
+                flushing_path = self._rotate_wal()
+
+            start = time.perf_counter()
+            try:
+                df = pd.DataFrame(batch)
+                df['date'] = pd.to_datetime(df['date'])
+                # record วันเดียวกันใน batch เดียวกัน ใช้ค่าล่าสุด
+                df = df.drop_duplicates(subset='date', keep='last').sort_values('date').reset_index(drop=True)
+                self.flush_fn(df)
+            except Exception as e:
+                logger.error(f"Write buffer flush failed ({len(batch)} records): {e}")
+                with self._lock:
+                    self._pending.extendleft(reversed(batch))
+                    self._oldest = self._oldest or time.monotonic()
+                    self._restore_wal(flushing_path, batch)
+                    self._stats["failed_flushes"] += 1
+                    self._stats["last_error"] = str(e)
+                return 0
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if flushing_path:
+                os.remove(flushing_path)
+
+            with self._lock:
+                self._stats["flushes"] += 1
+                self._stats["flushed_records"] += len(batch)
+                self._stats["last_flush_ms"] = round(elapsed_ms, 2)
+                self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed_ms), 2)
+                self._stats["total_flush_ms"] += elapsed_ms
+                self._stats["last_batch_size"] = len(batch)
+
+            logger.info(f"Flushed {len(batch)} buffered price records in {elapsed_ms:.1f} ms")
+            return len(batch)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._stopping:
+                    if len(self._pending) >= self.max_batch:
+                        break
+                    if self._oldest is not None:
+                        wait = self.max_delay - (time.monotonic() - self._oldest)
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._wakeup.wait(timeout=wait)
+                if self._stopping:
+                    return
+            if not self.flush() and self.pending:
+                # flush ล้มเหลว: รอ max_delay ก่อนลองใหม่
+                with self._lock:
+                    if not self._stopping:
+                        self._wakeup.wait(timeout=self.max_delay)
+
+    # ---------- WAL ----------
+
+    def _rotate_wal(self) -> Optional[str]:
+        """ย้าย WAL ปัจจุบันไปเป็นไฟล์ .flushing แล้วเปิดไฟล์ใหม่ (เรียกขณะถือ _lock)
+
+        record ที่ยังไม่อยู่ใน batch นี้ถูกเขียนกลับลง WAL ใหม่ทันที
+        """
+        if not self._wal:
+            return None
+        flushing_path = f"{self.wal_path}.flushing"
+        self._wal.close()
+        os.replace(self.wal_path, flushing_path)
+        self._wal = open(self.wal_path, "a", encoding="utf-8")
+        self._write_wal(self._pending)
+        return flushing_path
+
+    def _restore_wal(self, flushing_path: Optional[str], batch: List[Dict]):
+        """
+        flush ไม่สำเร็จ: เขียน WAL ใหม่จาก _pending ตามลำดับ (เรียกขณะถือ _lock หลังคืน batch เข้า _pending)
+
+        WAL ใหม่มี record ที่มาทีหลัง batch อยู่แล้ว ถ้าต่อ batch ท้ายไฟล์ตอน replay ค่าเก่าจะทับค่าใหม่
+        """
+        if not flushing_path:
+            return
+        self._wal.close()
+        self._rewrite_wal(self._pending)
+        self._wal = open(self.wal_path, "a", encoding="utf-8")
+        os.remove(flushing_path)
+
+    def _rewrite_wal(self, records):
+        """แทนที่ WAL ทั้งไฟล์แบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename)"""
+        tmp_path = f"{self.wal_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.wal_path)
+
+    def _write_wal(self, records):
+        for record in records:
+            self._wal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._wal.flush()
+        if self.fsync:
+            os.fsync(self._wal.fileno())
+
+    def _slot_path(self, slot: int) -> str:
+        root, ext = os.path.splitext(self.base_wal_path)
+        return self.base_wal_path if slot == 0 else f"{root}.{slot}{ext}"
+
+    @staticmethod
+    def _try_lock(path: str):
+        """file lock แบบไม่รอของ WAL path (None ถ้า process อื่นถืออยู่)"""
+        lock_file = open(f"{path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    @staticmethod
+    def _unlock(lock_file):
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    def _claim_wal(self):
+        """จอง WAL slot แรกที่ไม่มี worker อื่นใช้ แล้วใช้เป็น wal_path ของ buffer นี้"""
+        if fcntl is None:
+            return
+        for slot in range(WAL_SLOTS):
+            path = self._slot_path(slot)
+            lock = self._try_lock(path)
+            if lock is not None:
+                self.wal_path, self._wal_lock = path, lock
+                if slot:
+                    logger.info(f"WAL {self.base_wal_path} is in use by another worker, using {path}")
+                return
+        raise RuntimeError(f"All {WAL_SLOTS} WAL slots of {self.base_wal_path} are in use")
+
+    def _read_wal(self, path: str) -> int:
+        """เพิ่ม record จาก WAL (.flushing ก่อน แล้วตัวไฟล์) ต่อท้าย _pending"""
+        replayed = 0
+        for file_path in (f"{path}.flushing", path):
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._pending.append(json.loads(line))
+                        replayed += 1
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping corrupt WAL line in {file_path}")
+        return replayed
+
+    def _replay_wal(self) -> int:
+        """โหลด record ที่ค้างใน WAL ของ slot นี้ และของ slot ที่ไม่มี worker ถืออยู่"""
+        replayed = self._read_wal(self.wal_path)
+        adopted = []
+        if fcntl is not None:
+            for slot in range(WAL_SLOTS):
+                path = self._slot_path(slot)
+                if path == self.wal_path:
+                    continue
+                if not (os.path.exists(path) or os.path.exists(f"{path}.flushing")):
+                    continue
+                lock = self._try_lock(path)
+                if lock is None:
+                    continue  # worker อื่นใช้ slot นี้อยู่
+                count = self._read_wal(path)
+                logger.info(f"Adopted {count} records from orphaned WAL {path}")
+                replayed += count
+                adopted.append((path, lock))
+
+        if replayed:
+            self._oldest = time.monotonic()
+        # เขียน WAL ใหม่ให้มีเฉพาะ record ที่ค้าง (ก่อนลบไฟล์ที่อ่านมา)
+        self._rewrite_wal(self._pending)
+        for path in [f"{self.wal_path}.flushing"] + [p for a, _ in adopted for p in (a, f"{a}.flushing")]:
+            if os.path.exists(path):
+                os.remove(path)
+        for _, lock in adopted:
+            self._unlock(lock)
+        return replayed
+
+    # ---------- metrics ----------
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            pending = len(self._pending)
+            oldest = self._oldest
+        stats["total_flush_ms"] = round(stats["total_flush_ms"], 2)
+        stats["avg_flush_ms"] = round(stats["total_flush_ms"] / stats["flushes"], 2) if stats["flushes"] else None
+        stats.update({
+            "pending": pending,
+            "max_pending": self.max_pending,
+            "utilization": round(pending / self.max_pending, 3),
+            "oldest_pending_seconds": round(time.monotonic() - oldest, 3) if oldest else 0.0,
+            "max_batch": self.max_batch,
+            "max_delay": self.max_delay,
+            "wal_path": self.wal_path,
+            "fsync": self.fsync,
+        })
+        return stats
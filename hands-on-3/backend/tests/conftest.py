@@ -0,0 +1,66 @@
+# tests/conftest.py
+import os
+import sys
+
+# ให้ import models / services / utils ได้เหมือนรันจาก backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def app_main(tmp_path_factory):
+    """
+    main ที่ใช้ Qdrant แบบ in-memory และ hashing encoder (ไม่ต้องมี Qdrant server / embedding model)
+    import ครั้งเดียวต่อ session; test ที่เปลี่ยน global ของ main ใช้ monkeypatch
+    """
+    root = tmp_path_factory.mktemp("app")
+    from qdrant_client import QdrantClient
+    from config import settings
+    from services import qdrant_service
+
+    settings.embedding_backend = "hashing"
+    settings.data_dir = str(root)
+    settings.model_dir = str(root / "models")
+    settings.forecast_db_path = str(root / "forecasts.sqlite")
+    settings.price_buffer_enabled = False
+    settings.anomaly_retrain_on_change = False
+
+    client = QdrantClient(":memory:")
+    original = qdrant_service.QdrantClient
+    qdrant_service.QdrantClient = lambda *args, **kwargs: client
+    try:
+        import main
+    finally:
+        qdrant_service.QdrantClient = original
+    return main
+
+
+@pytest.fixture
+def memory_qdrant(monkeypatch):
+    """QdrantService บน Qdrant in-memory ของ test นี้เท่านั้น (hashing encoder)"""
+    from qdrant_client import QdrantClient
+    from services import qdrant_service
+    from services.embeddings import HashingEncoder
+
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(qdrant_service, "QdrantClient", lambda *args, **kwargs: client)
+    return qdrant_service.QdrantService(collection_name="prices", encoder=HashingEncoder())
+
+
+@pytest.fixture
+def app_state(app_main, memory_qdrant, monkeypatch):
+    """
+    main ที่ใช้ Qdrant และ cache ของ /prices/history, /analytics ของ test นี้เท่านั้น
+    (ไม่มี anomaly detector / forecast scheduler) ingest_prices จึงเห็นผลเฉพาะข้อมูลของ test
+    """
+    from services.analytics import PriceAnalytics
+    from services.price_history import PriceHistoryCache
+
+    history = PriceHistoryCache(loader=memory_qdrant.get_price_frame)
+    monkeypatch.setattr(app_main, "qdrant_service", memory_qdrant)
+    monkeypatch.setattr(app_main, "price_history", history)
+    monkeypatch.setattr(app_main, "price_analytics", PriceAnalytics(history))
+    monkeypatch.setattr(app_main, "anomaly_detector", None)
+    monkeypatch.setattr(app_main, "forecast_scheduler", None)
+    return app_main
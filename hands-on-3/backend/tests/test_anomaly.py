@@ -0,0 +1,149 @@
+# tests/test_anomaly.py
+import threading
+
+import numpy as np
+import pandas as pd
+
+from services.anomaly import AnomalyDetector, CHANGE_POINT, INVALID, SPIKE
+
+
+def frame(values, start="2025-01-01", fuel="diesel"):
+    return pd.DataFrame({"date": pd.date_range(start, periods=len(values), freq="D"), fuel: values})
+
+
+def quiet_series(n=60, level=30.0, seed=0):
+    return level + np.random.default_rng(seed).normal(0, 0.05, n)
+
+
+def kinds(events):
+    return [e["kind"] for e in events]
+
+
+def test_quiet_series_has_no_events():
+    detector = AnomalyDetector()
+    annotations, events = detector.process(frame(quiet_series(120)))
+    assert events == []
+    assert not any(a["anomaly"] for a in annotations)
+    assert detector.stats()["fuel_types"]["diesel"]["observations"] == 120
+
+
+def test_spike_is_flagged_and_not_learned():
+    values = quiet_series(60)
+    values[45] = values[44] * 1.5
+    detector = AnomalyDetector()
+    annotations, events = detector.process(frame(values))
+
+    # วันที่กระโดดขึ้นและวันที่กลับลงมา (return เทียบกับวันก่อน) ถูก flag ทั้งคู่
+    assert kinds(events) == [SPIKE, SPIKE]
+    assert events[0]["date"] == "2025-02-15" and events[0]["score"] > detector.z_threshold
+    assert events[1]["date"] == "2025-02-16" and events[1]["score"] < -detector.z_threshold
+    assert annotations[45] == {"anomaly": True, "anomalies": {"diesel": {"kind": SPIKE, "score": events[0]["score"]}}}
+    # spike ไม่ถูกนำไปอัปเดต mean: ระดับยังอยู่ที่ ~30
+    assert abs(detector.stats()["fuel_types"]["diesel"]["mean"] - 30) < 0.5
+
+
+def test_level_shift_confirms_change_point_once():
+    values = np.concatenate([quiet_series(60), quiet_series(40, level=31.0, seed=1)])
+    detector = AnomalyDetector()
+    _, events = detector.process(frame(values))
+
+    assert kinds(events) == [CHANGE_POINT]
+    event = events[0]
+    assert event["direction"] == "up"
+    # ยืนยันหลังเปลี่ยนระดับไม่กี่วัน แล้วเริ่ม baseline ใหม่ที่ระดับใหม่
+    assert pd.Timestamp("2025-03-02") <= pd.Timestamp(event["date"]) <= pd.Timestamp("2025-03-10")
+    assert abs(detector.stats()["fuel_types"]["diesel"]["mean"] - 31) < 0.2
+
+
+def test_non_positive_prices_are_invalid():
+    values = quiet_series(40)
+    values[10], values[30] = 0.0, -5.0
+    detector = AnomalyDetector()
+    annotations, events = detector.process(frame(values))
+
+    assert kinds(events) == [INVALID, INVALID]
+    assert annotations[10]["anomalies"]["diesel"]["kind"] == INVALID
+    assert annotations[30]["anomaly"]
+    # ค่า invalid ไม่นับเป็น observation
+    assert detector.stats()["fuel_types"]["diesel"]["observations"] == 38
+
+
+def test_no_flags_during_warmup():
+    values = quiet_series(20)
+    values[10] = values[9] * 2
+    _, events = AnomalyDetector(warmup=30).process(frame(values))
+    assert events == []
+
+
+def test_late_rows_skipped_and_full_history_resets():
+    detector = AnomalyDetector()
+    detector.process(frame(quiet_series(60)))
+
+    # วันที่เคยเห็นแล้ว (แม้ราคาเพี้ยน) ถูกข้าม
+    _, events = detector.process(frame([100.0], start="2025-02-01"))
+    assert events == [] and detector.stats()["fuel_types"]["diesel"]["late_rows"] == 1
+
+    # batch ที่ครอบคลุมประวัติทั้งหมดเริ่ม state ใหม่
+    detector.process(frame(quiet_series(10, level=40)))
+    state = detector.stats()["fuel_types"]["diesel"]
+    assert state["observations"] == 10 and state["late_rows"] == 0
+
+
+def test_seed_loads_history_once_without_events():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return frame(quiet_series(60))
+
+    detector = AnomalyDetector(history_loader=loader)
+    detector.seed()
+    detector.seed()
+    _, events = detector.process(frame([30.0], start="2025-03-02"))
+    assert calls == [1] and events == [] and detector.events() == []
+    assert detector.stats()["fuel_types"]["diesel"]["observations"] == 61
+
+
+def test_change_point_retrain_respects_cooldown(app_main, monkeypatch):
+    started = []
+    done = threading.Event()
+
+    def run_job(kind, job_id, fn, *args, **kwargs):
+        started.append(kind)
+        done.set()
+
+    monkeypatch.setattr(app_main, "run_job", run_job)
+    monkeypatch.setattr(app_main, "last_change_retrain", {})
+    monkeypatch.setattr(app_main.predictor, "model_exists", lambda fuel_type: fuel_type == "diesel")
+    monkeypatch.setattr(app_main.settings, "anomaly_retrain_cooldown", 3600)
+
+    events = [{"fuel_type": "diesel", "kind": CHANGE_POINT}, {"fuel_type": "lpg", "kind": CHANGE_POINT}]
+    app_main.retrain_on_change(events)
+    assert done.wait(5)
+    assert started == ["change-point-retrain"]
+    assert "retrain_job_id" in events[0] and "retrain_job_id" not in events[1]
+
+    # ภายใน cooldown ไม่สั่ง retrain ซ้ำ
+    app_main.retrain_on_change([{"fuel_type": "diesel", "kind": CHANGE_POINT}])
+    assert started == ["change-point-retrain"]
+
+
+def test_reingest_keeps_or_replaces_stored_flags(memory_qdrant):
+    day = pd.Timestamp("2025-06-01")
+    spike = {"kind": SPIKE, "score": 12.0}
+    invalid = {"kind": INVALID}
+
+    def ingest(diesel, lpg, annotation):
+        memory_qdrant.add_price_data(pd.DataFrame([{"date": day, "diesel": diesel, "lpg": lpg}]),
+                                     annotations=[annotation])
+        point = memory_qdrant.client.retrieve("prices", [20250601])[0]
+        return point.payload.get("anomaly"), point.payload.get("anomalies")
+
+    assert ingest(80.0, -1.0, {"anomaly": True, "anomalies": {"diesel": spike, "lpg": invalid}}) == \
+        (True, {"diesel": spike, "lpg": invalid})
+    # ข้อมูลเดิมซ้ำ (detector ข้ามวันที่เคยเห็น): คง flag เดิม
+    assert ingest(80.0, -1.0, {"anomaly": False}) == (True, {"diesel": spike, "lpg": invalid})
+    # แก้ราคา diesel แล้ว: flag diesel หาย lpg คงอยู่
+    assert ingest(30.0, -1.0, {"anomaly": False}) == (True, {"lpg": invalid})
+    # แก้ lpg ด้วย: ไม่เหลือ flag
+    assert ingest(30.0, 20.0, {"anomaly": False}) == (False, None)
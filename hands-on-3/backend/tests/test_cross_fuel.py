@@ -0,0 +1,102 @@
+# tests/test_cross_fuel.py
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from utils.cross_fuel import rolling_correlation, cross_correlation, log_returns, spread_summary, stride_indices
+
+
+def random_returns(n=250, fuels=3, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(0, 0.01, (n, 1))
+    return base + rng.normal(0, 0.01, (n, fuels))
+
+
+def test_rolling_correlation_matches_pandas():
+    returns = random_returns()
+    window = 20
+    rolling = rolling_correlation(returns, window)
+    assert rolling.shape == (len(returns) - window + 1, 3, 3)
+
+    df = pd.DataFrame(returns)
+    for i in range(3):
+        for j in range(3):
+            expected = df[i].rolling(window).corr(df[j]).to_numpy()[window - 1:]
+            np.testing.assert_allclose(rolling[:, i, j], expected, atol=1e-9)
+
+
+def test_rolling_correlation_nan_for_flat_window():
+    returns = random_returns(n=60, fuels=2)
+    returns[10:40, 1] = 0.0
+    rolling = rolling_correlation(returns, 10)
+    # window ที่ตกอยู่ในช่วงราคาคงที่ทั้งหมด (เริ่ม 10..30) correlation ไม่นิยาม
+    assert np.isnan(rolling[10:31, 0, 1]).all()
+    assert np.isfinite(rolling[:10, 0, 1]).all() and np.isfinite(rolling[31:, 0, 1]).all()
+
+
+def naive_cross_correlation(returns, max_lag):
+    """sum_t z_i[t] * z_j[t + lag] / (n - |lag|) วนทีละคู่ทีละ lag"""
+    n, fuels = returns.shape
+    z = (returns - returns.mean(axis=0)) / returns.std(axis=0)
+    out = np.empty((fuels, fuels, 2 * max_lag + 1))
+    for i in range(fuels):
+        for j in range(fuels):
+            for k, lag in enumerate(range(-max_lag, max_lag + 1)):
+                if lag >= 0:
+                    total = np.dot(z[:n - lag, i], z[lag:, j])
+                else:
+                    total = np.dot(z[-lag:, i], z[:n + lag, j])
+                out[i, j, k] = total / (n - abs(lag))
+    return out
+
+
+def test_cross_correlation_matches_naive():
+    returns = random_returns(n=97)
+    np.testing.assert_allclose(cross_correlation(returns, 15), naive_cross_correlation(returns, 15), atol=1e-10)
+    np.testing.assert_allclose(cross_correlation(returns, 96), naive_cross_correlation(returns, 96), atol=1e-10)
+
+
+def test_cross_correlation_finds_leader():
+    rng = np.random.default_rng(1)
+    leader = rng.normal(0, 0.01, 203)
+    returns = np.column_stack([leader[3:], leader[:-3]])  # column 1 ตาม column 0 ไป 3 วัน
+    values = cross_correlation(returns, 10)
+    lags = np.arange(-10, 11)
+    assert lags[np.argmax(values[0, 1])] == 3
+    assert lags[np.argmax(values[1, 0])] == -3
+    assert values[0, 1, 13] > 0.95
+
+
+def test_helpers():
+    prices = np.array([[10.0, 20.0], [11.0, 20.0], [12.1, 22.0]])
+    np.testing.assert_allclose(log_returns(prices), np.log(prices[1:] / prices[:-1]))
+    assert spread_summary(np.array([1.0, 1.0]))["z_score"] is None
+    assert spread_summary(np.array([0.0, 2.0]))["z_score"] == 1.0
+    assert stride_indices(5, 10).tolist() == [0, 1, 2, 3, 4]
+    assert stride_indices(100, 4).tolist() == [0, 33, 66, 99]
+
+
+def test_ingest_invalidates_analytics_cache(app_state):
+    rng = np.random.default_rng(2)
+    days = 90
+    diesel = 30 * np.exp(rng.normal(0, 0.01, days).cumsum())
+    app_state.ingest_prices(pd.DataFrame({
+        "date": pd.date_range("2025-01-01", periods=days, freq="D"),
+        "diesel": diesel,
+        "lpg": 20 * np.exp(rng.normal(0, 0.01, days).cumsum()),
+    }))
+    client = TestClient(app_state.app)
+    params = {"fuel_type": "lpg", "window": 10, "max_lag": 5}
+
+    before = client.get("/analytics", params=params).json()
+    assert before["end_date"] == "2025-03-31" and before["observations"] == days
+    assert client.get("/analytics", params=params).json() == before
+    assert app_state.price_analytics.stats()["hits"] == 1
+
+    app_state.ingest_prices(pd.DataFrame({
+        "date": [pd.Timestamp("2025-04-01")], "diesel": [diesel[-1] * 1.05], "lpg": [25.0]
+    }))
+    after = client.get("/analytics", params=params).json()
+    assert after["end_date"] == "2025-04-01" and after["observations"] == days + 1
+    assert after["spreads"]["series"]["lpg"]["last"] == round(25.0 - diesel[-1] * 1.05, 4)
+    assert app_state.price_analytics.stats()["misses"] == 2
@@ -0,0 +1,30 @@
+# tests/test_data_loader.py
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import build_market_features
+
+
+def test_market_features_same_across_ingest_paths():
+    """vector ของวันหนึ่งต้องเท่ากันไม่ว่าจะมาจาก batch ที่มีช่องว่าง / ไม่เรียง หรือ ingest ทีละวันพร้อมประวัติ"""
+    rng = np.random.default_rng(1)
+    dates = pd.date_range("2025-01-01", periods=90, freq="D")
+    df = pd.DataFrame({"date": dates, "diesel": 30 + np.cumsum(rng.normal(0, 0.2, len(dates)))})
+    # batch ที่ขาดบางวัน (วันหยุด) และสลับลำดับ
+    batch = df.drop(index=[40, 41, 55, 70]).sample(frac=1, random_state=0)
+    features = build_market_features(batch)
+
+    for i in (60, 72, 89):
+        day = df.loc[i, "date"]
+        history = batch[(batch["date"] < day) & (batch["date"] >= day - pd.Timedelta(days=30))]
+        single = build_market_features(pd.concat([history, df.loc[[i]]], ignore_index=True))[-1]
+        np.testing.assert_allclose(single, features[batch.index.get_loc(i)], rtol=1e-5, atol=1e-6)
+
+
+def test_market_features_count_calendar_days():
+    """lag 7 วันเทียบกับราคาเมื่อ 7 วันก่อน แม้ระหว่างนั้นจะไม่มีข้อมูล"""
+    df = pd.DataFrame({"date": pd.to_datetime(["2025-01-01", "2025-01-08"]), "diesel": [30.0, 33.0]})
+    features = build_market_features(df)
+    # ret_1 (ffill วันก่อน = 30) และ ret_7 = +10% * RELATIVE_SCALE
+    assert features[1, 1] == np.float32(1.0)
+    assert features[1, 2] == np.float32(1.0)
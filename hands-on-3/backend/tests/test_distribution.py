@@ -0,0 +1,80 @@
+# tests/test_distribution.py
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.predictor import OilPricePredictor, SIMULATION_MIN_PERIODS
+
+
+def make_prices(days=120, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "date": pd.date_range("2025-01-01", periods=days, freq="D"),
+        "lpg": 20 + rng.normal(0, 0.1, days).cumsum(),
+    })
+
+
+@pytest.fixture
+def predictor(tmp_path):
+    warnings.simplefilter("ignore")
+    predictor = OilPricePredictor(model_dir=str(tmp_path))
+    predictor.train(make_prices(), fuel_type="lpg")
+    return predictor
+
+
+def test_simulation_cached_per_paths_and_seed(predictor):
+    paths = predictor.simulate_paths(7, paths=500, seed=1, fuel_type="lpg")
+    assert paths.shape == (7, 500) and not paths.flags.writeable
+
+    # horizon ที่ไม่เกิน SIMULATION_MIN_PERIODS ใช้ matrix เดียวกัน
+    longer = predictor.simulate_paths(SIMULATION_MIN_PERIODS, paths=500, seed=1, fuel_type="lpg")
+    assert np.shares_memory(paths, longer)
+    np.testing.assert_array_equal(longer[:7], paths)
+
+    other_seed = predictor.simulate_paths(7, paths=500, seed=2, fuel_type="lpg")
+    assert not np.shares_memory(paths, other_seed) and not np.array_equal(paths, other_seed)
+
+
+def test_distribution_matches_paths(predictor):
+    quantiles = (0.05, 0.5, 0.95)
+    result = predictor.forecast_distribution(
+        periods=10, quantiles=quantiles, paths=400, seed=3, sample_paths=5, fuel_type="lpg"
+    )
+    paths = predictor.simulate_paths(10, paths=400, seed=3, fuel_type="lpg")
+    last = float(make_prices()["lpg"].iloc[-1])
+
+    for q in quantiles:
+        np.testing.assert_array_equal(result["quantiles"][f"{q:g}"], np.quantile(paths, q, axis=1).round(2))
+    np.testing.assert_array_equal(result["mean"], paths.mean(axis=1).round(2))
+    np.testing.assert_array_equal(result["sample_paths"], paths[:, :5].T.round(2))
+    assert result["date"][0] == "2025-05-01" and result["day"].tolist() == list(range(1, 11))
+
+    summary = result["summary"]
+    assert summary["last_observed"] == round(last, 2)
+    assert summary["prob_above_last"] == round(float((paths[-1] > last).mean()), 4)
+    assert summary["final"]["quantiles"]["0.5"] == round(float(np.quantile(paths[-1], 0.5)), 2)
+    assert summary["path_max"]["0.95"] == round(float(np.quantile(paths.max(axis=0), 0.95)), 2)
+
+    # เรียกซ้ำได้ผลเดิม (deterministic ตาม seed)
+    again = predictor.forecast_distribution(periods=10, quantiles=quantiles, paths=400, seed=3, fuel_type="lpg")
+    np.testing.assert_array_equal(again["quantiles"]["0.5"], result["quantiles"]["0.5"])
+
+
+def test_new_data_and_model_version_drop_cached_paths(predictor, tmp_path):
+    before = predictor.simulate_paths(7, paths=300, seed=0, fuel_type="lpg")
+
+    # worker อื่นได้ข้อมูลใหม่แล้ว train: ensure_current โหลด version ใหม่และ simulate จาก model ใหม่
+    other = OilPricePredictor(model_dir=str(tmp_path))
+    extended = pd.concat([make_prices(), pd.DataFrame({
+        "date": pd.date_range("2025-05-01", periods=10, freq="D"), "lpg": np.full(10, 30.0)
+    })])
+    assert other.train(extended, fuel_type="lpg")["version"] == 2
+
+    assert predictor.ensure_current("lpg")
+    after = predictor.simulate_paths(7, paths=300, seed=0, fuel_type="lpg")
+    assert not np.shares_memory(before, after)
+    assert abs(after[0].mean() - 30.0) < abs(before[0].mean() - 30.0)
+    result = predictor.forecast_distribution(periods=7, paths=300, seed=0, fuel_type="lpg")
+    assert result["date"][0] == "2025-05-11" and result["summary"]["last_observed"] == 30.0
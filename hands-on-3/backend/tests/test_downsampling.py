@@ -0,0 +1,111 @@
+# tests/test_downsampling.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.downsampling import resample_ohlc, lttb_indices, downsample_ohlc, pick_interval
+
+
+def daily_prices(days=200, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "date": pd.date_range("2024-01-03", periods=days, freq="D"),
+        "diesel": 30 + rng.normal(0, 0.3, days).cumsum(),
+        "lpg": 20 + rng.normal(0, 0.2, days).cumsum(),
+    })
+    df.loc[[0, 5, 6, 40], "diesel"] = np.nan
+    # lpg ไม่มีราคาทั้งสัปดาห์ 2024-03-04..2024-03-10
+    df.loc[(df["date"] >= "2024-03-04") & (df["date"] <= "2024-03-10"), "lpg"] = np.nan
+    return df
+
+
+def naive_ohlc(df, column, period_start):
+    """OHLC แบบวนทีละแถว: เปิด/ปิด = ราคาแรก/สุดท้ายที่ไม่ใช่ NaN ของช่วง"""
+    rows = {}
+    for date, value in zip(df["date"], df[column]):
+        if np.isnan(value):
+            continue
+        key = period_start(date)
+        if key not in rows:
+            rows[key] = [value, value, value, value]
+        else:
+            row = rows[key]
+            row[1], row[2], row[3] = max(row[1], value), min(row[2], value), value
+    return pd.DataFrame.from_dict(rows, orient="index", columns=["open", "high", "low", "close"]).sort_index()
+
+
+@pytest.mark.parametrize("interval, period_start", [
+    ("day", lambda d: d),
+    ("week", lambda d: d - pd.Timedelta(days=d.weekday())),
+    ("month", lambda d: d.replace(day=1)),
+])
+def test_resample_ohlc_matches_naive_grouping(interval, period_start):
+    df = daily_prices()
+    result = resample_ohlc(df, ["diesel", "lpg"], interval)
+    for column in ("diesel", "lpg"):
+        expected = naive_ohlc(df, column, period_start)
+        pd.testing.assert_frame_equal(result[column], expected, check_names=False, check_freq=False)
+
+    if interval == "week":
+        assert pd.Timestamp("2024-03-04") not in result["lpg"].index
+        assert pd.Timestamp("2024-03-04") in result["diesel"].index
+
+
+def test_resample_ohlc_rejects_unknown_interval():
+    with pytest.raises(ValueError):
+        resample_ohlc(daily_prices(), ["diesel"], "hour")
+
+
+def test_pick_interval():
+    start = pd.Timestamp("2024-01-01")
+    assert pick_interval(start, start + pd.Timedelta(days=299), 300) == "day"
+    assert pick_interval(start, start + pd.Timedelta(days=300), 300) == "week"
+    assert pick_interval(start, start + pd.Timedelta(days=3000), 300) == "month"
+
+
+def naive_lttb(x, y, threshold):
+    """LTTB ตามต้นฉบับ (Steinarsson 2013) วนทีละ bucket ทีละจุด"""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) * 0.5
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+@pytest.mark.parametrize("n, threshold", [(10, 3), (100, 7), (1000, 50), (1001, 300), (365, 364)])
+def test_lttb_matches_reference(n, threshold):
+    rng = np.random.default_rng(n)
+    x = np.arange(n, dtype=float) * 86400
+    y = rng.normal(0, 1, n).cumsum()
+    assert lttb_indices(x, y, threshold).tolist() == naive_lttb(x.tolist(), y.tolist(), threshold)
+
+
+def test_lttb_keeps_everything_when_under_threshold():
+    x = np.arange(5, dtype=float)
+    assert lttb_indices(x, x, 5).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(x, x, 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_downsample_ohlc_keeps_spike_and_endpoints():
+    ohlc = resample_ohlc(daily_prices(days=400, seed=1), ["lpg"], "day")["lpg"]
+    spike = ohlc.index[200]
+    ohlc.loc[spike, "close"] = 100.0
+    sampled = downsample_ohlc(ohlc, 40)
+    assert len(sampled) == 40
+    assert sampled.index[0] == ohlc.index[0] and sampled.index[-1] == ohlc.index[-1]
+    assert spike in sampled.index
+    assert downsample_ohlc(ohlc, len(ohlc)) is ohlc
@@ -0,0 +1,121 @@
+# tests/test_forecast_store.py
+import sqlite3
+import time
+
+import pytest
+
+from services.forecast_store import ForecastScheduler, ForecastTable
+
+LATEST = ("2025-03-01", 30.5)
+
+
+def make_entry(version=1, data_date=LATEST[0], current_price=LATEST[1], horizon=30, computed_at=None):
+    """entry แบบเดียวกับที่ ForecastTable.get คืน (horizon = จำนวนวันใน predictions)"""
+    return {
+        "horizon": horizon,
+        "model_version": version,
+        "last_train_date": "2025-02-28",
+        "current_price": current_price,
+        "data_date": data_date,
+        "confidence": 0.95,
+        "predictions": [{"day": d, "predicted_price": 30.0 + d} for d in range(1, horizon + 1)],
+        "computed_at": computed_at if computed_at is not None else time.time(),
+    }
+
+
+def fresh(entry, version=1, latest=LATEST, horizon=30, max_age=3600):
+    return ForecastTable.is_fresh(entry, version, horizon, 0.95, max_age, latest)
+
+
+def test_table_round_trip(tmp_path):
+    table = ForecastTable(str(tmp_path / "f.sqlite"))
+    table.put("lpg", make_entry())
+    entry = table.get("lpg")
+    assert entry["data_date"] == LATEST[0] and entry["horizon"] == 30
+    assert entry["predictions"][0] == {"day": 1, "predicted_price": 31.0}
+    assert [row["fuel_type"] for row in table.list()] == ["lpg"]
+    table.delete("lpg")
+    assert table.get("lpg") is None
+
+
+def test_fresh_entry(tmp_path):
+    table = ForecastTable(str(tmp_path / "f.sqlite"))
+    table.put("lpg", make_entry())
+    assert fresh(table.get("lpg"))
+
+
+def test_stale_model_version():
+    assert not fresh(make_entry(version=1), version=2)
+    assert not fresh(make_entry(), version=None)
+
+
+def test_stale_data():
+    entry = make_entry()
+    # ingest วันใหม่ / แก้ราคาวันล่าสุด
+    assert not fresh(entry, latest=("2025-03-02", 30.5))
+    assert not fresh(entry, latest=(LATEST[0], 31.0))
+    # entry จากก่อนมี data_date
+    assert not fresh({**entry, "data_date": None})
+
+
+def test_stale_age_and_short_horizon():
+    assert not fresh(make_entry(computed_at=time.time() - 7200), max_age=3600)
+    assert not fresh(make_entry(horizon=7), horizon=30)
+    assert not fresh(None)
+
+
+def test_old_table_gets_data_date_column(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE forecasts (
+                fuel_type TEXT PRIMARY KEY, model_version INTEGER NOT NULL, last_train_date TEXT NOT NULL,
+                current_price REAL NOT NULL, horizon INTEGER NOT NULL, confidence REAL NOT NULL,
+                predictions TEXT NOT NULL, computed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("INSERT INTO forecasts VALUES ('lpg', 1, '2025-02-28', 30.5, 30, 0.95, '[]', ?)", (time.time(),))
+
+    table = ForecastTable(path)
+    entry = table.get("lpg")
+    assert entry["data_date"] is None and not fresh(entry)
+
+
+def test_scheduler_run_once_counts_failures(tmp_path):
+    table = ForecastTable(str(tmp_path / "f.sqlite"))
+
+    def compute(fuel_type):
+        if fuel_type == "bad":
+            raise LookupError("No price data found")
+        return make_entry()
+
+    scheduler = ForecastScheduler(table, compute, lambda: ["lpg", "bad"])
+    assert scheduler.run_once() == 1
+    assert table.get("lpg") is not None and table.get("bad") is None
+    assert scheduler.stats["failed"] == 1 and "bad" in scheduler.stats["last_error"]
+
+
+def test_resolve_forecast_recomputes_after_new_data(app_main, tmp_path, monkeypatch):
+    """ingest ใหม่ (แถวล่าสุดเปลี่ยน) ต้องไม่ได้ forecast เดิมแบบ materialized"""
+    table = ForecastTable(str(tmp_path / "f.sqlite"))
+    latest = {"value": LATEST}
+    computed = []
+
+    def compute_forecast(fuel_type, latest=None):
+        computed.append(latest)
+        return make_entry(data_date=latest[0], current_price=latest[1])
+
+    monkeypatch.setattr(app_main, "forecast_table", table)
+    monkeypatch.setattr(app_main, "compute_forecast", compute_forecast)
+    monkeypatch.setattr(app_main, "latest_price", lambda fuel_type: latest["value"])
+    monkeypatch.setattr(app_main.predictor.store, "manifest", lambda fuel_type: {"version": 1})
+
+    entry, source = app_main.resolve_forecast("lpg")
+    assert source == "live" and computed == [LATEST]
+    assert app_main.resolve_forecast("lpg")[1] == "materialized"
+
+    latest["value"] = ("2025-03-02", 31.0)
+    entry, source = app_main.resolve_forecast("lpg")
+    assert source == "live" and entry["current_price"] == 31.0
+    assert table.get("lpg")["data_date"] == "2025-03-02"
+    assert app_main.resolve_forecast("lpg")[1] == "materialized"
@@ -0,0 +1,44 @@
+# tests/test_panel_forecaster.py
+import numpy as np
+import pandas as pd
+
+from models.panel_forecaster import forecast_panel, forecast_panel_columns
+from utils.data_loader import load_eppo_long_csv
+
+
+def write_long_csv(path, weeks: int = 60, ended_after: int = 20):
+    """long-format EPPO: series A รายงานครบ, series B เลิกรายงานหลัง ended_after สัปดาห์"""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2024-01-07", periods=weeks, freq="W")
+    rows = []
+    for i, date in enumerate(dates):
+        common = {"Year": date.year, "Month": date.strftime("%B"), "Date": date.day}
+        rows.append({**common, "Item": "HSD", "Country": "TH", "Price(Baht)": 30 + rng.normal(0, 0.5)})
+        if i < ended_after:
+            rows.append({**common, "Item": "HSD", "Country": "DE", "Price(Baht)": 50 + rng.normal(0, 2.0)})
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return dates
+
+
+def test_discontinued_series_is_not_carried_forward(tmp_path):
+    path = tmp_path / "long.csv"
+    dates = write_long_csv(path)
+    panel = load_eppo_long_csv(str(path))
+
+    ended = panel["HSD | DE"]
+    assert ended.notna().sum() == 20
+    assert ended.last_valid_index() == dates[19]
+    assert ended.loc[dates[20]:].isna().all()
+
+    records = {r["series"]: r for r in forecast_panel(panel, horizon=2)}
+    assert records["HSD | DE"]["last_observed"] == dates[19].strftime("%Y-%m-%d")
+    assert records["HSD | DE"]["observations"] == 20
+    assert records["HSD | TH"]["observations"] == len(dates)
+
+    columns = forecast_panel_columns(panel, horizon=2)
+    i = columns["series"].index("HSD | DE")
+    assert columns["last_observed"][i] == dates[19].strftime("%Y-%m-%d")
+    assert int(columns["observations"][i]) == 20
+    # interval มาจากความผันผวนจริง (std ~2) ไม่ถูกค่าที่ copy มา (error = 0) ทำให้แคบลง
+    width = columns["upper_bound"][i, 0] - columns["lower_bound"][i, 0]
+    assert width > 2 * 1.96 * 1.0
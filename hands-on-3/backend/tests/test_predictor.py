@@ -0,0 +1,119 @@
+# tests/test_predictor.py
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from models.predictor import OilPricePredictor, fingerprint_diff, training_fingerprint
+
+
+def make_prices(days: int = 120) -> pd.DataFrame:
+    """ราคาจำลองที่ระดับต่างกันชัดเจน: lpg ~ 20, gasohol_95 ~ 40"""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2025-01-01", periods=days, freq="D")
+    return pd.DataFrame({
+        "date": dates,
+        "lpg": 20 + rng.normal(0, 0.2, days),
+        "gasohol_95": 40 + rng.normal(0, 0.3, days),
+    })
+
+
+def test_hot_swap_train_while_predicting_other_fuel(tmp_path):
+    """
+    resident model / hot-swap: train fuel หนึ่งพร้อมกับ ensure_current + predict อีก fuel
+    ต้องไม่ save model ผิด fuel / ผิด version และ predict ต้องใช้ model ของ fuel ตัวเองเสมอ
+    """
+    warnings.simplefilter("ignore")
+    predictor = OilPricePredictor(model_dir=str(tmp_path))
+    df = make_prices()
+    predictor.train(df, fuel_type="lpg")
+
+    stop = threading.Event()
+    predictions, errors = [], []
+
+    def predict_lpg():
+        while not stop.is_set():
+            try:
+                predictor.ensure_current("lpg")
+                predictions.append(predictor.predict(periods=3, fuel_type="lpg")[0]["predicted_price"])
+            except Exception as e:  # pragma: no cover - แสดงใน assert ด้านล่าง
+                errors.append(e)
+
+    thread = threading.Thread(target=predict_lpg)
+    thread.start()
+    try:
+        results = [predictor.train(df, fuel_type="gasohol_95", force=True) for _ in range(2)]
+    finally:
+        stop.set()
+        thread.join()
+
+    assert not errors
+    assert predictions and all(abs(p - 20) < 5 for p in predictions)
+
+    assert [r["version"] for r in results] == [1, 2]
+    assert predictor.store.manifest("gasohol_95")["version"] == 2
+    assert predictor.store.manifest("lpg")["version"] == 1
+
+    for fuel_type, level in (("lpg", 20), ("gasohol_95", 40)):
+        saved, _ = predictor.store.load(fuel_type)
+        assert saved["fuel_type"] == fuel_type
+        assert abs(np.mean(saved["model_fit"].model.endog) - level) < 1
+        assert predictor.model_info(fuel_type)["version"] == saved["version"]
+
+
+def test_fingerprint_diff_lists_months():
+    ts = make_prices().set_index("date")["lpg"]
+    before = training_fingerprint(ts)
+    assert fingerprint_diff(before, training_fingerprint(ts.copy())) == {}
+    assert fingerprint_diff(None, before) == {"reason": "no previous fingerprint"}
+
+    edited = ts.copy()
+    edited.loc["2025-02-10"] += 0.01
+    assert fingerprint_diff(before, training_fingerprint(edited)) == {"changed_months": ["2025-02"]}
+
+    extended = pd.concat([ts, pd.Series([20.0], index=[pd.Timestamp("2025-05-01")])])
+    diff = fingerprint_diff(before, training_fingerprint(extended))
+    assert diff["added_months"] == ["2025-05"]
+    assert diff["rows"] == {"before": 120, "after": 121}
+    assert diff["end_date"] == {"before": "2025-04-30", "after": "2025-05-01"}
+
+    trimmed = ts.loc["2025-02-01":]
+    diff = fingerprint_diff(before, training_fingerprint(trimmed))
+    assert diff["removed_months"] == ["2025-01"] and diff["start_date"]["after"] == "2025-02-01"
+    assert "changed_months" not in diff
+
+
+def test_retrain_skipped_until_data_or_settings_change(tmp_path):
+    warnings.simplefilter("ignore")
+    predictor = OilPricePredictor(model_dir=str(tmp_path))
+    df = make_prices()
+
+    first = predictor.train(df, fuel_type="lpg")
+    assert first["retrained"] and first["version"] == 1
+    assert first["why"] == {"reason": "no previous fingerprint"}
+
+    # ข้อมูลเดิมทุกแถว (ลำดับแถวต่างกันได้): ใช้ model เดิม
+    again = predictor.train(df.sample(frac=1, random_state=0), fuel_type="lpg")
+    assert not again["retrained"] and again["version"] == 1 and again["why"] == {}
+    assert again["metrics"] == first["metrics"]
+
+    # แก้ราคาหนึ่งวันในเดือนมีนาคม: retrain และบอกว่าเดือนไหนเปลี่ยน
+    edited = df.copy()
+    edited.loc[edited["date"] == "2025-03-15", "lpg"] += 0.5
+    changed = predictor.train(edited, fuel_type="lpg")
+    assert changed["retrained"] and changed["version"] == 2
+    assert changed["why"] == {"changed_months": ["2025-03"]}
+
+    # hyperparameters เปลี่ยน
+    tuned = predictor.train(edited, fuel_type="lpg", order=(2, 1, 1))
+    assert tuned["retrained"] and tuned["version"] == 3
+    assert tuned["why"] == {"hyperparameters": {
+        "before": {"order": [1, 1, 1], "seasonal_order": [1, 1, 1, 7]},
+        "after": {"order": [2, 1, 1], "seasonal_order": [1, 1, 1, 7]},
+    }}
+
+    # force=True train ใหม่แม้ข้อมูลไม่เปลี่ยน
+    forced = predictor.train(edited, fuel_type="lpg", order=(2, 1, 1), force=True)
+    assert forced["retrained"] and forced["version"] == 4 and forced["why"] == {"reason": "forced"}
+    assert predictor.store.manifest("lpg")["version"] == 4
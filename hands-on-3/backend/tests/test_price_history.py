@@ -0,0 +1,57 @@
+# tests/test_price_history.py
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from services.price_history import PriceHistoryCache
+
+
+def prices(start, days, diesel=30.0, lpg=20.0):
+    return pd.DataFrame({
+        "date": pd.date_range(start, periods=days, freq="D"),
+        "diesel": diesel + np.arange(days) * 0.1,
+        "lpg": lpg + np.zeros(days),
+    })
+
+
+def test_history_results_cached_until_invalidate():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return prices("2025-01-01", 60)
+
+    cache = PriceHistoryCache(loader=loader)
+    first = cache.history(fuel_types=["diesel"], interval="week")
+    assert cache.history(fuel_types=["diesel"], interval="week") is first
+    assert cache.stats()["hits"] == 1 and len(loads) == 1
+
+    cache.invalidate()
+    again = cache.history(fuel_types=["diesel"], interval="week")
+    assert again is not first and again == first
+    assert len(loads) == 2 and cache.stats()["cached_queries"] == 1
+
+
+def test_ingest_invalidates_history_cache(app_state):
+    client = TestClient(app_state.app)
+    app_state.ingest_prices(prices("2025-01-01", 31))
+
+    before = client.get("/prices/history", params={"fuel_type": "diesel", "interval": "month"}).json()
+    assert before["end_date"] == "2025-01-31"
+    assert before["series"]["diesel"]["data"] == [
+        {"date": "2025-01-01", "open": 30.0, "high": 33.0, "low": 30.0, "close": 33.0}
+    ]
+    client.get("/prices/history", params={"fuel_type": "diesel", "interval": "month"})
+    assert app_state.price_history.stats()["hits"] == 1
+
+    # ราคาวันใหม่ + แก้ราคาวันเดิม
+    update = prices("2025-01-31", 2, diesel=40.0)
+    app_state.ingest_prices(update)
+
+    after = client.get("/prices/history", params={"fuel_type": "diesel", "interval": "month"}).json()
+    assert after["end_date"] == "2025-02-01"
+    assert after["series"]["diesel"]["data"] == [
+        {"date": "2025-01-01", "open": 30.0, "high": 40.0, "low": 30.0, "close": 40.0},
+        {"date": "2025-02-01", "open": 40.1, "high": 40.1, "low": 40.1, "close": 40.1},
+    ]
+    assert app_state.price_history.stats()["invalidations"] == 2
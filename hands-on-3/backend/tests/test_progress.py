@@ -0,0 +1,44 @@
+# tests/test_progress.py
+import asyncio
+
+import pytest
+
+from services.progress import ProgressBus
+
+
+def test_unknown_job_is_not_created():
+    """subscribe / wait ด้วย job_id ที่ไม่มีต้องไม่สร้าง job (ไม่ดัน job จริงออกจาก max_jobs)"""
+    bus = ProgressBus(max_jobs=2)
+    reporter = bus.start_job("train", "real")
+
+    async def probe():
+        for i in range(5):
+            assert not await bus.wait_for_job(f"missing-{i}", timeout=0.01)
+            with pytest.raises(LookupError):
+                await bus.subscribe(f"missing-{i}").__anext__()
+
+    asyncio.run(probe())
+    assert [job["job_id"] for job in bus.jobs()] == ["real"]
+
+    bus.finish(reporter, result={"ok": True})
+    assert bus.jobs()[0]["finished"]
+
+
+def test_wait_for_job_started_after_subscribe():
+    """เปิด stream ก่อนแล้วค่อยเริ่ม job ด้วย job_id เดียวกันยังได้ event ครบ"""
+    bus = ProgressBus()
+
+    async def scenario():
+        async def start_later():
+            await asyncio.sleep(0.05)
+            reporter = bus.start_job("train", "late")
+            reporter("fitted")
+            bus.finish(reporter)
+
+        task = asyncio.create_task(start_later())
+        assert await bus.wait_for_job("late", timeout=1.0)
+        stages = [event["stage"] async for event in bus.subscribe("late") if event is not None]
+        await task
+        return stages
+
+    assert asyncio.run(scenario()) == ["fitted", "done"]
@@ -0,0 +1,40 @@
+# tests/test_qdrant_service.py
+import numpy as np
+import pandas as pd
+from qdrant_client.models import IsEmptyCondition
+
+from services.qdrant_service import build_filter
+
+
+def test_build_filter_fuel_presence_without_default_range():
+    assert build_filter() is None
+
+    only_fuel = build_filter(fuel_type="lpg")
+    assert only_fuel.must is None
+    assert only_fuel.must_not == [IsEmptyCondition(is_empty={"key": "lpg"})]
+
+    below = build_filter(fuel_type="lpg", max_price=20.0, year=2025)
+    price_range = below.must[0].range
+    assert below.must[0].key == "lpg" and price_range.gte is None and price_range.lte == 20.0
+    assert below.must[1].key == "year"
+
+    dates = build_filter(start_date="2025-01-01")
+    assert dates.must_not is None and dates.must[0].key == "date"
+
+
+def test_fuel_filter_keeps_every_stored_price(memory_qdrant):
+    lpg = np.array([20.0, np.nan, 0.0, -1.0, 21.0, np.nan])
+    memory_qdrant.add_price_data(pd.DataFrame({
+        "date": pd.date_range("2025-01-01", periods=len(lpg), freq="D"),
+        "diesel": np.full(len(lpg), 30.0),
+        "lpg": lpg,
+    }))
+
+    # วันที่ไม่มีราคา lpg ถูกตัด แต่ค่า 0 / ติดลบ (ข้อมูลผิดที่ detector flag ไว้) ยังอยู่
+    prices = memory_qdrant.get_all_prices(fuel_type="lpg")
+    assert prices["date"].dt.strftime("%Y-%m-%d").tolist() == ["2025-01-01", "2025-01-03", "2025-01-04", "2025-01-05"]
+    assert prices["lpg"].tolist() == [20.0, 0.0, -1.0, 21.0]
+    assert len(memory_qdrant.get_all_prices(fuel_type="diesel")) == len(lpg)
+
+    similar = memory_qdrant.search_similar_prices(0.5, fuel_type="lpg", limit=2)
+    assert [s["price"] for s in similar] == [0.0, -1.0]
@@ -0,0 +1,36 @@
+# tests/test_responses.py
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+from utils import responses
+
+CONTENT = {
+    "price": float("nan"),
+    "bounds": np.array([1.5, np.nan, np.inf]),
+    "change": np.float64(-np.inf),
+    "nested": [{"value": float("inf")}, (np.int64(3), date(2025, 1, 2))],
+    1: "non-string key",
+}
+EXPECTED = {
+    "price": None,
+    "bounds": [1.5, None, None],
+    "change": None,
+    "nested": [{"value": None}, [3, "2025-01-02"]],
+    "1": "non-string key",
+}
+
+
+def test_stdlib_fallback_writes_nan_as_null(monkeypatch):
+    """ไม่มี orjson: NaN / inf ต้องเป็น null (ไม่ raise เพราะ allow_nan=False)"""
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(responses.dumps(CONTENT)) == EXPECTED
+
+
+@pytest.mark.skipif(responses.orjson is None, reason="ต้องใช้ orjson")
+def test_orjson_and_fallback_agree(monkeypatch):
+    fast = json.loads(responses.dumps(CONTENT))
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(responses.dumps(CONTENT)) == fast == EXPECTED
@@ -0,0 +1,108 @@
+# tests/test_singleflight.py
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def wait_for_waiters(flight: SingleFlight, waiters: int, timeout: float = 5.0):
+    """ให้ call แรกค้างไว้จนทุก call ที่เหลือเข้ามารอ key เดียวกันแล้ว"""
+    deadline = time.monotonic() + timeout
+    while flight.stats()["shared"] < waiters:
+        assert time.monotonic() < deadline, "callers did not coalesce"
+        time.sleep(0.005)
+
+
+def run_concurrently(target, n: int = CALLERS):
+    results = [None] * n
+
+    def worker(i):
+        try:
+            results[i] = ("ok", target())
+        except Exception as e:
+            results[i] = ("error", e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_identical_calls_execute_once():
+    flight = SingleFlight("test")
+    executions = []
+
+    def compute():
+        executions.append(1)
+        wait_for_waiters(flight, CALLERS - 1)
+        return {"value": 42}
+
+    results = run_concurrently(lambda: flight.do("key", compute))
+
+    assert len(executions) == 1
+    values = [value for status, (value, _) in results if status == "ok"]
+    assert len(values) == CALLERS and all(v is values[0] for v in values)
+    assert sorted(shared for _, (_, shared) in results) == [False] + [True] * (CALLERS - 1)
+
+    stats = flight.stats()
+    assert stats["calls"] == CALLERS and stats["executions"] == 1 and stats["in_flight"] == 0
+    assert stats["coalescing_ratio"] == round((CALLERS - 1) / CALLERS, 3)
+
+    # key ถูกลบเมื่อเสร็จ: call ถัดไปคำนวณใหม่ (ไม่ใช่ cache)
+    flight.do("key", lambda: {"value": 0})
+    assert flight.stats()["executions"] == 2
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight("test")
+
+    def fail():
+        wait_for_waiters(flight, CALLERS - 1)
+        raise ValueError("boom")
+
+    results = run_concurrently(lambda: flight.do("key", fail))
+
+    errors = [value for status, value in results if status == "error"]
+    assert len(errors) == CALLERS
+    assert all(isinstance(e, ValueError) and e is errors[0] for e in errors)
+    assert flight.stats()["errors"] == 1 and flight.stats()["executions"] == 1
+
+
+def test_predict_coalescing_reported_in_metrics(app_main, monkeypatch):
+    """/predict ที่เหมือนกันพร้อมกันคำนวณครั้งเดียว และ /metrics รายงาน coalescing_ratio ตามนั้น"""
+    flight = SingleFlight("predict")
+    monkeypatch.setattr(app_main, "predict_flight", flight)
+    executions = []
+
+    def resolve_forecast(fuel_type):
+        executions.append(fuel_type)
+        wait_for_waiters(flight, CALLERS - 1)
+        entry = {
+            "model_version": 1, "last_train_date": "2025-01-01", "current_price": 30.0,
+            "computed_at": time.time(),
+            "predictions": [{"day": 1, "date": "2025-01-02", "predicted_price": 30.1,
+                             "lower_bound": 29.0, "upper_bound": 31.0}],
+        }
+        return entry, "live"
+
+    monkeypatch.setattr(app_main, "resolve_forecast", resolve_forecast)
+    client = TestClient(app_main.app)
+    responses = run_concurrently(
+        lambda: client.post("/predict", json={"fuel_type": "diesel", "horizon": 1})
+    )
+
+    assert executions == ["diesel"]
+    bodies = [response.json() for _, response in responses]
+    assert all(r.status_code == 200 for _, r in responses)
+    assert sum(body["model_info"]["coalesced"] for body in bodies) == CALLERS - 1
+
+    metrics = client.get("/metrics").json()["singleflight"]["predict"]
+    assert metrics["calls"] == CALLERS and metrics["executions"] == 1
+    assert metrics["coalescing_ratio"] == pytest.approx((CALLERS - 1) / CALLERS, abs=1e-3)
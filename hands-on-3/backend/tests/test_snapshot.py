@@ -0,0 +1,50 @@
+# tests/test_snapshot.py
+import io
+import json
+import tarfile
+
+import pytest
+from qdrant_client import QdrantClient
+
+from services.snapshot import BUNDLE_FORMAT, _restore_models, import_snapshot
+
+BAD_NAMES = ["../evil_model.pkl", "/tmp/evil_model.pkl", "sub/lpg_model.pkl", "..", "notes.txt", "lpg_model.py"]
+
+
+def write_bundle(path, model_files):
+    """bundle ที่มีแค่ manifest + model files (ชื่อตามที่กำหนด) ตรวจชื่อก่อนอ่านส่วนอื่น"""
+    manifest = {"format": BUNDLE_FORMAT, "model_files": model_files}
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in [("manifest.json", json.dumps(manifest).encode())] + \
+                [(f"models/{name}", b"payload") for name in model_files]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+@pytest.mark.parametrize("name", BAD_NAMES)
+def test_restore_rejects_unsafe_model_file_names(tmp_path, name):
+    bundle = tmp_path / "bundle.tar.gz"
+    write_bundle(bundle, [name])
+    model_dir = tmp_path / "models"
+    client = QdrantClient(":memory:")
+
+    with pytest.raises(ValueError):
+        import_snapshot(client, "oil", str(model_dir), str(bundle), parallel=1)
+    # ไม่สร้าง collection และไม่เขียนไฟล์ใดๆ
+    assert client.get_collections().collections == []
+    assert not (tmp_path / "evil_model.pkl").exists()
+    assert not model_dir.exists()
+
+    with tarfile.open(bundle, "r:gz") as tar, pytest.raises(ValueError):
+        _restore_models(tar, [name], str(model_dir), replace=True)
+    assert not model_dir.exists()
+
+
+def test_restore_models_writes_matching_names(tmp_path):
+    bundle = tmp_path / "bundle.tar.gz"
+    write_bundle(bundle, ["lpg_model.pkl", "lpg_model.json"])
+    with tarfile.open(bundle, "r:gz") as tar:
+        restored, skipped = _restore_models(tar, ["lpg_model.pkl", "lpg_model.json"], str(tmp_path / "m"), False)
+    assert restored == ["lpg_model.pkl", "lpg_model.json"] and skipped == []
+    assert (tmp_path / "m" / "lpg_model.pkl").read_bytes() == b"payload"
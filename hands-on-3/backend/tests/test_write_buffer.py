@@ -0,0 +1,75 @@
+# tests/test_write_buffer.py
+import json
+
+import pandas as pd
+import pytest
+
+from services import write_buffer
+from services.write_buffer import PriceWriteBuffer
+
+
+def read_wal(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def crash(buffer: PriceWriteBuffer):
+    """จำลอง process ตาย: ปิด WAL และปล่อย lock โดยไม่ flush"""
+    buffer._stopping = True
+    buffer._wal.close()
+    buffer._unlock(buffer._wal_lock)
+
+
+def test_failed_flush_keeps_wal_order(tmp_path):
+    """flush ล้มเหลว: WAL ต้องเรียงเหมือน _pending (ค่าใหม่ของวันเดียวกันอยู่หลัง)"""
+    flushed = []
+
+    def flush_fn(df: pd.DataFrame):
+        if not flushed:
+            flushed.append(None)
+            raise RuntimeError("qdrant down")
+        flushed.append(df)
+        return len(df)
+
+    wal_path = str(tmp_path / "prices.wal")
+    buffer = PriceWriteBuffer(flush_fn, max_batch=10, max_delay=60, wal_path=wal_path)
+    buffer.start()
+    buffer.add({"date": "2026-01-01", "diesel": 30.0})
+    buffer.add({"date": "2026-01-01", "diesel": 31.0})
+
+    buffer.max_batch = 1
+    assert buffer.flush() == 0
+    assert [r["diesel"] for r in read_wal(wal_path)] == [30.0, 31.0]
+    assert [r["diesel"] for r in buffer._pending] == [30.0, 31.0]
+
+    # restart หลัง crash: replay แล้วค่าล่าสุดของวันนั้นต้องเป็น 31
+    crash(buffer)
+    replayed = PriceWriteBuffer(flush_fn, max_batch=10, max_delay=60, wal_path=wal_path)
+    replayed.start()
+    replayed.stop()
+    assert flushed[-1]["diesel"].tolist() == [31.0]
+
+
+@pytest.mark.skipif(write_buffer.fcntl is None, reason="ต้องใช้ fcntl")
+def test_workers_claim_separate_wal_slots(tmp_path):
+    wal_path = str(tmp_path / "prices.wal")
+    flushed = []
+    first = PriceWriteBuffer(lambda df: flushed.append(df), max_delay=60, wal_path=wal_path)
+    second = PriceWriteBuffer(lambda df: flushed.append(df), max_delay=60, wal_path=wal_path)
+    first.start()
+    second.start()
+    assert first.wal_path == wal_path
+    assert second.wal_path == str(tmp_path / "prices.1.wal")
+
+    second.add({"date": "2026-01-02", "diesel": 32.0})
+    crash(second)
+    first.stop()
+
+    # worker ที่ start ใหม่ได้ slot แรก และรับ WAL ของ slot ที่ไม่มีใครถือไป replay
+    restarted = PriceWriteBuffer(lambda df: flushed.append(df), max_delay=60, wal_path=wal_path)
+    restarted.start()
+    assert restarted.wal_path == wal_path
+    assert restarted.pending == 1
+    restarted.stop()
+    assert flushed[-1]["diesel"].tolist() == [32.0]
+    assert not (tmp_path / "prices.1.wal").exists()
@@ -0,0 +1,97 @@
+# utils/cross_fuel.py
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ค่าต่ำสุดของ variance ที่ถือว่าไม่ใช่ 0 (ราคาคงที่ทั้ง window = correlation ไม่นิยาม)
+_EPS = 1e-12
+
+
+def nan_to_none(values: np.ndarray, decimals: int = 4) -> list:
+    """array -> list ที่ NaN เป็น None (JSON null ทั้งกับ orjson และ json ของ stdlib)"""
+    values = np.asarray(values, dtype=float).round(decimals)
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def log_returns(prices: np.ndarray) -> np.ndarray:
+    """log return รายวันของทุก column (T x F -> T-1 x F)"""
+    return np.diff(np.log(prices), axis=0)
+
+
+def stride_indices(n: int, points: int) -> np.ndarray:
+    """index ห่างเท่ากันไม่เกิน points จุด (รวมจุดสุดท้ายเสมอ)"""
+    if n <= points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, points).round().astype(int))
+
+
+def spread_summary(spread: np.ndarray) -> Dict[str, Optional[float]]:
+    """สถิติของ spread หนึ่งคู่ (z_score = ตำแหน่งของค่าล่าสุดเทียบกับทั้งช่วง)"""
+    std = float(spread.std())
+    last = float(spread[-1])
+    mean = float(spread.mean())
+    return {
+        "last": round(last, 4),
+        "mean": round(mean, 4),
+        "std": round(std, 4),
+        "min": round(float(spread.min()), 4),
+        "max": round(float(spread.max()), 4),
+        "z_score": round((last - mean) / std, 3) if std > _EPS else None,
+    }
+
+
+def rolling_correlation(returns: np.ndarray, window: int) -> np.ndarray:
+    """
+    correlation matrix ของทุกคู่ใน window ล่าสุด ณ ทุกจุดเวลา
+
+    ใช้ผลรวมสะสมของ x และ x_i * x_j (T x F x F) แล้วลบกันที่ระยะ window
+    จึงได้ทุก window ทุกคู่ในครั้งเดียว O(T * F^2) ไม่ขึ้นกับขนาด window
+
+    Returns:
+        array (T - window + 1) x F x F; NaN ถ้ามี column ที่ไม่เปลี่ยนเลยใน window
+    """
+    # ลบค่าเฉลี่ยก่อน ลด error ของผลรวมสะสมที่ยาว
+    x = returns - returns.mean(axis=0)
+    zero = np.zeros((1,) + x.shape[1:])
+    s = np.concatenate([zero, np.cumsum(x, axis=0)])
+    outer = x[:, :, None] * x[:, None, :]
+    s2 = np.concatenate([zero[:, :, None] * zero[:, None, :], np.cumsum(outer, axis=0)])
+
+    mean = (s[window:] - s[:-window]) / window
+    cov = (s2[window:] - s2[:-window]) / window - mean[:, :, None] * mean[:, None, :]
+    var = np.diagonal(cov, axis1=1, axis2=2)
+    std = np.sqrt(np.where(var > _EPS, var, np.nan))
+    return cov / (std[:, :, None] * std[:, None, :])
+
+
+def cross_correlation(returns: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    correlation ระหว่าง x_i[t] กับ x_j[t + lag] ของทุกคู่ lag = -max_lag..max_lag
+
+    คำนวณทุกคู่ทุก lag พร้อมกันด้วย FFT (zero-padded จึงไม่วนรอบ)
+    lag บวก = column i นำ column j อยู่ lag วัน
+
+    Returns:
+        array F x F x (2 * max_lag + 1)
+    """
+    n = len(returns)
+    std = returns.std(axis=0)
+    z = (returns - returns.mean(axis=0)) / np.where(std > _EPS, std, np.nan)
+    z = np.nan_to_num(z)
+
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    spectrum = np.fft.rfft(z, n=size, axis=0)
+    # ผลคูณของทุกคู่: sum_t z_i[t] * z_j[t + lag]
+    raw = np.fft.irfft(np.conj(spectrum)[:, :, None] * spectrum[:, None, :], n=size, axis=0)
+
+    lags = np.arange(-max_lag, max_lag + 1)
+    overlap = n - np.abs(lags)
+    values = raw[lags % size] / overlap[:, None, None]
+    values[:, std <= _EPS, :] = np.nan
+    values[:, :, std <= _EPS] = np.nan
+    return np.moveaxis(values, 0, -1)
+
+
+def pairs(fuels: List[str]) -> List[tuple]:
+    """ทุกคู่ (i, j) ที่ i < j"""
+    return [(i, j) for i in range(len(fuels)) for j in range(i + 1, len(fuels))]
@@ -2,7 +2,7 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -71,8 +71,9 @@ def load_eppo_csv(file_path: str, encoding: str = 'utf-8-sig') -> pd.DataFrame:
         for col in price_columns:
             if col in df.columns:
                 # ลบ comma และแปลงเป็น float
-                df[col] = df[col].astype(str).str.replace(',', '').str.replace('-', '')
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+                # '-' ทั้งช่อง = ไม่มีราคา; ห้ามลบ '-' ออกจากตัวเลข (ค่าติดลบจะกลายเป็นบวกและตรวจไม่เจอ)
+                values = df[col].astype(str).str.replace(',', '').str.strip()
+                df[col] = pd.to_numeric(values.mask(values.str.fullmatch(r'-+')), errors='coerce')
         
         # เรียงตามวันที่
         df = df.sort_values('date').reset_index(drop=True)
@@ -154,3 +155,123 @@ def prepare_sample_data() -> pd.DataFrame:
     })
     
     return df
+
+# ประเภทเชื้อเพลิงทั้งหมดที่เก็บใน payload
+PRICE_COLUMNS = ['diesel', 'gasohol_95', 'gasohol_91', 'gasohol_e20', 'diesel_b7', 'lpg']
+
+# lag / rolling window ชุดเดียวกับ create_features (เลือกเฉพาะที่ใช้บอกสภาวะตลาด)
+MARKET_LAGS = [1, 7, 30]
+MARKET_WINDOWS = [7, 30]
+
+# scale คงที่ (ไม่ขึ้นกับข้อมูลแต่ละชุด) เพื่อให้ vector ที่ ingest ต่างเวลากันเทียบกันได้
+# ราคาต่างกัน 1 บาท ~ การเปลี่ยนแปลง 1%
+PRICE_LEVEL_SCALE = 10.0
+RELATIVE_SCALE = 10.0
+
+MARKET_FEATURE_NAMES = [
+    f'{fuel}_{name}'
+    for fuel in PRICE_COLUMNS
+    for name in (
+        ['level']
+        + [f'ret_{lag}' for lag in MARKET_LAGS]
+        + [f'ma_{w}_gap' for w in MARKET_WINDOWS]
+        + [f'vol_{w}' for w in MARKET_WINDOWS]
+    )
+]
+
+def build_market_features(df: pd.DataFrame) -> np.ndarray:
+    """
+    สร้าง feature vector ที่ normalize แล้วของแต่ละวัน สำหรับค้นหาสภาวะตลาดที่คล้ายกัน
+    ประกอบด้วย ระดับราคาทุกประเภท + ผลตอบแทนย้อนหลัง + ระยะห่างจาก moving average + volatility
+
+    lag / rolling window นับเป็นวันตามปฏิทิน (reindex เป็นรายวันแล้ว forward fill วันที่ไม่มีข้อมูล)
+    แถวเดียวกันจึงได้ vector เท่ากันไม่ว่าจะ ingest ทีละวันหรือเป็น batch ที่มีช่องว่าง
+    df ไม่ต้องเรียงตามวันที่ (ใส่ประวัติก่อนหน้าได้เพื่อให้ lag ของแถวแรกๆ ถูกต้อง)
+    วันที่ซ้ำใช้ราคาของแถวหลังสุดเป็นประวัติ
+    เชื้อเพลิงที่ไม่มีข้อมูลจะเป็น 0 และ lag ที่ไม่มีประวัติจะถือว่าราคาไม่เปลี่ยน
+    คืน array ขนาด (len(df), len(MARKET_FEATURE_NAMES))
+    """
+    if len(df) == 0:
+        return np.zeros((0, len(MARKET_FEATURE_NAMES)), dtype=np.float32)
+
+    dates = pd.to_datetime(df['date']).dt.normalize()
+    calendar = pd.date_range(dates.min(), dates.max(), freq='D')
+    position = calendar.get_indexer(dates)
+    blocks = []
+
+    # ราคา 0 (ข้อมูลผิด) ทำให้หารด้วย 0 ได้ ค่า inf / NaN ถูกแทนด้วย 0 ตอนท้าย
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for fuel in PRICE_COLUMNS:
+            if fuel not in df.columns:
+                blocks.append(np.zeros((len(df), len(MARKET_FEATURE_NAMES) // len(PRICE_COLUMNS))))
+                continue
+
+            price = pd.to_numeric(df[fuel], errors='coerce').to_numpy(dtype=float)
+            daily = pd.Series(price, index=dates.to_numpy()).dropna()
+            daily = daily.groupby(level=0).last().reindex(calendar).ffill()
+            columns = [price / PRICE_LEVEL_SCALE]
+
+            first = daily.dropna().iloc[0] if daily.notna().any() else np.nan
+            for lag in MARKET_LAGS:
+                lagged = daily.shift(lag).fillna(first).to_numpy()[position]
+                columns.append((price / lagged - 1) * RELATIVE_SCALE)
+
+            for window in MARKET_WINDOWS:
+                ma = daily.rolling(window=window, min_periods=1).mean().to_numpy()[position]
+                columns.append((price / ma - 1) * RELATIVE_SCALE)
+
+            for window in MARKET_WINDOWS:
+                std = daily.rolling(window=window, min_periods=2).std().to_numpy()[position]
+                columns.append(std / price * RELATIVE_SCALE)
+
+            blocks.append(np.column_stack(columns))
+
+    features = np.hstack(blocks)
+    return np.nan_to_num(features, nan=0.0, posinf=0.0, neginf=0.0).astype(np.float32)
+
+def load_eppo_long_csv(
+    file_path: str,
+    freq: str = 'W',
+    items: Optional[List[str]] = None,
+    countries: Optional[List[str]] = None,
+    encoding: str = 'utf-8-sig'
+) -> pd.DataFrame:
+    """
+    โหลด EPPO dataset แบบ long format (Year, Month, Date, Item, Country, Price(Baht))
+    แล้ว pivot เป็น panel: index = วันที่ (resample ตาม freq), column = "Item | Country"
+    ช่วงที่ไม่มีข้อมูล (ก่อนเริ่ม, ช่องว่างกลาง, หลัง series เลิกรายงาน) เป็น NaN ไม่เติมค่า
+    PanelForecaster ข้าม NaN เอง จึงไม่นับค่าที่ copy มาเป็น observation
+    """
+    df = pd.read_csv(file_path, encoding=encoding)
+    df.columns = df.columns.str.strip()
+
+    required = {'Year', 'Month', 'Date', 'Item', 'Country', 'Price(Baht)'}
+    missing = required - set(df.columns)
+    if missing:
+        raise ValueError(f"Not a long-format EPPO file, missing columns: {sorted(missing)}")
+
+    df['date'] = pd.to_datetime(
+        df['Year'].astype(str) + ' ' + df['Month'].astype(str) + ' ' + df['Date'].astype(str),
+        format='%Y %B %d',
+        errors='coerce'
+    )
+    df = df.dropna(subset=['date'])
+
+    if items:
+        df = df[df['Item'].isin(items)]
+    if countries:
+        df = df[df['Country'].isin(countries)]
+    if df.empty:
+        raise ValueError("No rows match the requested items/countries")
+
+    df['series'] = df['Item'].str.strip() + ' | ' + df['Country'].str.strip()
+    df['price'] = pd.to_numeric(df['Price(Baht)'], errors='coerce')
+
+    panel = (
+        df.pivot_table(index='date', columns='series', values='price', aggfunc='mean')
+        .resample(freq)
+        .last()
+    )
+
+    logger.info(f"Loaded panel with {panel.shape[1]} series x {panel.shape[0]} periods")
+    return panel
@@ -0,0 +1,115 @@
+# utils/downsampling.py
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# interval ของ /prices/history -> pandas offset (label = วันแรกของช่วง)
+RESAMPLE_RULES = {
+    "day": "D",
+    "week": "W-MON",
+    "month": "MS",
+}
+
+def resample_ohlc(df: pd.DataFrame, columns: List[str], interval: str) -> Dict[str, pd.DataFrame]:
+    """
+    รวมราคารายวันเป็น OHLC ตาม interval ของทุก column ในครั้งเดียว
+
+    Args:
+        df: DataFrame ที่มี 'date' และ column ราคา (เรียงตามวันที่)
+        columns: column ที่ต้องการ
+        interval: 'day' | 'week' | 'month'
+
+    Returns:
+        dict column -> DataFrame(index=วันเริ่มช่วง, columns=open/high/low/close) เฉพาะช่วงที่มีข้อมูล
+    """
+    if interval not in RESAMPLE_RULES:
+        raise ValueError(f"Unknown interval '{interval}'. Choose one of {', '.join(RESAMPLE_RULES)}")
+
+    grouped = df.set_index('date')[columns].resample(
+        RESAMPLE_RULES[interval], label='left', closed='left'
+    )
+    # first/last ข้าม NaN อยู่แล้ว จึงได้ open/close ของวันแรก/วันสุดท้ายที่มีราคา
+    ohlc = {
+        "open": grouped.first(),
+        "high": grouped.max(),
+        "low": grouped.min(),
+        "close": grouped.last(),
+    }
+    return {
+        column: pd.DataFrame({k: v[column] for k, v in ohlc.items()}).dropna(subset=["close"])
+        for column in columns
+    }
+
+def pick_interval(start: pd.Timestamp, end: pd.Timestamp, points: int) -> str:
+    """interval ที่ละเอียดที่สุดที่ยังได้จำนวนช่วงไม่เกิน points"""
+    days = (end - start).days + 1
+    if days <= points:
+        return "day"
+    if days / 7 <= points:
+        return "week"
+    return "month"
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: เลือก threshold จุดที่คงรูปร่างของกราฟ (x ต้องเรียงจากน้อยไปมาก)
+
+    จุดแรกและจุดสุดท้ายถูกเก็บเสมอ จุดที่เหลือแบ่งเป็น threshold - 2 bucket
+    แต่ละ bucket เลือกจุดที่ทำสามเหลี่ยมพื้นที่มากสุดกับจุดที่เลือกไว้ก่อนหน้าและค่าเฉลี่ยของ bucket ถัดไป
+    ค่าเฉลี่ยของทุก bucket คำนวณครั้งเดียวด้วย np.add.reduceat
+
+    Returns:
+        index ของจุดที่เลือก (เรียงจากน้อยไปมาก)
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # ขอบของ bucket (ไม่รวมจุดแรก/จุดสุดท้าย)
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(int) + 1
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # bucket สุดท้ายใช้จุดสุดท้ายเป็น "ค่าเฉลี่ยของ bucket ถัดไป"
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - next_x[i]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (next_y[i] - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def downsample_ohlc(frame: pd.DataFrame, points: int) -> pd.DataFrame:
+    """ลดจำนวนแถวของ OHLC frame ให้เหลือ points ด้วย LTTB บน close"""
+    if len(frame) <= points:
+        return frame
+    x = frame.index.asi8.astype(float)
+    return frame.iloc[lttb_indices(x, frame["close"].to_numpy(dtype=float), points)]
+
+def ohlc_records(frame: pd.DataFrame) -> List[Dict[str, Optional[float]]]:
+    """OHLC frame -> list ของ dict สำหรับ response"""
+    values = frame[["open", "high", "low", "close"]].to_numpy(dtype=float).round(2)
+    dates = frame.index.strftime("%Y-%m-%d")
+    return [
+        {"date": d, "open": o, "high": h, "low": l, "close": c}
+        for d, (o, h, l, c) in zip(dates, values.tolist())
+    ]
+
+def ohlc_columns(frame: pd.DataFrame) -> Dict[str, object]:
+    """OHLC frame -> array ขนานกันหนึ่ง array ต่อ field (columnar response)"""
+    columns: Dict[str, object] = {"date": frame.index.strftime("%Y-%m-%d").tolist()}
+    for field in ("open", "high", "low", "close"):
+        columns[field] = frame[field].to_numpy(dtype=float).round(2)
+    return columns
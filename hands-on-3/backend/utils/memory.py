@@ -0,0 +1,318 @@
+# utils/memory.py
+"""
+วัดหน่วยความจำแบบเปิดใช้เมื่อต้องการ (MEMORY_PROFILING_ENABLED หรือ POST /debug/memory/start)
+
+    @memory_profiler.profiled("train", lambda args: {"fuel_type": args["fuel_type"]})
+    def train(self, df, fuel_type="diesel"):
+        ...
+        memory_profiler.mark("fitted")   # จุดแบ่ง stage: เก็บ RSS และ tracemalloc ณ จุดนั้น
+
+    with memory_profiler.span("ingest", rows=10) as mark:   # หรือใช้ span ตรงๆ
+        mark("parsed")
+
+- ตอนปิด function ที่ profiled ถูกเรียกตรงๆ และ span() คืน object no-op ตัวเดียวกันทุกครั้ง
+  (ไม่ allocate, ไม่อ่าน /proc)
+- ตอนเปิด tracemalloc จะเก็บ stack ทุก allocation ทำให้ช้าลงอย่างเห็นได้ชัด ใช้ตอน debug เท่านั้น
+"""
+import functools
+import gc
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# key_type ของ tracemalloc.Snapshot.statistics ที่ /debug/memory รับ
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# frame ของ tracemalloc / import ไม่ใช่ allocation ของ application
+_IGNORED_FRAMES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+# object ที่ deep_sizeof ไม่นับ (ใช้ร่วมกันทั้ง process ไม่ใช่ของ model)
+_SKIPPED_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    threading.Thread, type(threading.Lock())
+)
+
+
+def rss_bytes() -> int:
+    """RSS ปัจจุบันของ process (Linux อ่าน /proc, ระบบอื่นใช้ peak RSS จาก resource)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def deep_sizeof(obj) -> int:
+    """
+    ขนาดโดยประมาณของ object และทุกอย่างที่มันอ้างถึง (bytes)
+
+    เดินตาม gc.get_referents จึงเห็น reference ของ extension type (เช่น Cython ใน statsmodels) ด้วย
+    numpy array ที่เป็น view นับ buffer ครั้งเดียวที่ base, pandas object ใช้ __sizeof__ ของ pandas (deep)
+    ไม่นับ module / class / function ที่อ้างถึง; buffer ที่ C code จองเองโดยไม่ผ่าน Python จะไม่ถูกนับ
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SKIPPED_TYPES):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+
+        if isinstance(item, np.ndarray):
+            # array ที่เป็นเจ้าของ buffer: getsizeof รวม buffer แล้ว; view: นับ base แทน
+            if item.base is not None:
+                stack.append(item.base)
+            elif item.dtype == object:
+                stack.extend(item.ravel().tolist())
+        elif not isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            stack.extend(gc.get_referents(item))
+    return total
+
+
+class _NullSpan:
+    """span ตอนปิด profiling: ทุก method ไม่ทำอะไร"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, stage: str, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """ช่วงการทำงานหนึ่งครั้ง (เช่น train หนึ่งครั้ง) ที่เก็บ sample ทุกจุดแบ่ง stage"""
+
+    def __init__(self, profiler: "MemoryProfiler", scope: str, fields: Dict):
+        self.profiler = profiler
+        self.scope = scope
+        self.fields = fields
+        self.samples: List[Dict] = []
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.start_rss = rss_bytes()
+        self.start_traced, _ = tracemalloc.get_traced_memory()
+        self._previous_rss = self.start_rss
+        self.peak_traced = self.start_traced
+        return self
+
+    def __call__(self, stage: str, **fields):
+        rss = rss_bytes()
+        traced, peak = tracemalloc.get_traced_memory()
+        self.peak_traced = max(self.peak_traced, peak)
+        self.samples.append({
+            "stage": stage,
+            "elapsed": round(time.perf_counter() - self.started, 3),
+            "rss_mb": round(rss / MB, 1),
+            "rss_delta_mb": round((rss - self._previous_rss) / MB, 1),
+            "traced_mb": round(traced / MB, 1),
+            **fields,
+        })
+        self._previous_rss = rss
+
+    def __exit__(self, exc_type, exc, tb):
+        self("end" if exc_type is None else "error")
+        end = self.samples[-1]
+        self.profiler._record({
+            "scope": self.scope,
+            **self.fields,
+            "finished_at": time.time(),
+            "seconds": end["elapsed"],
+            "rss_start_mb": round(self.start_rss / MB, 1),
+            "rss_end_mb": end["rss_mb"],
+            "rss_growth_mb": round(end["rss_mb"] - self.start_rss / MB, 1),
+            # peak ของ tracemalloc เป็นค่ารวมทั้ง process ตั้งแต่ reset ล่าสุด (รวม thread อื่นที่รันพร้อมกัน)
+            "traced_peak_mb": round(self.peak_traced / MB, 1),
+            "traced_growth_mb": round(end["traced_mb"] - self.start_traced / MB, 1),
+            "stages": self.samples,
+        })
+        return False
+
+
+class MemoryProfiler:
+    """
+    เก็บ sample หน่วยความจำ (RSS + tracemalloc) ตามจุดแบ่ง stage ของ ingest / query / train / load model
+
+    - span ล่าสุดเก็บไว้ max_spans รายการ พร้อมค่าสูงสุดต่อ scope
+    - top() คืน allocation site ที่ใช้หน่วยความจำมากสุด (เทียบกับตอนเริ่มเปิดได้)
+    """
+
+    def __init__(self, max_spans: int = 200):
+        self.enabled = False
+        self.frames = 1
+        self._lock = threading.Lock()
+        self._spans: deque = deque(maxlen=max_spans)
+        self._scopes: Dict[str, Dict] = {}
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_tracing = False
+        # span ที่ function ซึ่ง profiled กำลังรันอยู่ในแต่ละ thread (ให้ mark() ใช้)
+        self._local = threading.local()
+
+    def start(self, frames: int = 1):
+        """เปิด profiling (frames = จำนวน stack frame ต่อ allocation; มากขึ้น = ช้าลง)"""
+        with self._lock:
+            if self.enabled:
+                return
+            self.frames = frames
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            self._baseline = tracemalloc.take_snapshot().filter_traces(_IGNORED_FRAMES)
+            self.enabled = True
+        logger.info(f"Memory profiling enabled (tracemalloc frames={frames})")
+
+    def stop(self):
+        with self._lock:
+            if not self.enabled:
+                return
+            self.enabled = False
+            self._baseline = None
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+        logger.info("Memory profiling disabled")
+
+    def traced_bytes(self) -> Optional[int]:
+        """หน่วยความจำที่ tracemalloc นับได้ตอนนี้ (None ถ้าปิด profiling)"""
+        return tracemalloc.get_traced_memory()[0] if self.enabled else None
+
+    def span(self, scope: str, **fields):
+        """context manager ของการทำงานหนึ่งครั้ง; เรียกผลของ with เพื่อบันทึกจุดแบ่ง stage"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, scope, fields)
+
+    def profiled(self, scope: str, fields: Optional[Callable[[Dict], Dict]] = None):
+        """
+        decorator: รัน function ใน span(scope) ถ้าเปิด profiling อยู่ตอนเรียก
+
+        fields(arguments) คืน field ของ span จาก argument ของ call (dict ชื่อ parameter -> ค่า รวม default)
+        ภายใน function เรียก memory_profiler.mark(stage) เพื่อบันทึกจุดแบ่ง stage
+        """
+        def decorate(fn):
+            signature = inspect.signature(fn)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                extra = {}
+                if fields is not None:
+                    bound = signature.bind(*args, **kwargs)
+                    bound.apply_defaults()
+                    extra = fields(bound.arguments)
+                previous = getattr(self._local, "span", None)
+                with self.span(scope, **extra) as span:
+                    self._local.span = span
+                    try:
+                        return fn(*args, **kwargs)
+                    finally:
+                        self._local.span = previous
+            return wrapper
+        return decorate
+
+    def mark(self, stage: str, **fields):
+        """จุดแบ่ง stage ของ span ที่ function ซึ่ง profiled รันอยู่ใน thread นี้ (ไม่มี span = ไม่ทำอะไร)"""
+        span = getattr(self._local, "span", None)
+        if span is not None:
+            span(stage, **fields)
+
+    def _record(self, span: Dict):
+        with self._lock:
+            self._spans.append(span)
+            scope = self._scopes.setdefault(span["scope"], {
+                "count": 0, "max_rss_growth_mb": 0.0, "max_traced_peak_mb": 0.0, "max_rss_mb": 0.0
+            })
+            scope["count"] += 1
+            scope["max_rss_growth_mb"] = max(scope["max_rss_growth_mb"], span["rss_growth_mb"])
+            scope["max_traced_peak_mb"] = max(scope["max_traced_peak_mb"], span["traced_peak_mb"])
+            scope["max_rss_mb"] = max(scope["max_rss_mb"], span["rss_end_mb"])
+
+    def spans(self, scope: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """span ล่าสุด (ใหม่สุดก่อน)"""
+        with self._lock:
+            spans = list(self._spans)
+        return [s for s in reversed(spans) if scope is None or s["scope"] == scope][:limit]
+
+    def top(self, limit: int = 20, group_by: str = "lineno", since_start: bool = False) -> List[Dict]:
+        """
+        allocation site ที่ใช้หน่วยความจำมากสุดตอนนี้
+
+        since_start=True เทียบกับ snapshot ตอนเปิด profiling (เห็นเฉพาะที่โตขึ้น)
+        """
+        if group_by not in GROUP_BY:
+            raise ValueError(f"Unknown group_by '{group_by}'. Choose one of {', '.join(GROUP_BY)}")
+        if not self.enabled:
+            return []
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_FRAMES)
+        if since_start and self._baseline is not None:
+            stats = snapshot.compare_to(self._baseline, group_by)
+            return [
+                {
+                    "site": str(s.traceback) if group_by != "traceback" else s.traceback.format(),
+                    "size_mb": round(s.size / MB, 3),
+                    "size_diff_mb": round(s.size_diff / MB, 3),
+                    "count": s.count,
+                    "count_diff": s.count_diff,
+                }
+                for s in stats[:limit]
+            ]
+        return [
+            {
+                "site": str(s.traceback) if group_by != "traceback" else s.traceback.format(),
+                "size_mb": round(s.size / MB, 3),
+                "count": s.count,
+            }
+            for s in snapshot.statistics(group_by)[:limit]
+        ]
+
+    def stats(self) -> Dict:
+        traced, peak = tracemalloc.get_traced_memory() if self.enabled else (0, 0)
+        with self._lock:
+            scopes = {name: dict(scope) for name, scope in self._scopes.items()}
+        return {
+            "enabled": self.enabled,
+            "frames": self.frames if self.enabled else None,
+            "rss_mb": round(rss_bytes() / MB, 1),
+            "traced_mb": round(traced / MB, 1),
+            "traced_peak_mb": round(peak / MB, 1),
+            "gc_objects": len(gc.get_objects()) if self.enabled else None,
+            "scopes": scopes,
+        }
+
+
+# instance เดียวของ process (hook ใน QdrantService / OilPricePredictor เรียกผ่านตัวนี้)
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,83 @@
+# utils/responses.py
+import json
+import math
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # ใช้ json ของ stdlib แทน (ช้ากว่า)
+    orjson = None
+
+# รูปแบบ response ของ endpoint ที่คืนข้อมูลเป็นชุด
+# records = list ของ object (ค่าเดิม), columnar = object ของ array ขนานกัน (หนึ่ง array ต่อ field)
+RESPONSE_FORMATS = ("records", "columnar")
+
+
+def _default(obj: Any):
+    """แปลง type ที่ json ของ stdlib ไม่รู้จัก (ใช้เมื่อไม่มี orjson)"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(obj: Any):
+    """NaN / inf -> None และ numpy -> type ของ Python (ให้ json ของ stdlib ได้ผลเดียวกับ orjson)"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return _finite(obj.tolist())
+    return obj
+
+
+def dumps(content: Any) -> bytes:
+    """
+    serialize เป็น JSON bytes ด้วย orjson (หรือ json ของ stdlib ถ้าไม่มี)
+
+    NaN / inf เป็น null ทั้งสองทาง (orjson ทำเอง, stdlib ผ่าน _finite)
+    """
+    if orjson is not None:
+        # array ที่ orjson serialize เองไม่ได้ (เช่น string / object dtype) จะตกมาที่ _default
+        return orjson.dumps(
+            content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        _finite(content), ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse ที่ serialize ด้วย orjson และรับ numpy array / numpy scalar ได้ตรงๆ
+
+    endpoint ที่ return instance ของ class นี้เองจะข้าม response_model validation
+    และ jsonable_encoder ของ FastAPI ทั้งหมด
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def to_columns(records: List[Dict], keys: Optional[Iterable[str]] = None) -> Dict[str, list]:
+    """list ของ dict -> dict ของ list (columnar) ตาม keys (ไม่ระบุ = key ของ record แรก)"""
+    keys = list(keys) if keys is not None else (list(records[0]) if records else [])
+    return {key: [record.get(key) for record in records] for key in keys}
+
+
+def check_format(response_format: str) -> str:
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(
+            f"Unknown format '{response_format}'. Choose one of {', '.join(RESPONSE_FORMATS)}"
+        )
+    return response_format